@@ -0,0 +1,123 @@
+"""
+Write-behind buffer for the activity (audit) log.
+
+Request handlers call activity_log.log(), which only appends to an in-memory
+list. A background task bulk-inserts the buffer into activity_logs every
+ACTIVITY_LOG_FLUSH_SECONDS, or as soon as ACTIVITY_LOG_FLUSH_SIZE entries
+are waiting, in one INSERT and one commit. The buffer is flushed on
+shutdown; entries are stamped when logged, not when written.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+from sqlalchemy import and_, cast, func, insert, literal
+from sqlalchemy.dialects.postgresql import JSONB
+
+from database import SessionLocal
+from models import ActivityLog, get_wib_now
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_LOG_FLUSH_SECONDS = float(os.getenv("ACTIVITY_LOG_FLUSH_SECONDS", "2"))
+ACTIVITY_LOG_FLUSH_SIZE = int(os.getenv("ACTIVITY_LOG_FLUSH_SIZE", "100"))
+# Entries kept while the database is unreachable; beyond this the oldest are dropped
+ACTIVITY_LOG_BUFFER_MAX = int(os.getenv("ACTIVITY_LOG_BUFFER_MAX", "10000"))
+
+
+class ActivityLogBuffer:
+    def __init__(self, session_factory=None):
+        self.Session = session_factory or SessionLocal
+        self._rows = []
+        self._lock = threading.Lock()
+        self._wake = asyncio.Event()
+        self.written = 0
+        self.dropped = 0
+
+    def log(self, category: str, message: str, level: str = "info", details: Optional[dict] = None):
+        """Queue one activity log entry. Never touches the database."""
+        row = {"category": category, "level": level, "message": message,
+               "details": details, "created_at": get_wib_now()}
+        with self._lock:
+            self._rows.append(row)
+            pending = len(self._rows)
+        if pending >= ACTIVITY_LOG_FLUSH_SIZE:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write everything buffered so far in one bulk INSERT. Returns rows written."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        db = self.Session()
+        try:
+            db.execute(insert(ActivityLog.__table__), [
+                {**r, "details": json.dumps(r["details"], default=str) if r["details"] is not None else None}
+                for r in rows
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put them back in front of anything logged meanwhile and try again next flush
+            with self._lock:
+                self._rows = rows + self._rows
+                overflow = len(self._rows) - ACTIVITY_LOG_BUFFER_MAX
+                if overflow > 0:
+                    del self._rows[:overflow]
+                    self.dropped += overflow
+            raise
+        finally:
+            db.close()
+        self.written += len(rows)
+        return len(rows)
+
+    async def run(self, stop_event: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=ACTIVITY_LOG_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                logger.warning(f"⚠️ Activity log flush failed: {e}")
+
+    async def aclose(self):
+        """Final flush on shutdown."""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.flush)
+        except Exception as e:
+            logger.warning(f"⚠️ Activity log flush on shutdown failed; {len(self._rows)} entries lost: {e}")
+
+    def snapshot(self) -> dict:
+        return {"buffered": len(self._rows), "written": self.written, "dropped": self.dropped}
+
+
+activity_log = ActivityLogBuffer()
+
+
+def details_filter(column, criteria: dict, dialect: str):
+    """
+    SQL condition matching rows whose JSON `details` contain `criteria`.
+    PostgreSQL uses jsonb containment (@>, served by the GIN index on
+    details::jsonb); elsewhere only top-level scalar keys are supported.
+    Raises ValueError for criteria the dialect can't express.
+    """
+    if dialect == "postgresql":
+        return cast(column, JSONB).op("@>")(cast(literal(json.dumps(criteria)), JSONB))
+    conditions = []
+    for key, value in criteria.items():
+        if isinstance(value, (dict, list)):
+            raise ValueError("Nested details filters need PostgreSQL")
+        path = '$."' + str(key).replace('"', '') + '"'
+        if value is None:
+            conditions.append(func.json_type(column, path) == "null")
+        else:
+            conditions.append(func.json_extract(column, path) == (int(value) if isinstance(value, bool) else value))
+    return and_(*conditions)
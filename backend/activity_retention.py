@@ -0,0 +1,247 @@
+"""
+Retention and archival for activity_logs.
+
+Rows older than ACTIVITY_LOG_RETENTION_DAYS are moved out of the table once a
+day into compressed monthly archives (ACTIVITY_LOG_ARCHIVE_DIR/
+activity_logs-YYYY-MM.jsonl.gz, one JSON object per line), so the table only
+holds the retention window and /api/logs keeps reading a small created_at
+index range. Expired rows are removed in batches with DELETE ... RETURNING;
+small batches keep transactions short so autovacuum can reuse the freed space
+instead of the table bloating. Rows without a created_at are never expired.
+
+Each batch reaches its archive exactly once:
+
+  1. the returned rows are staged in a hidden part file per month (one
+     complete gzip member) before the DELETE commits,
+  2. after the commit the part is renamed to record the archive's current
+     size, appended, and removed; replaying a renamed part first truncates
+     the archive back to that size, so a crash mid-append can't duplicate,
+  3. parts left by a crash are settled on the next run: if their rows are
+     still in the table the DELETE never committed and the part is dropped,
+     otherwise it is appended.
+
+Pruners (API processes, manual runs) are serialized with a lock file in the
+archive directory, so no part is settled while its batch is in flight.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time as dtime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+
+from database import SessionLocal
+from models import ActivityLog, get_wib_now
+
+try:
+    import fcntl
+except ImportError:  # Windows: _archive_lock falls back to msvcrt
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 0 keeps logs forever
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv("ACTIVITY_LOG_RETENTION_DAYS", "90"))
+# Absolute, so it doesn't depend on the working directory (/app/archives/activity_logs in Docker)
+ACTIVITY_LOG_ARCHIVE_DIR = os.path.abspath(os.getenv(
+    "ACTIVITY_LOG_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "archives", "activity_logs"),
+))
+ACTIVITY_LOG_PRUNE_SECONDS = float(os.getenv("ACTIVITY_LOG_PRUNE_SECONDS", "86400"))
+ACTIVITY_LOG_PRUNE_BATCH = int(os.getenv("ACTIVITY_LOG_PRUNE_BATCH", "5000"))
+
+ARCHIVE_NAME = re.compile(r"^activity_logs-\d{4}-\d{2}\.jsonl\.gz$")
+# Staged batch: .activity_logs-YYYY-MM.<uid>.part, renamed to .<uid>.<archive size>.fold while appending
+PART_NAME = re.compile(r"^\.activity_logs-(\d{4}-\d{2})\.([0-9a-f]{32})\.(?:part|(\d+)\.fold)$")
+
+
+def retention_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Start of the oldest day still kept (None when retention is off)."""
+    if ACTIVITY_LOG_RETENTION_DAYS <= 0:
+        return None
+    today = (now or get_wib_now()).date()
+    return datetime.combine(today - timedelta(days=ACTIVITY_LOG_RETENTION_DAYS), dtime())
+
+
+def archive_path(month: str) -> str:
+    return os.path.join(ACTIVITY_LOG_ARCHIVE_DIR, f"activity_logs-{month}.jsonl.gz")
+
+
+@contextmanager
+def _archive_lock():
+    """Exclusive OS lock on ARCHIVE_DIR/.lock; released by the OS if the process dies."""
+    os.makedirs(ACTIVITY_LOG_ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(ACTIVITY_LOG_ARCHIVE_DIR, ".lock"), "a+") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            return
+        import msvcrt
+        lock.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                time.sleep(0.5)
+        try:
+            yield
+        finally:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _stage(rows) -> list:
+    """Write a batch to one part file per month. Returns their paths."""
+    by_month = defaultdict(list)
+    for row in rows:
+        by_month[row.created_at.strftime("%Y-%m")].append(row)
+    parts = []
+    try:
+        for month, month_rows in by_month.items():
+            parts.append(os.path.join(ACTIVITY_LOG_ARCHIVE_DIR, f".activity_logs-{month}.{uuid.uuid4().hex}.part"))
+            with open(parts[-1], "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    for row in month_rows:
+                        f.write((json.dumps({
+                            "id": row.id,
+                            "category": row.category,
+                            "level": row.level,
+                            "message": row.message,
+                            "details": row.details,
+                            "created_at": row.created_at.isoformat(),
+                        }) + "\n").encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+    except Exception:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+        raise
+    return parts
+
+
+def _append(part: str):
+    """Append a committed part to its month's archive and remove it (safe to repeat after a crash)."""
+    month, uid, offset = PART_NAME.match(os.path.basename(part)).groups()
+    archive = archive_path(month)
+    if offset is None:
+        offset = os.path.getsize(archive) if os.path.exists(archive) else 0
+        folding = os.path.join(ACTIVITY_LOG_ARCHIVE_DIR, f".activity_logs-{month}.{uid}.{offset}.fold")
+        os.replace(part, folding)
+        part = folding
+    with open(part, "rb") as f:
+        member = f.read()
+    with open(archive, "ab") as f:
+        f.truncate(int(offset))
+        f.write(member)
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(part)
+
+
+def _settle_leftovers():
+    """Finish or drop parts a crashed or failed prune left behind."""
+    for name in sorted(os.listdir(ACTIVITY_LOG_ARCHIVE_DIR)):
+        match = PART_NAME.match(name)
+        if not match:
+            continue
+        part = os.path.join(ACTIVITY_LOG_ARCHIVE_DIR, name)
+        if match.group(3) is None:
+            try:
+                with gzip.open(part, "rt", encoding="utf-8") as f:
+                    first_id = json.loads(f.readline())["id"]
+            except (OSError, EOFError, ValueError):
+                # Torn write: the crash came before the commit, which waits for every part
+                os.remove(part)
+                continue
+            db = SessionLocal()
+            try:
+                committed = db.get(ActivityLog, first_id) is None
+            finally:
+                db.close()
+            if not committed:
+                os.remove(part)
+                continue
+        _append(part)
+
+
+def prune_expired(now: Optional[datetime] = None) -> int:
+    """Archive and delete every row older than the retention window. Returns rows moved."""
+    cutoff = retention_cutoff(now)
+    if cutoff is None:
+        return 0
+    table = ActivityLog.__table__
+    moved = 0
+    with _archive_lock():
+        _settle_leftovers()
+        while True:
+            db = SessionLocal()
+            try:
+                batch = select(table.c.id).where(table.c.created_at < cutoff) \
+                    .order_by(table.c.id).limit(ACTIVITY_LOG_PRUNE_BATCH).scalar_subquery()
+                rows = db.execute(
+                    delete(table).where(table.c.id.in_(batch)).returning(*table.c)
+                ).all()
+                parts = _stage(rows)
+                db.commit()
+            except Exception:
+                # Any staged parts are settled by the next run, once the outcome is known
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            for part in parts:
+                _append(part)
+            moved += len(rows)
+            if len(rows) < ACTIVITY_LOG_PRUNE_BATCH:
+                break
+    if moved:
+        logger.info(f"🗄️ Archived {moved} activity log(s) older than {cutoff.date()}")
+    return moved
+
+
+def retention_status() -> dict:
+    """Policy, table extent and archive files, for the logs admin view."""
+    db = SessionLocal()
+    try:
+        count, oldest = db.query(func.count(ActivityLog.id), func.min(ActivityLog.created_at)).one()
+    finally:
+        db.close()
+    archives = []
+    if os.path.isdir(ACTIVITY_LOG_ARCHIVE_DIR):
+        for name in sorted(os.listdir(ACTIVITY_LOG_ARCHIVE_DIR)):
+            if ARCHIVE_NAME.match(name):
+                archives.append({"name": name, "size": os.path.getsize(os.path.join(ACTIVITY_LOG_ARCHIVE_DIR, name))})
+    cutoff = retention_cutoff()
+    return {
+        "retention_days": ACTIVITY_LOG_RETENTION_DAYS,
+        "cutoff": cutoff.isoformat() if cutoff else None,
+        "rows": count,
+        "oldest": oldest.isoformat() if oldest else None,
+        "archives": archives,
+    }
+
+
+async def retention_loop(stop_event: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop_event.is_set():
+        try:
+            await loop.run_in_executor(None, prune_expired)
+        except Exception as e:
+            logger.warning(f"⚠️ Activity log pruning failed: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=ACTIVITY_LOG_PRUNE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,36 @@
+"""Add (category, created_at) and details indexes on activity_logs
+
+Revision ID: 2381acdb867a
+Revises: 9ca34d724095
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2381acdb867a'
+down_revision: Union[str, Sequence[str], None] = '9ca34d724095'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the (category, created_at) index, plus a jsonb GIN index on details on PostgreSQL."""
+    op.create_index('ix_activity_logs_category_created_at', 'activity_logs', ['category', 'created_at'], unique=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        # details is JSON text; index its jsonb form for @> containment filters
+        op.execute(
+            "CREATE INDEX ix_activity_logs_details_jsonb ON activity_logs "
+            "USING gin ((details::jsonb) jsonb_path_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Drop the activity log query indexes."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_activity_logs_details_jsonb")
+    op.drop_index('ix_activity_logs_category_created_at', table_name='activity_logs')
@@ -0,0 +1,30 @@
+"""Add pre-generated message drafts to campaign_sends
+
+Revision ID: 26d3f486b7c3
+Revises: ab89edb0a09b
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '26d3f486b7c3'
+down_revision: Union[str, Sequence[str], None] = 'ab89edb0a09b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add draft message columns to campaign_sends."""
+    op.add_column('campaign_sends', sa.Column('message', sa.Text(), nullable=True))
+    op.add_column('campaign_sends', sa.Column('message_state', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop the draft message columns from campaign_sends."""
+    op.drop_column('campaign_sends', 'message_state')
+    op.drop_column('campaign_sends', 'message')
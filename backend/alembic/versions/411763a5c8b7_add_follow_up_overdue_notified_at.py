@@ -0,0 +1,28 @@
+"""Add overdue_notified_at to follow_ups for the overdue sweeper
+
+Revision ID: 411763a5c8b7
+Revises: 8d29aab33363
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '411763a5c8b7'
+down_revision: Union[str, Sequence[str], None] = '8d29aab33363'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add follow_ups.overdue_notified_at."""
+    op.add_column('follow_ups', sa.Column('overdue_notified_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop follow_ups.overdue_notified_at."""
+    op.drop_column('follow_ups', 'overdue_notified_at')
@@ -0,0 +1,30 @@
+"""Add recorded flag to campaign_sends for write-behind side effects
+
+Revision ID: 41744d8a30a2
+Revises: 26d3f486b7c3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '41744d8a30a2'
+down_revision: Union[str, Sequence[str], None] = '26d3f486b7c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add campaign_sends.recorded; results already written count as recorded."""
+    op.add_column('campaign_sends', sa.Column('recorded', sa.Boolean(), nullable=True, server_default=sa.false()))
+    # Results written before this revision already created their FollowUps inline
+    op.execute("UPDATE campaign_sends SET recorded = true WHERE state IN ('sent', 'failed')")
+
+
+def downgrade() -> None:
+    """Drop campaign_sends.recorded."""
+    op.drop_column('campaign_sends', 'recorded')
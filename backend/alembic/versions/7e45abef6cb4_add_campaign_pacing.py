@@ -0,0 +1,28 @@
+"""Add pacing policy to campaigns
+
+Revision ID: 7e45abef6cb4
+Revises: b1a71bfe8c2d
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e45abef6cb4'
+down_revision: Union[str, Sequence[str], None] = 'b1a71bfe8c2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add campaigns.pacing."""
+    op.add_column('campaigns', sa.Column('pacing', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop campaigns.pacing."""
+    op.drop_column('campaigns', 'pacing')
@@ -0,0 +1,31 @@
+"""Add (status, next_follow_date) index on follow_ups for the agenda
+
+Revision ID: 8d29aab33363
+Revises: 7e45abef6cb4
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d29aab33363'
+down_revision: Union[str, Sequence[str], None] = '7e45abef6cb4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the follow-up agenda indexes."""
+    op.create_index('ix_follow_ups_status_next_follow_date', 'follow_ups', ['status', 'next_follow_date'], unique=False)
+    # Date-only windows without a status filter
+    op.create_index('ix_follow_ups_next_follow_date', 'follow_ups', ['next_follow_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the follow-up agenda indexes."""
+    op.drop_index('ix_follow_ups_next_follow_date', table_name='follow_ups')
+    op.drop_index('ix_follow_ups_status_next_follow_date', table_name='follow_ups')
@@ -0,0 +1,45 @@
+"""Add invoice_counters for atomic invoice number allocation
+
+Revision ID: 9de603497f7c
+Revises: 2381acdb867a
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9de603497f7c'
+down_revision: Union[str, Sequence[str], None] = '2381acdb867a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create invoice_counters, seeded from the invoice numbers already issued."""
+    counters = op.create_table(
+        'invoice_counters',
+        sa.Column('period', sa.String(), nullable=False),
+        sa.Column('last_number', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('period'),
+    )
+
+    # Start each month after the highest number already issued in it
+    last = {}
+    pattern = re.compile(r"^INV-(\d{6})-(\d+)$")
+    for (number,) in op.get_bind().execute(sa.text("SELECT invoice_number FROM invoices")):
+        match = pattern.match(number or "")
+        if match:
+            period, n = match.group(1), int(match.group(2))
+            last[period] = max(last.get(period, 0), n)
+    if last:
+        op.bulk_insert(counters, [{'period': p, 'last_number': n} for p, n in last.items()])
+
+
+def downgrade() -> None:
+    """Drop invoice_counters."""
+    op.drop_table('invoice_counters')
@@ -0,0 +1,51 @@
+"""Add campaign_sends table and campaign run lease
+
+Revision ID: ab89edb0a09b
+Revises: b8c50c7ec111
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ab89edb0a09b'
+down_revision: Union[str, Sequence[str], None] = 'b8c50c7ec111'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create campaign_sends and add the campaign run lease columns."""
+    op.add_column('campaigns', sa.Column('runner_id', sa.String(), nullable=True))
+    op.add_column('campaigns', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+
+    op.create_table(
+        'campaign_sends',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('campaign_id', sa.Integer(), sa.ForeignKey('campaigns.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('target_type', sa.String(), nullable=True, server_default='lead'),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('state', sa.String(), nullable=True, server_default='pending'),
+        sa.Column('attempt', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('campaign_id', 'target_type', 'target_id', name='uq_campaign_sends_target'),
+    )
+    op.create_index(op.f('ix_campaign_sends_id'), 'campaign_sends', ['id'], unique=False)
+    op.create_index('ix_campaign_sends_cursor', 'campaign_sends', ['campaign_id', 'state', 'position'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop campaign_sends and the campaign run lease columns."""
+    op.drop_index('ix_campaign_sends_cursor', table_name='campaign_sends')
+    op.drop_index(op.f('ix_campaign_sends_id'), table_name='campaign_sends')
+    op.drop_table('campaign_sends')
+    op.drop_column('campaigns', 'lease_expires_at')
+    op.drop_column('campaigns', 'runner_id')
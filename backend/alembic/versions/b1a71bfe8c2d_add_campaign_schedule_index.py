@@ -0,0 +1,37 @@
+"""Add (status, scheduled_at) index on campaigns for the scheduler
+
+Revision ID: b1a71bfe8c2d
+Revises: 41744d8a30a2
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1a71bfe8c2d'
+down_revision: Union[str, Sequence[str], None] = '41744d8a30a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the campaign schedule index; future-dated drafts become scheduled."""
+    op.create_index('ix_campaigns_status_scheduled_at', 'campaigns', ['status', 'scheduled_at'], unique=False)
+    # Drafts saved with a future schedule before the dispatcher existed; past
+    # ones are left as drafts rather than launched unannounced on deploy
+    wib_now = datetime.utcnow() + timedelta(hours=7)
+    op.get_bind().execute(
+        sa.text("UPDATE campaigns SET status = 'scheduled' WHERE status = 'draft' AND scheduled_at > :now"),
+        {"now": wib_now},
+    )
+
+
+def downgrade() -> None:
+    """Drop the campaign schedule index; scheduled campaigns revert to drafts."""
+    op.execute("UPDATE campaigns SET status = 'draft' WHERE status = 'scheduled'")
+    op.drop_index('ix_campaigns_status_scheduled_at', table_name='campaigns')
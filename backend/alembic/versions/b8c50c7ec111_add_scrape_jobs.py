@@ -0,0 +1,70 @@
+"""Add scrape_jobs and scrape_job_events tables
+
+Revision ID: b8c50c7ec111
+Revises: f2a3b4c5d6e7
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8c50c7ec111'
+down_revision: Union[str, Sequence[str], None] = 'f2a3b4c5d6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create scrape_jobs and scrape_job_events."""
+    op.create_table(
+        'scrape_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('keywords', sa.String(), nullable=False),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.Column('sources', sa.String(), nullable=False),
+        sa.Column('limit', sa.Integer(), nullable=True),
+        sa.Column('safe_mode', sa.Boolean(), nullable=True),
+        sa.Column('state', sa.String(), nullable=True, server_default='queued'),
+        sa.Column('progress', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=True, server_default=sa.false()),
+        sa.Column('worker_id', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('event_seq', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index(op.f('ix_scrape_jobs_id'), 'scrape_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_scrape_jobs_state'), 'scrape_jobs', ['state'], unique=False)
+    op.create_index(op.f('ix_scrape_jobs_created_at'), 'scrape_jobs', ['created_at'], unique=False)
+
+    op.create_table(
+        'scrape_job_events',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('job_id', sa.Integer(), sa.ForeignKey('scrape_jobs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index(op.f('ix_scrape_job_events_id'), 'scrape_job_events', ['id'], unique=False)
+    op.create_index(op.f('ix_scrape_job_events_job_id'), 'scrape_job_events', ['job_id'], unique=False)
+    op.create_index('ix_scrape_job_events_job_id_seq', 'scrape_job_events', ['job_id', 'seq'], unique=True)
+
+
+def downgrade() -> None:
+    """Drop scrape_jobs and scrape_job_events."""
+    op.drop_index('ix_scrape_job_events_job_id_seq', table_name='scrape_job_events')
+    op.drop_index(op.f('ix_scrape_job_events_job_id'), table_name='scrape_job_events')
+    op.drop_index(op.f('ix_scrape_job_events_id'), table_name='scrape_job_events')
+    op.drop_table('scrape_job_events')
+    op.drop_index(op.f('ix_scrape_jobs_created_at'), table_name='scrape_jobs')
+    op.drop_index(op.f('ix_scrape_jobs_state'), table_name='scrape_jobs')
+    op.drop_index(op.f('ix_scrape_jobs_id'), table_name='scrape_jobs')
+    op.drop_table('scrape_jobs')
@@ -0,0 +1,108 @@
+"""Move invoice line items from invoices.items JSON to invoice_items
+
+Revision ID: f601534cd515
+Revises: 9de603497f7c
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f601534cd515'
+down_revision: Union[str, Sequence[str], None] = '9de603497f7c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 1000
+
+
+def _whole_qty(value) -> int:
+    """Quantity as an int; refuses fractions instead of truncating them (qty is INTEGER)."""
+    qty = float(value or 0)
+    if not qty.is_integer():
+        raise ValueError(value)
+    return int(qty)
+
+
+def upgrade() -> None:
+    """Move invoice line items from invoices.items JSON into invoice_items."""
+    items_table = op.create_table(
+        'invoice_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('invoice_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_invoice_items_id'), 'invoice_items', ['id'], unique=False)
+    op.create_index(op.f('ix_invoice_items_invoice_id'), 'invoice_items', ['invoice_id'], unique=False)
+
+    # Backfill from the JSON blobs ([{desc, qty, price}, ...]). invoices.items is
+    # dropped below, so anything that would not survive the copy exactly aborts
+    # the migration (rolling it back) instead of being rounded away.
+    rows, refused = [], []
+    for invoice_id, raw in op.get_bind().execute(sa.text("SELECT id, items FROM invoices WHERE items IS NOT NULL")):
+        try:
+            items = json.loads(raw) or []
+        except ValueError:
+            continue
+        if not isinstance(items, list):
+            continue
+        position = 0
+        for item in items:
+            if not isinstance(item, dict):  # legacy strings / nulls carry no line
+                continue
+            try:
+                qty, price = _whole_qty(item.get('qty')), float(item.get('price') or 0)
+            except (TypeError, ValueError):
+                refused.append(f"invoice {invoice_id}: {item!r}")
+                continue
+            rows.append({
+                'invoice_id': invoice_id,
+                'position': position,
+                'description': str(item.get('desc') or ''),
+                'qty': qty,
+                'price': price,
+            })
+            position += 1
+            if len(rows) >= BATCH:
+                op.bulk_insert(items_table, rows)
+                rows = []
+    if refused:
+        raise RuntimeError(
+            "Invoice items with a fractional or non-numeric qty/price can't be copied to invoice_items "
+            "without changing invoice totals; fix them in invoices.items and rerun:\n  " + "\n  ".join(refused)
+        )
+    if rows:
+        op.bulk_insert(items_table, rows)
+
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_column('items')
+
+
+def downgrade() -> None:
+    """Rebuild invoices.items JSON from invoice_items and drop the table."""
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.add_column(sa.Column('items', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    items = {}
+    for invoice_id, desc, qty, price in bind.execute(sa.text(
+        "SELECT invoice_id, description, qty, price FROM invoice_items ORDER BY invoice_id, position"
+    )):
+        items.setdefault(invoice_id, []).append({'desc': desc, 'qty': qty, 'price': price})
+    for invoice_id, lines in items.items():
+        bind.execute(sa.text("UPDATE invoices SET items = :items WHERE id = :id"),
+                     {'items': json.dumps(lines), 'id': invoice_id})
+
+    op.drop_index(op.f('ix_invoice_items_invoice_id'), table_name='invoice_items')
+    op.drop_index(op.f('ix_invoice_items_id'), table_name='invoice_items')
+    op.drop_table('invoice_items')
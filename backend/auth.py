@@ -1,8 +1,16 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import event, inspect
+import asyncio
 import os
+import threading
+import time
+
+from models import User
 
 from dotenv import load_dotenv
 
@@ -14,7 +22,24 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Argon2 cost parameters (env overridable). Existing hashes keep verifying with
+# the parameters encoded in them; new hashes use these values.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+# Max concurrent hash/verify operations; extra logins queue instead of
+# saturating every core.
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+_hash_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="auth-hash")
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -22,6 +47,11 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    """Run argon2 verification in the bounded hash executor, off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,3 +62,79 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+# SSE clients (EventSource can't set headers) authenticate with a short-lived,
+# stream-only token in the query string rather than the access token, so only
+# a soon-expiring credential that opens streams ends up in proxy/access logs.
+STREAM_TOKEN_SCOPE = "stream"
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+
+def create_stream_token(email: str):
+    return create_access_token(
+        {"sub": email, "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS),
+    )
+
+
+# Verified token -> user identity cache used by get_current_user. Entries live
+# for AUTH_CACHE_TTL seconds (never past the token's own expiry). ORM updates
+# and deletes of a user in this process evict their entries at once; changes
+# made by another worker process or with raw SQL (deactivation, email change,
+# deletion) only take effect once the entry expires, so keep the TTL short.
+# 0 disables the cache.
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "15"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "256"))
+
+class TokenUserCache:
+    """Thread-safe LRU of token -> (user_id, email) with per-entry expiry."""
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (user_id, email, expires_at monotonic)
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0], entry[1]
+
+    def put(self, token: str, user_id: int, email: str, token_exp: Optional[float] = None):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (user_id, email, time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_email(self, email: str):
+        with self._lock:
+            for token in [t for t, e in self._entries.items() if e[1] == email]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_user_cache = TokenUserCache()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    # Deactivation, email change or deletion must not be served from cache
+    token_user_cache.invalidate_email(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted:
+        token_user_cache.invalidate_email(old_email)
@@ -0,0 +1,80 @@
+"""
+Login latency benchmark — fires concurrent /api/login requests at a running
+API and reports p50/p99 latency and throughput.
+
+Usage:
+    python bench_login.py --url http://localhost:8000 --email admin@x --password secret \
+        --requests 200 --concurrency 20
+
+Run it once with AUTH_HASH_WORKERS / ARGON2_* at their defaults and again after
+tuning to compare. A healthy setup keeps p99 of a concurrent /api/health probe
+low while logins are in flight (argon2 runs off the event loop).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def run(url: str, email: str, password: str, total: int, concurrency: int):
+    login_latencies = []
+    health_latencies = []
+    failures = 0
+    sem = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=url, timeout=60.0) as client:
+
+        async def one_login():
+            nonlocal failures
+            async with sem:
+                start = time.perf_counter()
+                resp = await client.post("/api/login", data={"username": email, "password": password})
+                login_latencies.append(time.perf_counter() - start)
+                if resp.status_code != 200:
+                    failures += 1
+
+        async def probe_health():
+            # Measures event-loop responsiveness while logins are hashing
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/health")
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        probe = asyncio.create_task(probe_health())
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe
+
+    ms = lambda s: f"{s * 1000:.1f} ms"
+    print(f"Logins:      {total} ({failures} failed) at concurrency {concurrency}")
+    print(f"Throughput:  {total / elapsed:.1f} logins/s over {elapsed:.2f}s")
+    print(f"Login p50:   {ms(percentile(login_latencies, 50))}")
+    print(f"Login p99:   {ms(percentile(login_latencies, 99))}")
+    print(f"Login mean:  {ms(statistics.mean(login_latencies))}")
+    print(f"Health p50:  {ms(percentile(health_latencies, 50))}")
+    print(f"Health p99:  {ms(percentile(health_latencies, 99))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /api/login under concurrent load")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.email, args.password, args.requests, args.concurrency))
@@ -0,0 +1,208 @@
+"""
+Bulk CSV/XLSX import for leads and prospects.
+
+The upload is read row by row (csv module, or openpyxl in read-only mode)
+and handled in chunks of IMPORT_CHUNK rows:
+
+  1. each row is validated with schemas.LeadCreate / ProspectCreate;
+     invalid rows are rejected with their row number and errors,
+  2. duplicates are dropped with the scraper's rules — leads by url or
+     title+company, prospects by maps_url, phone or name+category — against
+     earlier rows of the file and, with one IN query per key, the database,
+  3. the rest go in with one multi-row INSERT ... ON CONFLICT DO NOTHING.
+     Only leads.url and prospects.maps_url are unique columns, so only those
+     keys are safe against a concurrent writer (scraper, another import)
+     inserting the same row in the meantime; a racing duplicate by
+     title+company, phone or name+category can still get in.
+
+A missing prospect category counts as "" for name+category, both in the
+file and in the database, so uncategorized prospects are deduplicated too.
+
+Each chunk commits on its own, so memory stays flat regardless of file size.
+Headers match the schema field names (case-insensitive); the column names
+of the Excel export are accepted too, so exports can be re-imported.
+"""
+import codecs
+import csv
+import os
+import time
+from typing import Iterator, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+import schemas
+from database import SessionLocal
+from models import Lead, Prospect
+
+IMPORT_CHUNK = int(os.getenv("IMPORT_CHUNK", "1000"))
+# Rejected rows listed in the report; the rest are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "200"))
+
+# Header aliases (normalized) -> schema field, e.g. from the Excel export
+ALIASES = {
+    "score": "match_score",
+    "reason": "match_reason",
+    "reviews": "review_count",
+    "mapsurl": "maps_url",
+    "keyword": "source_keyword",
+}
+
+IMPORT_KINDS = {
+    "leads": (Lead, schemas.LeadCreate),
+    "prospects": (Prospect, schemas.ProspectCreate),
+}
+
+
+def _header(name) -> str:
+    key = str(name or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return ALIASES.get(key, key)
+
+
+def _cell(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stores phone numbers and counts as floats
+    value = str(value).strip()
+    return value or None
+
+
+def read_rows(fileobj, filename: str) -> Iterator[Tuple[int, dict]]:
+    """(row number, {field: str-or-None}) for the non-blank rows of an uploaded CSV or XLSX file; the header is row 1."""
+    if (filename or "").lower().endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("XLSX import needs openpyxl; upload a CSV instead")
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    else:
+        rows = csv.reader(codecs.iterdecode(fileobj, "utf-8-sig"))
+    header = next(rows, None)
+    if not header:
+        raise ValueError("The file is empty")
+    fields = [_header(h) for h in header]
+    for row_number, values in enumerate(rows, start=2):
+        row = {f: _cell(v) for f, v in zip(fields, values) if f}
+        if any(v is not None for v in row.values()):
+            yield row_number, row
+
+
+# ─── Dedup keys (same rules as the scraper) ───
+
+def _lead_keys(row: dict) -> list:
+    keys = []
+    if row.get("url"):
+        keys.append(("url", row["url"]))
+    if row.get("title") and row.get("company"):
+        keys.append(("title_company", (row["title"], row["company"])))
+    return keys
+
+
+def _prospect_keys(row: dict) -> list:
+    keys = []
+    if row.get("maps_url"):
+        keys.append(("maps_url", row["maps_url"]))
+    if row.get("phone"):
+        keys.append(("phone", row["phone"]))
+    if row.get("name"):
+        keys.append(("name_category", (row["name"], row.get("category") or "")))
+    return keys
+
+
+KEY_FUNCS = {"leads": _lead_keys, "prospects": _prospect_keys}
+
+KEY_COLUMNS = {
+    "url": (Lead.url,),
+    "title_company": (Lead.title, Lead.company),
+    "maps_url": (Prospect.maps_url,),
+    "phone": (Prospect.phone,),
+    # NULL never matches IN, so compare the category as "" when missing
+    "name_category": (Prospect.name, func.coalesce(Prospect.category, "")),
+}
+
+
+def _existing_keys(db, keyed_rows: list) -> set:
+    """Which of the chunk's dedup keys are already in the database (one query per key type)."""
+    wanted = {}
+    for keys, _ in keyed_rows:
+        for key_type, value in keys:
+            wanted.setdefault(key_type, set()).add(value)
+    found = set()
+    for key_type, values in wanted.items():
+        columns = KEY_COLUMNS[key_type]
+        if len(columns) == 1:
+            rows = db.execute(select(columns[0]).where(columns[0].in_(values))).scalars()
+            found.update((key_type, v) for v in rows)
+        else:
+            rows = db.execute(select(*columns).where(tuple_(*columns).in_(values))).all()
+            found.update((key_type, tuple(r)) for r in rows)
+    return found
+
+
+def _insert_ignore(db, model, records: list) -> int:
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(model).on_conflict_do_nothing().returning(model.id)
+    return len(db.execute(stmt, records).all())
+
+
+def import_file(kind: str, fileobj, filename: str, session_factory=None) -> dict:
+    """Import an uploaded file into `kind` ("leads" or "prospects"). Raises ValueError for unreadable files."""
+    model, schema = IMPORT_KINDS[kind]
+    key_func = KEY_FUNCS[kind]
+    columns = {c.key for c in model.__table__.columns} - {"id"}
+    started = time.perf_counter()
+    report = {"kind": kind, "rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "errors": []}
+    seen = set()
+    chunk = []
+
+    db = (session_factory or SessionLocal)()
+    try:
+        def flush():
+            existing = _existing_keys(db, chunk)
+            records = []
+            for keys, record in chunk:
+                if any(k in existing for k in keys):
+                    report["duplicates"] += 1
+                else:
+                    records.append(record)
+            if records:
+                inserted = _insert_ignore(db, model, records)
+                report["inserted"] += inserted
+                report["duplicates"] += len(records) - inserted
+            db.commit()
+            chunk.clear()
+
+        for row_number, row in read_rows(fileobj, filename):
+            report["rows"] += 1
+            try:
+                # Blank cells take the schema default, as an omitted field does in the API
+                data = schema(**{k: v for k, v in row.items() if v is not None}).model_dump()
+            except ValidationError as e:
+                report["rejected"] += 1
+                if len(report["errors"]) < IMPORT_MAX_ERRORS:
+                    report["errors"].append({
+                        "row": row_number,
+                        "error": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()),
+                    })
+                continue
+            keys = key_func(data)
+            if any(k in seen for k in keys):
+                report["duplicates"] += 1
+                continue
+            seen.update(keys)
+            chunk.append((keys, {k: v for k, v in data.items() if k in columns}))
+            if len(chunk) >= IMPORT_CHUNK:
+                flush()
+        if chunk:
+            flush()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
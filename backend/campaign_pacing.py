@@ -0,0 +1,195 @@
+"""
+Send-window aware pacing for campaign runs.
+
+A campaign's pacing policy (Campaign.pacing, JSON; missing keys fall back to
+DEFAULT_POLICY) says when and how fast it may send:
+
+    quiet_start / quiet_end   "HH:MM" WIB; no sends in between (may wrap midnight).
+                              Equal or empty values disable quiet hours.
+    daily_cap                 successful sends per WIB day (0 = unlimited)
+    jitter                    "uniform", "normal" or "exponential" gap between messages,
+    jitter_min / jitter_max   bounded to [jitter_min, jitter_max] seconds
+    burst_size                messages between longer pauses
+    pause_min / pause_max     seconds of the pause after each burst
+
+The runner asks the policy for the gap after each send and for the next open
+window before each send, so a campaign started at night waits for morning in
+one sleep instead of sending through it, and stops at the daily cap. eta()
+projects the finish time from the same rules.
+"""
+import json
+import math
+import os
+import random
+from datetime import datetime, time as dtime, timedelta
+from typing import Optional, Tuple
+
+_quiet = os.getenv("CAMPAIGN_QUIET_HOURS", "21:00-08:00").split("-")
+
+DEFAULT_POLICY = {
+    "quiet_start": _quiet[0].strip() if len(_quiet) == 2 else "",
+    "quiet_end": _quiet[1].strip() if len(_quiet) == 2 else "",
+    "daily_cap": int(os.getenv("CAMPAIGN_DAILY_CAP", "0")),
+    "jitter": "uniform",
+    "jitter_min": 15,
+    "jitter_max": 45,
+    "burst_size": 10,
+    "pause_min": 300,
+    "pause_max": 600,
+}
+
+JITTER_DISTRIBUTIONS = ("uniform", "normal", "exponential")
+
+
+def _parse_time(value: Optional[str], field: str) -> Optional[dtime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"{field} must be HH:MM")
+
+
+class PacingPolicy:
+    def __init__(self, **overrides):
+        values = {**DEFAULT_POLICY, **{k: v for k, v in overrides.items() if v is not None}}
+        unknown = set(values) - set(DEFAULT_POLICY)
+        if unknown:
+            raise ValueError(f"Unknown pacing option(s): {', '.join(sorted(unknown))}")
+
+        self.quiet_start = _parse_time(values["quiet_start"], "quiet_start")
+        self.quiet_end = _parse_time(values["quiet_end"], "quiet_end")
+        if self.quiet_start == self.quiet_end or None in (self.quiet_start, self.quiet_end):
+            self.quiet_start = self.quiet_end = None
+        try:
+            self.daily_cap = int(values["daily_cap"])
+            self.burst_size = int(values["burst_size"])
+            self.jitter_min, self.jitter_max = float(values["jitter_min"]), float(values["jitter_max"])
+            self.pause_min, self.pause_max = float(values["pause_min"]), float(values["pause_max"])
+        except (TypeError, ValueError):
+            raise ValueError("Pacing caps, sizes and durations must be numbers")
+        self.jitter = values["jitter"]
+        if self.jitter not in JITTER_DISTRIBUTIONS:
+            raise ValueError(f"jitter must be one of: {', '.join(JITTER_DISTRIBUTIONS)}")
+        if self.daily_cap < 0 or self.burst_size < 1:
+            raise ValueError("daily_cap must be >= 0 and burst_size >= 1")
+        if not 0 <= self.jitter_min <= self.jitter_max or not 0 <= self.pause_min <= self.pause_max:
+            raise ValueError("Jitter and pause ranges must be non-negative with min <= max")
+
+    @classmethod
+    def from_json(cls, raw: Optional[str]) -> "PacingPolicy":
+        """Policy from a Campaign.pacing JSON string (None/empty = defaults). Raises ValueError."""
+        if not raw:
+            return cls()
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            raise ValueError("Pacing must be a JSON object")
+        if not isinstance(data, dict):
+            raise ValueError("Pacing must be a JSON object")
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        fmt = lambda t: t.strftime("%H:%M") if t else ""
+        return {
+            "quiet_start": fmt(self.quiet_start), "quiet_end": fmt(self.quiet_end),
+            "daily_cap": self.daily_cap, "jitter": self.jitter,
+            "jitter_min": self.jitter_min, "jitter_max": self.jitter_max,
+            "burst_size": self.burst_size, "pause_min": self.pause_min, "pause_max": self.pause_max,
+        }
+
+    # ─── Gaps ───
+
+    def draw_jitter(self) -> float:
+        lo, hi = self.jitter_min, self.jitter_max
+        if self.jitter == "normal":
+            # Centered on the range, ~95% of draws inside it before clamping
+            value = random.gauss((lo + hi) / 2, (hi - lo) / 4)
+        elif self.jitter == "exponential":
+            # Mostly short gaps with an occasional long one
+            value = lo + random.expovariate(3 / (hi - lo)) if hi > lo else lo
+        else:
+            value = random.uniform(lo, hi)
+        return min(hi, max(lo, value))
+
+    def pause_after(self, burst_count: int) -> Tuple[float, str]:
+        """Gap after a send: ("batch") pause once `burst_count` reaches burst_size, else ("jitter")."""
+        if burst_count >= self.burst_size:
+            return random.uniform(self.pause_min, self.pause_max), "batch"
+        return self.draw_jitter(), "jitter"
+
+    def mean_interval(self, min_interval: float = 0.0) -> float:
+        """Average seconds per message, bursts and pauses included; never below `min_interval`."""
+        if self.jitter == "exponential" and self.jitter_max > self.jitter_min:
+            span = self.jitter_max - self.jitter_min
+            jitter = self.jitter_min + span / 3 * (1 - math.exp(-3))  # mean of the clamped draw
+        else:
+            jitter = (self.jitter_min + self.jitter_max) / 2
+        pause = (self.pause_min + self.pause_max) / 2
+        cycle = ((self.burst_size - 1) * jitter + pause) / self.burst_size
+        return max(cycle, min_interval)
+
+    # ─── Windows ───
+
+    def is_quiet(self, t: datetime) -> bool:
+        if self.quiet_start is None:
+            return False
+        now = t.time()
+        if self.quiet_start < self.quiet_end:
+            return self.quiet_start <= now < self.quiet_end
+        return now >= self.quiet_start or now < self.quiet_end
+
+    def _quiet_ends(self, t: datetime) -> datetime:
+        end = datetime.combine(t.date(), self.quiet_end)
+        return end if end > t else end + timedelta(days=1)
+
+    def _window_closes(self, t: datetime) -> datetime:
+        """When the open window containing `t` ends: next quiet start or midnight, whichever is first."""
+        midnight = datetime.combine(t.date() + timedelta(days=1), dtime())
+        if self.quiet_start is None:
+            return midnight
+        start = datetime.combine(t.date(), self.quiet_start)
+        if start <= t:
+            start += timedelta(days=1)
+        return min(start, midnight)
+
+    def next_window(self, t: datetime, sent_today: int) -> Tuple[datetime, Optional[str]]:
+        """
+        Earliest time >= t a message may go out, and why it is later than t
+        ("quiet" or "daily_cap"; None if t itself is allowed). `sent_today` is
+        the count for t's day.
+        """
+        reason, day = None, t.date()
+        while True:
+            if t.date() != day:
+                day, sent_today = t.date(), 0
+            if self.daily_cap and sent_today >= self.daily_cap:
+                t, reason = datetime.combine(day + timedelta(days=1), dtime()), reason or "daily_cap"
+                continue
+            if self.is_quiet(t):
+                t, reason = self._quiet_ends(t), reason or "quiet"
+                continue
+            return t, reason
+
+    def eta(self, now: datetime, remaining: int, sent_today: int = 0, min_interval: float = 0.0) -> Optional[datetime]:
+        """
+        Projected time of the last send for `remaining` messages from `now`,
+        at the average interval, honouring quiet hours and the daily cap.
+        """
+        if remaining <= 0:
+            return None
+        step = self.mean_interval(min_interval)
+        t, day, used = now, now.date(), sent_today
+        while True:
+            t, _ = self.next_window(t, used if t.date() == day else 0)
+            if t.date() != day:
+                day, used = t.date(), 0
+            closes = self._window_closes(t)
+            fits = int((closes - t).total_seconds() // step) + 1 if step else remaining
+            n = min(remaining, fits, self.daily_cap - used if self.daily_cap else remaining)
+            remaining -= n
+            used += n
+            if remaining == 0:
+                return t + timedelta(seconds=step * (n - 1))
+            # Window filled or daily cap hit: continue from the next open window
+            t = closes
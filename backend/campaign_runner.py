@@ -1,213 +1,903 @@
 import asyncio
-import random
+import os
 import json
 import logging
-from datetime import datetime
+import re
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import String, func, insert, literal, or_
 from sqlalchemy.orm import Session
-from models import Campaign, Lead, FollowUp, get_wib_now
+from campaign_pacing import PacingPolicy
+from database import SessionLocal
+from event_stream import EventBus
+from message_pregen import (
+    SENDABLE_MESSAGE_STATES, TARGET_MODELS, ensure_pregeneration, is_generating,
+    load_recipients, recipient_data, render_template,
+)
+from models import Campaign, CampaignSend, Lead, FollowUp, get_wib_now
+from wa_gateway import wa_gateway
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class CampaignRunner:
-    def __init__(self):
-        self.is_running = False
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+LEASE_SECONDS = int(os.getenv("CAMPAIGN_LEASE_SECONDS", "120"))
+# Sends (and their recipients) fetched per query as the cursor advances
+PAGE_SIZE = int(os.getenv("CAMPAIGN_PAGE_SIZE", "20"))
+# Follow-ups, status changes and counters are written in bulk this often / at this many results
+FLUSH_SECONDS = float(os.getenv("CAMPAIGN_FLUSH_SECONDS", "10"))
+FLUSH_SIZE = int(os.getenv("CAMPAIGN_FLUSH_SIZE", "10"))
+# How many campaigns may run side by side in this process
+MAX_CONCURRENT_CAMPAIGNS = int(os.getenv("CAMPAIGN_MAX_CONCURRENT", "5"))
+# Per-device send budget, shared by every campaign using the device
+DEVICE_MIN_INTERVAL = float(os.getenv("FONNTE_DEVICE_MIN_INTERVAL", "10"))
+DEVICE_HOURLY_LIMIT = int(os.getenv("FONNTE_DEVICE_HOURLY_LIMIT", "120"))
+
+
+def audience_query(db: Session, campaign: Campaign):
+    """
+    Ids of the campaign's targets (Lead or Prospect per target_type), filtered
+    by target_criteria: all, high_score, low_score, not_contacted or won.
+    Returns (target_type, query).
+    """
+    target_type = "prospect" if campaign.target_type == "prospects" else "lead"
+    model = TARGET_MODELS[target_type]
+    criteria = json.loads(campaign.target_criteria or '{}')
+    kind = criteria.get("type", "all")
+    query = db.query(model.id)
+    
+    # Application of Filter Logic
+    # "high_score": Score > 75
+    if kind == "high_score":
+        query = query.filter(model.match_score >= 75)
+    elif kind == "low_score":
+        query = query.filter(model.match_score < 50)
+    elif kind == "not_contacted":
+        query = query.filter(model.wa_contacted_at.is_(None))
+    
+    if kind == "won":
+        query = query.filter(model.status == "won")
+    else:
+        # Exclude already won/lost to prevent spam
+        query = query.filter(model.status.notin_(["won", "lost"]))
+    return target_type, query
+
+
+def materialize_audience(db: Session, campaign: Campaign) -> int:
+    """
+    Snapshot the target audience as pending send records with a single
+    INSERT ... SELECT — ids never pass through Python. Smart AI campaigns get
+    their drafts queued for pre-generation.
+    """
+    target_type, query = audience_query(db, campaign)
+    model = TARGET_MODELS[target_type]
+    snapshot = query.with_entities(
+        literal(campaign.id),
+        literal(target_type),
+        model.id,
+        func.row_number().over(order_by=model.id) - 1,
+        literal("pending"),
+        literal(0),
+        literal("queued" if campaign.smart_ai else None, type_=String),
+        literal(get_wib_now()),
+        literal(get_wib_now()),
+    )
+    result = db.execute(
+        insert(CampaignSend).from_select(
+            ["campaign_id", "target_type", "target_id", "position", "state", "attempt",
+             "message_state", "created_at", "updated_at"],
+            snapshot,
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+class Clock:
+    """
+    Time source for the runner: WIB wall clock, monotonic time and a
+    stop-aware sleep. campaign_sim swaps in a virtual clock.
+    """
+
+    def now(self) -> datetime:
+        return get_wib_now()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float, stop_event: Optional[asyncio.Event] = None):
+        """Sleep that wakes early when `stop_event` is set."""
+        if stop_event is None:
+            await asyncio.sleep(seconds)
+            return
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+class FonnteDevice:
+    """One Fonnte token (= one WhatsApp number) and its rolling send budget."""
+
+    def __init__(self, name: str, token: Optional[str]):
+        self.name = name
+        self.token = token
+        self.next_free = 0.0            # monotonic time the device may send again
+        self.window = deque()           # monotonic timestamps of sends in the last hour
+        self.sent = 0
+        self.failed = 0
+
+    def wait_time(self, now: float) -> float:
+        while self.window and now - self.window[0] >= 3600:
+            self.window.popleft()
+        wait = max(0.0, self.next_free - now)
+        if len(self.window) >= DEVICE_HOURLY_LIMIT:
+            wait = max(wait, self.window[0] + 3600 - now)
+        return wait
+
+    def reserve(self, now: float):
+        self.next_free = now + DEVICE_MIN_INTERVAL
+        self.window.append(now)
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "name": self.name,
+            "sent": self.sent,
+            "failed": self.failed,
+            "last_hour": len(self.window),
+            "hourly_limit": DEVICE_HOURLY_LIMIT,
+            "available_in_s": round(self.wait_time(now), 1),
+        }
+
+
+DEVICE_NAME = re.compile(r"^[A-Za-z_][\w-]*$")
+
+
+class DevicePool:
+    """
+    Fonnte devices from FONNTE_TOKENS (comma separated, optionally `name=token`),
+    falling back to the single FONNTE_TOKEN / `fonnte_token` setting. Campaigns draw from whichever
+    device frees up first, so throughput grows with the number of devices.
+    """
+
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.devices: List[FonnteDevice] = []
+        self._lock = asyncio.Lock()
+        raw = os.getenv("FONNTE_TOKENS") or os.getenv("FONNTE_TOKEN", "")
+        for i, entry in enumerate(t.strip() for t in raw.split(",")):
+            if not entry:
+                continue
+            name, sep, token = entry.partition("=")
+            # `name=token` only with a plain name and a real token; "abc==" (base64 padding) is a token
+            if not (sep and DEVICE_NAME.match(name) and token.strip("=")):
+                name, token = f"device-{i + 1}", entry
+            self.devices.append(FonnteDevice(name, token))
+        if not self.devices:
+            # No env tokens: one device whose token the gateway resolves from Settings
+            self.devices.append(FonnteDevice("default", None))
+
+    def reserve_now(self) -> FonnteDevice:
+        """Pick the device with the most headroom without waiting (one-off sends)."""
+        now = self.clock.monotonic()
+        device = min(self.devices, key=lambda d: (d.wait_time(now), len(d.window)))
+        device.reserve(now)
+        return device
+
+    async def acquire(self, stop_event: asyncio.Event) -> Optional[FonnteDevice]:
+        """Wait for the first device with budget left. Returns None if stopped meanwhile."""
+        while not stop_event.is_set():
+            async with self._lock:
+                now = self.clock.monotonic()
+                device = min(self.devices, key=lambda d: (d.wait_time(now), len(d.window)))
+                wait = device.wait_time(now)
+                if wait <= 0:
+                    device.reserve(now)
+                    return device
+            await self.clock.sleep(min(wait, 5.0), stop_event)
+        return None
+
+    @property
+    def min_interval(self) -> float:
+        """Fastest sustained seconds per message the pool allows (all devices combined)."""
+        per_device = max(DEVICE_MIN_INTERVAL, 3600 / DEVICE_HOURLY_LIMIT if DEVICE_HOURLY_LIMIT else 0)
+        return per_device / len(self.devices)
+
+    def snapshot(self) -> list:
+        now = self.clock.monotonic()
+        return [d.snapshot(now) for d in self.devices]
+
+
+class ResultBuffer:
+    """
+    Write-behind for the side effects of campaign sends: FollowUps, target
+    status (new -> contacted, wa_contacted_at) and the campaign's sent/failed
+    counters. Results are already durable on the send log; flush() applies
+    the effects of every result not yet `recorded` and flags them in the same
+    transaction, so each is applied exactly once — including results a
+    crashed run left behind. Flushes every FLUSH_SECONDS or FLUSH_SIZE results,
+    from the timer task and in an executor thread, so the event loop (other
+    campaigns, SSE, the API) never waits on it.
+    """
+
+    def __init__(self, campaign_id: int, campaign_name: str, session_factory, clock: Clock,
+                 db_in_executor: bool = True):
+        self.campaign_id = campaign_id
+        self.campaign_name = campaign_name
+        self.Session = session_factory
+        self.clock = clock
+        self.db_in_executor = db_in_executor
+        self.unflushed = 0
+        self._due = asyncio.Event()
+        self._lock = threading.Lock()  # one flush at a time (timer vs. final flush)
+
+    def add(self):
+        self.unflushed += 1
+        if self.unflushed >= FLUSH_SIZE:
+            self._due.set()
+
+    async def flush_async(self) -> int:
+        if not self.db_in_executor:
+            return self.flush()
+        return await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    async def run_timer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._due.wait(), timeout=FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._due.clear()
+            if self.unflushed:
+                try:
+                    await self.flush_async()
+                except Exception as e:
+                    logger.warning(f"Results flush failed for campaign {self.campaign_id}: {e}")
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self.unflushed = self.unflushed, 0
+            try:
+                return self._apply()
+            except Exception:
+                self.unflushed += pending or 1
+                raise
+
+    def _apply(self) -> int:
+        with self.Session() as db:
+            rows = db.query(
+                CampaignSend.id, CampaignSend.target_type, CampaignSend.target_id,
+                CampaignSend.state, CampaignSend.sent_at,
+            ).filter(
+                CampaignSend.campaign_id == self.campaign_id,
+                CampaignSend.state.in_(["sent", "failed"]),
+                or_(CampaignSend.recorded.is_(False), CampaignSend.recorded.is_(None)),
+            ).with_for_update().all()
+            if not rows:
+                return 0
+
+            sent = [r for r in rows if r.state == "sent"]
+            now = self.clock.now()
+            if sent:
+                db.execute(insert(FollowUp), [
+                    {("prospect_id" if r.target_type == "prospect" else "lead_id"): r.target_id,
+                     "type": "wa_campaign", "note": f"Sent via Campaign: {self.campaign_name}",
+                     "status": "done", "created_at": r.sent_at or now, "updated_at": now}
+                    for r in sent
+                ])
+                for target_type, model in TARGET_MODELS.items():
+                    ids = [r.target_id for r in sent if r.target_type == target_type]
+                    if not ids:
+                        continue
+                    db.query(model).filter(model.id.in_(ids), model.status == "new").update(
+                        {"status": "contacted"}, synchronize_session=False)
+                    db.query(model).filter(model.id.in_(ids), model.wa_contacted_at.is_(None)).update(
+                        {"wa_contacted_at": now}, synchronize_session=False)
+
+            db.query(Campaign).filter(Campaign.id == self.campaign_id).update({
+                "sent_count": func.coalesce(Campaign.sent_count, 0) + len(sent),
+                "failed_count": func.coalesce(Campaign.failed_count, 0) + len(rows) - len(sent),
+            }, synchronize_session=False)
+            db.query(CampaignSend).filter(CampaignSend.id.in_([r.id for r in rows])).update(
+                {"recorded": True}, synchronize_session=False)
+            db.commit()
+            return len(rows)
+
+
+class CampaignRun:
+    """One running campaign: its own pacing, counters, logs and stop flag."""
+
+    def __init__(self, manager: "CampaignRunner", campaign_id: int):
+        self.manager = manager
+        self.campaign_id = campaign_id
+        self.clock = manager.clock
+        self.Session = manager.Session
         self.stop_event = asyncio.Event()
-        self.status = {
-            "state": "idle",  # idle, running, paused, completed, error
-            "campaign_id": None,
+        self.started_at = self.clock.now()
+        self._logs = deque(maxlen=50)
+        self._last_error = None
+        self.results: Optional[ResultBuffer] = None
+        self.policy = PacingPolicy()
+        self._day = None
+        self._sent_today = 0
+        self._remaining = 0
+        self._state = {
+            "state": "running",  # running, paused, completed, error, idle
+            "campaign_id": campaign_id,
             "total": 0,
             "sent": 0,
             "failed": 0,
             "current_lead": None,
             "next_batch_at": None,
-            "logs": []
+            "eta": None,
         }
 
+    @property
+    def status(self) -> dict:
+        return {**self._state, "logs": list(self._logs)}
+
+    def _counters(self) -> dict:
+        return {k: self._state[k] for k in ("campaign_id", "total", "sent", "failed", "eta")}
+
+    def _emit(self, type: str, **data):
+        self.manager.events.publish(type, {**self._counters(), **data})
+
+    def _set_state(self, state: str):
+        self._state["state"] = state
+        self._emit("state", state=state)
+
     def _log(self, message: str):
-        """Add log to in-memory status and system logger."""
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        """Add log to in-memory status, event stream and system logger."""
+        timestamp = self.clock.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
-        self.status["logs"].append(log_entry)
-        # Keep only last 50 logs
-        if len(self.status["logs"]) > 50:
-            self.status["logs"].pop(0)
-        logger.info(message)
+        self._logs.append(log_entry)
+        self.manager.events.publish("log", {"campaign_id": self.campaign_id, "line": log_entry})
+        if not self.manager.simulated:
+            logger.info(f"[campaign {self.campaign_id}] {message}")
+
+    # ─── Run lease ───
+    # A campaign is run by at most one process: the runner holds a lease on
+    # the campaign row and renews it while running. A crashed runner's lease
+    # simply expires, after which the campaign can be resumed elsewhere.
+
+    def _acquire_lease(self, db: Session, campaign_id: int) -> bool:
+        now = get_wib_now()
+        claimed = db.query(Campaign).filter(
+            Campaign.id == campaign_id,
+            or_(
+                Campaign.runner_id.is_(None),
+                Campaign.runner_id == RUNNER_ID,
+                Campaign.lease_expires_at < now,
+            ),
+        ).update(
+            {"runner_id": RUNNER_ID, "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS)},
+            synchronize_session=False,
+        )
+        db.commit()
+        return claimed == 1
+
+    def _release_lease(self, db: Session, campaign_id: int):
+        db.query(Campaign).filter(
+            Campaign.id == campaign_id, Campaign.runner_id == RUNNER_ID
+        ).update({"runner_id": None, "lease_expires_at": None}, synchronize_session=False)
+        db.commit()
 
-    async def run_campaign(self, db: Session, campaign_id: int):
+    async def _renew_lease(self, campaign_id: int):
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            db = self.Session()
+            try:
+                db.query(Campaign).filter(
+                    Campaign.id == campaign_id, Campaign.runner_id == RUNNER_ID
+                ).update(
+                    {"lease_expires_at": get_wib_now() + timedelta(seconds=LEASE_SECONDS)},
+                    synchronize_session=False,
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Lease renewal failed for campaign {campaign_id}: {e}")
+            finally:
+                db.close()
+
+    # ─── Send log ───
+    # Every step below uses its own short-lived session: nothing (session,
+    # identity map, transaction) is held across sends or sleeps.
+
+    def _recover_interrupted(self, db: Session, campaign_id: int) -> int:
         """
-        Execute a campaign securely with random delays and batching.
+        Sends left in `sending` by a crash may or may not have reached Fonnte.
+        They are marked failed rather than retried, so nobody gets a duplicate.
         """
-        if self.is_running:
-            self._log("⚠️ Campaign already running. Stop it first.")
-            return
+        recovered = db.query(CampaignSend).filter(
+            CampaignSend.campaign_id == campaign_id, CampaignSend.state == "sending"
+        ).update(
+            {"state": "failed", "error": "Interrupted mid-send; not retried to avoid a duplicate"},
+            synchronize_session=False,
+        )
+        db.commit()
+        return recovered
 
-        self.is_running = True
-        self.stop_event.clear()
-        self.status = {
-            "state": "running",
-            "campaign_id": campaign_id,
-            "total": 0,
-            "sent": 0,
-            "failed": 0,
-            "current_lead": None,
-            "next_batch_at": None,
-            "logs": []
-        }
+    def _load_counts(self, db: Session, campaign_id: int):
+        counts = dict(
+            db.query(CampaignSend.state, func.count(CampaignSend.id))
+            .filter(CampaignSend.campaign_id == campaign_id)
+            .group_by(CampaignSend.state).all()
+        )
+        self._state["total"] = sum(counts.values())
+        self._state["sent"] = counts.get("sent", 0)
+        self._state["failed"] = counts.get("failed", 0)
+        return counts.get("pending", 0)
 
-        try:
-            campaign = db.query(Campaign).filter(Campaign.id == campaign_id).first()
-            if not campaign:
-                self._log("❌ Campaign not found.")
-                self.is_running = False
-                self.status["state"] = "error"
-                return
-
-            self._log(f"🚀 Starting Campaign: {campaign.name}")
-            campaign.status = "running"
+    def _has_pending(self) -> bool:
+        with self.Session() as db:
+            return db.query(CampaignSend.id).filter(
+                CampaignSend.campaign_id == self.campaign_id, CampaignSend.state == "pending"
+            ).first() is not None
+
+    def _fetch_page(self, drafts_only: bool) -> List[dict]:
+        """
+        Next PAGE_SIZE pending sends in position order (with drafts_only, only
+        those whose AI draft is done), each with its recipient's fields.
+        """
+        with self.Session() as db:
+            query = db.query(CampaignSend).filter(
+                CampaignSend.campaign_id == self.campaign_id, CampaignSend.state == "pending"
+            )
+            if drafts_only:
+                query = query.filter(CampaignSend.message_state.in_(SENDABLE_MESSAGE_STATES))
+            sends = query.order_by(CampaignSend.position.asc()).limit(PAGE_SIZE).all()
+            recipients = load_recipients(db, sends)
+            return [
+                {"send_id": send.id, "target_type": send.target_type, "target_id": send.target_id,
+                 "recipient": recipients.get((send.target_type, send.target_id))}
+                for send in sends
+            ]
+
+    def _claim_send(self, send_id: int) -> Optional[dict]:
+        """
+        Mark a send in-flight before calling Fonnte, so a crash can't cause a
+        re-send. Returns its current draft, or None if it is no longer pending
+        (e.g. skipped during review after the page was fetched).
+        """
+        with self.Session() as db:
+            send = db.query(CampaignSend).filter(
+                CampaignSend.id == send_id, CampaignSend.state == "pending"
+            ).first()
+            if send is None:
+                return None
+            send.state = "sending"
+            send.attempt = (send.attempt or 0) + 1
+            db.commit()
+            return {"message": send.message}
+
+    def _record_result(self, target: dict, success: bool):
+        """
+        Persist the outcome on the send log right away (that is what prevents
+        re-sends); follow-ups, status and counters go through the results buffer.
+        """
+        with self.Session() as db:
+            values = {"state": "sent", "sent_at": self.clock.now()} if success \
+                else {"state": "failed", "error": self._last_error}
+            db.query(CampaignSend).filter(CampaignSend.id == target["send_id"]).update(
+                {**values, "recorded": False}, synchronize_session=False
+            )
             db.commit()
+        self.results.add()
 
-            # 1. Fetch Targets
-            criteria = json.loads(campaign.target_criteria or '{}')
-            query = db.query(Lead)
-            
-            # Application of Filter Logic
-            # "high_score": Score > 75
-            if criteria.get("type") == "high_score":
-                query = query.filter(Lead.match_score >= 75)
-            
-            # Exclude already won/lost to prevent spam
-            query = query.filter(Lead.status.notin_(["won", "lost"]))
-            
-            leads = query.all()
-            self.status["total"] = len(leads)
-            self._log(f"🎯 Target Audience: {len(leads)} leads.")
+    # ─── Pacing ───
+
+    def _load_sent_today(self, db: Session):
+        now = self.clock.now()
+        self._day = now.date()
+        self._sent_today = db.query(func.count(CampaignSend.id)).filter(
+            CampaignSend.campaign_id == self.campaign_id,
+            CampaignSend.state == "sent",
+            CampaignSend.sent_at >= datetime.combine(self._day, datetime.min.time()),
+        ).scalar() or 0
+
+    def _roll_day(self, now: datetime):
+        if now.date() != self._day:
+            self._day, self._sent_today = now.date(), 0
+
+    def _update_eta(self):
+        now = self.clock.now()
+        self._roll_day(now)
+        eta = self.policy.eta(now, self._remaining, self._sent_today, self.manager.devices.min_interval)
+        self._state["eta"] = eta.isoformat(timespec="seconds") if eta else None
+
+    async def _wait_for_window(self) -> bool:
+        """Sleep through quiet hours / a reached daily cap. Returns True if it slept."""
+        now = self.clock.now()
+        self._roll_day(now)
+        open_at, reason = self.policy.next_window(now, self._sent_today)
+        if reason is None:
+            return False
+        seconds = (open_at - now).total_seconds()
+        until = open_at.isoformat()
+        self._state["next_batch_at"] = until
+        if reason == "quiet":
+            self._log(f"🌙 Quiet hours: resuming at {open_at:%a %H:%M} WIB.")
+        else:
+            self._log(f"🧮 Daily cap of {self.policy.daily_cap} reached: resuming at {open_at:%a %H:%M} WIB.")
+        self._emit("sleeping", kind=reason, seconds=round(seconds), until=until)
+        await self._sleep(seconds)
+        return True
+
+    async def _sleep(self, seconds: float):
+        """Sleep that wakes early when the campaign is stopped."""
+        await self.clock.sleep(seconds, self.stop_event)
+
+    def _finish(self, status: str):
+        with self.Session() as db:
+            db.query(Campaign).filter(Campaign.id == self.campaign_id).update(
+                {"status": status}, synchronize_session=False
+            )
+            db.commit()
+
+    async def run(self):
+        """
+        Execute the campaign securely with random delays and batching.
+        Every recipient has a campaign_sends row, so a restarted or relaunched
+        campaign continues at the first pending recipient instead of
+        re-sending to everyone. Targets are fetched a page at a time.
+        """
+        campaign_id = self.campaign_id
+        self._emit("state", state="running")
+
+        lease_task = None
+        flush_task = None
+        leased = False
+        try:
+            with self.Session() as db:
+                if not self._acquire_lease(db, campaign_id):
+                    self._log("⚠️ Campaign is already being run by another process.")
+                    self._set_state("error")
+                    return
+                leased = True
+                lease_task = asyncio.create_task(self._renew_lease(campaign_id))
+
+                campaign = db.query(Campaign).filter(Campaign.id == campaign_id).first()
+                if not campaign:
+                    self._log("❌ Campaign not found.")
+                    self._set_state("error")
+                    return
+
+                campaign.status = "running"
+                db.commit()
+                campaign_name = campaign.name
+                self.results = ResultBuffer(campaign_id, campaign_name, self.Session, self.clock,
+                                            db_in_executor=self.manager.db_in_executor)
+                template = campaign.message_template
+                smart_ai = bool(campaign.smart_ai)
+                try:
+                    self.policy = PacingPolicy.from_json(campaign.pacing)
+                except ValueError as e:
+                    self._log(f"⚠️ Invalid pacing policy ({e}); using defaults.")
+                audience = "prospects" if campaign.target_type == "prospects" else "leads"
+
+                # 1. Snapshot targets on first run (or at prepare); resume from the send log afterwards
+                if db.query(CampaignSend.id).filter(CampaignSend.campaign_id == campaign_id).first() is None:
+                    self._log(f"🚀 Starting Campaign: {campaign_name}")
+                    total = materialize_audience(db, campaign)
+                    self._log(f"🎯 Target Audience: {total} {audience}.")
+                elif not db.query(CampaignSend.id).filter(
+                    CampaignSend.campaign_id == campaign_id, CampaignSend.state != "pending"
+                ).first():
+                    self._log(f"🚀 Starting Campaign: {campaign_name}")
+                else:
+                    interrupted = self._recover_interrupted(db, campaign_id)
+                    self._log(f"🔁 Resuming Campaign: {campaign_name}")
+                    if interrupted:
+                        self._log(f"⚠️ {interrupted} send(s) were interrupted mid-flight and marked failed.")
+                pending = self._load_counts(db, campaign_id)
+                self._log(f"📋 {pending} recipient(s) pending, {self._state['sent']} already sent.")
+                self._remaining = pending
+                self._load_sent_today(db)
+            self._update_eta()
+            if self._state["eta"]:
+                self._log(f"🗓️ Estimated finish: {self._state['eta'].replace('T', ' ')} WIB.")
+
+            # Apply side effects of results a crashed run sent but never recorded
+            replayed = await self.results.flush_async()
+            if replayed:
+                self._log(f"🧾 Recorded {replayed} result(s) left over from the previous run.")
+            flush_task = asyncio.create_task(self.results.run_timer())
+
+            # 2. Smart AI: drafts are generated ahead of the cursor, never inline
+            if smart_ai and not self.manager.simulated:
+                ensure_pregeneration(campaign_id)
+            waiting_for_drafts = False
 
             batch_count = 0
-            BATCH_SIZE = 10 
+            stopped = False
+            page: List[dict] = []
 
-            for i, lead in enumerate(leads):
+            while True:
                 if self.stop_event.is_set():
                     self._log("🛑 Campaign stopped by user.")
+                    stopped = True
                     break
 
-                self.status["current_lead"] = lead.title
-                
-                # In real production, this would call Fonnte/WAbot API
-                # For Phase 23, we use the real Fonnte integration
-                success = await self._send_via_fonnte(lead, campaign.message_template, smart_ai=campaign.smart_ai)
+                if not page:
+                    page = self._fetch_page(drafts_only=smart_ai)
+                if not page:
+                    if not smart_ai or not self._has_pending():
+                        break
+                    # Only reached when sending outpaces generation (e.g. right after launch)
+                    if not waiting_for_drafts:
+                        self._log("🧠 Waiting for AI drafts to be ready...")
+                        waiting_for_drafts = True
+                    if not is_generating(campaign_id) and not self.manager.simulated:
+                        ensure_pregeneration(campaign_id)
+                    await self._sleep(2)
+                    continue
+                waiting_for_drafts = False
+
+                # Outside the send window: sleep until it opens, then re-read the page
+                if await self._wait_for_window():
+                    batch_count = 0
+                    page = []
+                    continue
+
+                target = page[0]
+                recipient = target["recipient"]
+                # Wait for a device before claiming: a stop (or crash) during the wait
+                # must leave the recipient pending, not fail a message never sent
+                device = None
+                if recipient and recipient.get("phone"):
+                    device = await self.manager.devices.acquire(self.stop_event)
+                    if device is None:
+                        continue
+                page.pop(0)
+                claimed = self._claim_send(target["send_id"])
+                if claimed is None:
+                    continue
+
+                self._last_error = None
+                if recipient:
+                    self._state["current_lead"] = recipient["name"]
+                    if smart_ai and claimed["message"]:
+                        message = claimed["message"]
+                    else:
+                        # Template campaigns, or a draft that failed to generate
+                        message = render_template(template, recipient)
+                    success = await self.manager.send(recipient, message, run=self, device=device)
+                else:
+                    success, self._last_error = False, f"{target['target_type'].title()} no longer exists"
                 
+                self._record_result(target, success)
+                self._remaining = max(0, self._remaining - 1)
+                if success:
+                    self._sent_today += 1
+                self._update_eta()
+                name = recipient["name"] if recipient else None
+                phone = recipient["phone"] if recipient else None
                 if success:
-                    self.status["sent"] += 1
-                    # Record as FollowUp
-                    followup = FollowUp(
-                        lead_id=lead.id,
-                        type="wa_campaign",
-                        note=f"Sent via Campaign: {campaign.name}",
-                        status="done",
-                        created_at=get_wib_now()
-                    )
-                    db.add(followup)
-                    db.commit()
+                    self._state["sent"] += 1
+                    self._emit("sent", lead_id=target["target_id"], target_type=target["target_type"],
+                               name=name, phone=phone)
                 else:
-                    self.status["failed"] += 1
+                    self._state["failed"] += 1
+                    self._emit("failed", lead_id=target["target_id"], target_type=target["target_type"],
+                               name=name, phone=phone, reason=self._last_error)
 
                 batch_count += 1
+                has_more = bool(page) or self._has_pending()
+                if not has_more:
+                    break
 
-                # SMART BATCHING: Sleep 5-10 mins after every 10 messages
-                if batch_count >= BATCH_SIZE and i < len(leads) - 1:
-                    sleep_time = random.uniform(300, 600) # 5-10 mins
-                    minutes = int(sleep_time / 60)
-                    self.status["next_batch_at"] = datetime.now().isoformat()
-                    self._log(f"☕ Human Break: Sleeping for {minutes} mins to avoid blocking...")
-                    await asyncio.sleep(sleep_time)
-                    batch_count = 0 
+                # SMART BATCHING: a longer pause after every burst, jitter in between (per policy)
+                delay, kind = self.policy.pause_after(batch_count)
+                wake_at = (self.clock.now() + timedelta(seconds=delay)).isoformat()
+                if kind == "batch":
+                    self._state["next_batch_at"] = wake_at
+                    self._log(f"☕ Human Break: Sleeping for {int(delay / 60)} mins to avoid blocking...")
+                    batch_count = 0
                 else:
-                    # RANDOM JITTER: Sleep 15-45s between messages
-                    delay = random.uniform(15, 45)
                     self._log(f"⏳ Waiting {int(delay)}s before next...")
-                    await asyncio.sleep(delay)
+                self._emit("sleeping", kind=kind, seconds=round(delay), until=wake_at)
+                await self._sleep(delay)
 
-            campaign.status = "completed"
-            db.commit()
-            self._log("✅ Campaign Completed Successfully.")
+            if stopped:
+                self._finish("paused")
+                self._log("⏸️ Campaign paused. Launch it again to resume where it stopped.")
+                self._set_state("paused")
+            else:
+                self._finish("completed")
+                self._log("✅ Campaign Completed Successfully.")
+                self._set_state("completed")
 
         except Exception as e:
             self._log(f"❌ Error: {str(e)}")
-            self.status["state"] = "error"
+            self._set_state("error")
+            if leased:
+                # Off `running`, or resume_interrupted would restart the same failure on every boot
+                try:
+                    self._finish("paused")
+                    self._log("⏸️ Campaign paused after the error. Launch it again to resume where it stopped.")
+                except Exception as finish_error:
+                    logger.warning(f"Could not pause campaign {campaign_id} after an error: {finish_error}")
+        finally:
+            if flush_task:
+                flush_task.cancel()
+            if self.results:
+                try:
+                    await self.results.flush_async()
+                except Exception as e:
+                    logger.warning(f"Final results flush failed for campaign {campaign_id}: {e}")
+            if lease_task:
+                lease_task.cancel()
+            if leased:
+                try:
+                    with self.Session() as db:
+                        self._release_lease(db, campaign_id)
+                except Exception as e:
+                    logger.warning(f"Lease release failed for campaign {campaign_id}: {e}")
+            self._set_state("idle")
+
+    def stop(self):
+        """Request to stop the campaign."""
+        if not self.stop_event.is_set():
+            self.stop_event.set()
+            self._log("🛑 Stop verified. Finishing current step...")
+
+
+class CampaignRunner:
+    """
+    Runs up to CAMPAIGN_MAX_CONCURRENT campaigns at once. Each campaign keeps
+    its own pacing; they all share the Fonnte device pool and one event bus
+    (every event carries its campaign_id).
+    """
+
+    def __init__(self, clock: Optional[Clock] = None, session_factory=None, transport=None, simulated: bool = False,
+                 db_in_executor: bool = True):
+        # Clock, DB sessions and the Fonnte transport are injectable so
+        # campaign_sim can run the real loop on a virtual clock.
+        self.clock = clock or Clock()
+        self.Session = session_factory or SessionLocal
+        self.transport = transport or wa_gateway
+        self.simulated = simulated
+        # Bulk result flushes go to an executor thread; off for single-connection databases
+        self.db_in_executor = db_in_executor
+        # Event bus: log/state/sent/failed/sleeping events, streamed via SSE.
+        # Sequence numbers survive across campaigns so clients can resume.
+        self.events = EventBus(maxlen=1000)
+        self.devices = DevicePool(self.clock)
+        self.runs: Dict[int, CampaignRun] = {}
+        # Called with the campaign id whenever a run ends (the scheduler uses it to fill the slot)
+        self.on_run_finished: Optional[Callable[[int], None]] = None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self.runs)
+
+    def is_campaign_running(self, campaign_id: int) -> bool:
+        return campaign_id in self.runs
+
+    @property
+    def has_capacity(self) -> bool:
+        return len(self.runs) < MAX_CONCURRENT_CAMPAIGNS
+
+    @property
+    def status(self) -> dict:
+        """
+        Snapshot for /api/campaigns/status: every active campaign plus device
+        budgets. The top-level fields mirror the most recently started
+        campaign for single-campaign clients.
+        """
+        campaigns = [run.status for run in sorted(self.runs.values(), key=lambda r: r.started_at)]
+        latest = campaigns[-1] if campaigns else {
+            "state": "idle", "campaign_id": None, "total": 0, "sent": 0, "failed": 0,
+            "current_lead": None, "next_batch_at": None, "logs": [],
+        }
+        return {
+            **latest,
+            "campaigns": campaigns,
+            "devices": self.devices.snapshot(),
+            "max_concurrent": MAX_CONCURRENT_CAMPAIGNS,
+            "last_seq": self.events.last_seq,
+        }
+
+    def _reserve(self, campaign_id: int) -> Optional[CampaignRun]:
+        """Take a runner slot for the campaign synchronously, so back-to-back starts can't overbook."""
+        if campaign_id in self.runs:
+            logger.warning(f"Campaign {campaign_id} already running.")
+            return None
+        if not self.has_capacity:
+            logger.warning(f"Campaign {campaign_id} not started: {MAX_CONCURRENT_CAMPAIGNS} campaigns already running.")
+            return None
+        run = CampaignRun(self, campaign_id)
+        self.runs[campaign_id] = run
+        return run
+
+    async def _execute(self, run: CampaignRun):
+        try:
+            await run.run()
+        finally:
+            self.runs.pop(run.campaign_id, None)
+            if self.on_run_finished:
+                self.on_run_finished(run.campaign_id)
+
+    async def run_campaign(self, campaign_id: int):
+        run = self._reserve(campaign_id)
+        if run:
+            await self._execute(run)
+
+    def start_campaign(self, campaign_id: int) -> Optional[asyncio.Task]:
+        """Start a campaign in the background; None if it is already running or no slot is free."""
+        run = self._reserve(campaign_id)
+        return asyncio.create_task(self._execute(run)) if run else None
+
+    async def resume_interrupted(self):
+        """
+        Resume campaigns left in `running` by a restart. Waits for a dead
+        runner's lease to expire first; the run re-checks the lease, so a
+        campaign another process already picked up is left alone.
+        """
+        db = self.Session()
+        try:
+            rows = db.query(Campaign.id, Campaign.lease_expires_at).filter(
+                Campaign.status == "running"
+            ).order_by(Campaign.id.asc()).limit(MAX_CONCURRENT_CAMPAIGNS).all()
         finally:
-            self.is_running = False
-            self.status["state"] = "idle"
+            db.close()
+
+        async def resume(campaign_id, lease_expires_at):
+            if lease_expires_at:
+                wait = (lease_expires_at - get_wib_now()).total_seconds()
+                if wait > 0:
+                    await asyncio.sleep(wait + 1)
+            logger.info(f"Resuming interrupted campaign {campaign_id}")
+            await self.run_campaign(campaign_id)
 
-    async def _send_via_fonnte(self, lead: Lead, template: str, smart_ai: bool = False):
+        await asyncio.gather(*(resume(*row) for row in rows))
+
+    async def send(self, recipient: dict, message: str, run: Optional["CampaignRun"] = None,
+                   device: Optional[FonnteDevice] = None):
         """
         Send a real message via Fonnte API.
-        If smart_ai=True, generate a unique message for this recipient.
+        `recipient` is a recipient_data() dict (lead or prospect).
+        Campaign sends pass the device they waited for; one-off sends take
+        whichever device has the most headroom right now.
         """
-        import os
-        token = os.getenv("FONNTE_TOKEN")
-        if not token:
-            self._log("❌ FONNTE_TOKEN not found in environment.")
+        log = run._log if run else logger.info
+        fail = lambda reason: setattr(run, "_last_error", reason) if run else None
+
+        # Validation: Must have phone
+        if not recipient.get("phone"):
+            log("⚠️ No phone number, skipped.")
+            fail("No phone number")
             return False
 
-        try:
-            message = ""
-            if smart_ai:
-                from ai_scorer import generate_personalized_message
-                # Convert lead to dict for the AI function
-                lead_data = {
-                    "name": lead.title,
-                    "company": lead.company,
-                    "category": getattr(lead, 'category', ''),
-                    "address": getattr(lead, 'location', ''),
-                    "has_website": getattr(lead, 'has_website', True),
-                    "phone": lead.phone
-                }
-                self._log(f"🧠 AI is crafting a unique message for {lead.company or lead.title}...")
-                message = await generate_personalized_message(lead_data)
-            else:
-                # Standard template replacement
-                message = template.replace("{name}", lead.title or "Partner") \
-                                  .replace("{company}", lead.company or "")
-            
-            self._log(f"📤 Sending to {lead.phone or 'No Phone'} ({lead.company})...")
-            
-            # Validation: Must have phone
-            if not lead.phone:
-                self._log("⚠️ No phone number, skipped.")
-                return False
-
-            # Fonnte API Request
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.fonnte.com/send",
-                    headers={"Authorization": token},
-                    data={
-                        "target": lead.phone,
-                        "message": message,
-                        "countryCode": "62", # Default to ID
-                    },
-                    timeout=20.0 # Increase timeout for AI lag potentially
-                )
-                
-                res_data = response.json()
-                if response.status_code == 200 and res_data.get("status"):
-                    return True
-                else:
-                    self._log(f"⚠️ Fonnte Error: {res_data.get('reason', 'Unknown error')}")
-                    return False
+        if device is None:
+            device = self.devices.reserve_now()
 
-        except Exception as e:
-            self._log(f"⚠️ Failed to send: {str(e)}")
-            return False
+        log(f"📤 Sending to {recipient['phone']} ({recipient.get('company')}) via {device.name}...")
 
-    def stop(self):
-        """Request to stop the campaign."""
-        if self.is_running:
-            self.stop_event.set()
-            self._log("🛑 Stop verified. Finishing current step...")
+        result = await self.transport.send(recipient["phone"], message, token=device.token)
+        if result["success"]:
+            device.sent += 1
+            return True
+        device.failed += 1
+        log(f"⚠️ Fonnte Error: {result['error']}")
+        fail(result["error"])
+        return False
+
+    async def _send_via_fonnte(self, lead: Lead, template: str):
+        """One-off send outside a campaign (used by /api/send-wa)."""
+        recipient = recipient_data("lead", lead)
+        return await self.send(recipient, render_template(template, recipient))
+
+    def stop(self, campaign_id: Optional[int] = None):
+        """Request to stop one campaign, or every running campaign."""
+        for run in list(self.runs.values()):
+            if campaign_id is None or run.campaign_id == campaign_id:
+                run.stop()
 
 # Global Runner Instance
 campaign_runner = CampaignRunner()
@@ -0,0 +1,141 @@
+"""
+Scheduled campaign dispatcher.
+
+Campaigns with a `scheduled_at` sit in status `scheduled` until they are due.
+The dispatcher reads the earliest due time from the (status, scheduled_at)
+index and sleeps until then — or until it is nudged because a schedule was
+created or changed, or a runner slot freed up. Nothing is kept in memory
+between wake-ups, so a restart simply recomputes due work from the database
+(campaigns that fell due while the process was down start right away).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Optional, Set
+
+from sqlalchemy import func
+
+from campaign_runner import MAX_CONCURRENT_CAMPAIGNS, CampaignRunner, campaign_runner
+from database import SessionLocal
+from models import Campaign, get_wib_now
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on a single sleep, so schedules written by another process are still picked up
+SCHEDULER_MAX_SLEEP = float(os.getenv("CAMPAIGN_SCHEDULER_MAX_SLEEP", "300"))
+
+# Statuses a schedule may be (re)applied to; running/completed campaigns keep theirs
+SCHEDULABLE_STATUSES = ("draft", "scheduled", "paused")
+
+
+def apply_schedule(campaign: Campaign):
+    """Set status from scheduled_at: `scheduled` while one is set, back to `draft` once cleared."""
+    if (campaign.status or "draft") not in SCHEDULABLE_STATUSES:
+        return
+    if campaign.scheduled_at is not None:
+        campaign.status = "scheduled"
+    elif campaign.status == "scheduled":
+        campaign.status = "draft"
+
+
+class CampaignScheduler:
+    def __init__(self, runner: CampaignRunner, session_factory=None):
+        self.runner = runner
+        self.Session = session_factory or SessionLocal
+        self._wake = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+        self.next_due: Optional[datetime] = None
+        self.launched = 0
+        runner.on_run_finished = lambda campaign_id: self.nudge()
+
+    def nudge(self):
+        """Re-read the schedule now (a campaign was scheduled, rescheduled or a slot freed)."""
+        self._wake.set()
+
+    def _claim_due(self, now: datetime, limit: int) -> list:
+        """
+        Move due campaigns from `scheduled` to `running`, earliest first. The
+        conditional UPDATE makes the claim exclusive across processes; a claimed
+        campaign that never starts is picked up by resume_interrupted.
+        """
+        db = self.Session()
+        try:
+            due = db.query(Campaign.id, Campaign.scheduled_at).filter(
+                Campaign.status == "scheduled", Campaign.scheduled_at <= now
+            ).order_by(Campaign.scheduled_at.asc()).limit(limit).all()
+            claimed = []
+            for campaign_id, scheduled_at in due:
+                updated = db.query(Campaign).filter(
+                    Campaign.id == campaign_id, Campaign.status == "scheduled"
+                ).update({"status": "running"}, synchronize_session=False)
+                if updated:
+                    claimed.append((campaign_id, scheduled_at))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _unclaim(self, campaign_id: int):
+        db = self.Session()
+        try:
+            db.query(Campaign).filter(Campaign.id == campaign_id, Campaign.status == "running").update(
+                {"status": "scheduled"}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _next_due(self) -> Optional[datetime]:
+        db = self.Session()
+        try:
+            return db.query(func.min(Campaign.scheduled_at)).filter(Campaign.status == "scheduled").scalar()
+        finally:
+            db.close()
+
+    def _launch(self, campaign_id: int, scheduled_at: datetime, now: datetime):
+        late = (now - scheduled_at).total_seconds()
+        suffix = f" ({int(late // 60)} min late)" if late >= 60 else ""
+        task = self.runner.start_campaign(campaign_id)
+        if task is None:
+            if not self.runner.is_campaign_running(campaign_id):
+                self._unclaim(campaign_id)
+            return
+        logger.info(f"⏰ Started scheduled campaign {campaign_id}{suffix}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.launched += 1
+
+    async def run(self, stop_event: asyncio.Event):
+        logger.info("⏰ Campaign scheduler started")
+        loop = asyncio.get_running_loop()
+        while not stop_event.is_set():
+            self._wake.clear()
+            try:
+                now = get_wib_now()
+                free = MAX_CONCURRENT_CAMPAIGNS - len(self.runner.runs)
+                if free > 0:
+                    for campaign_id, scheduled_at in await loop.run_in_executor(None, self._claim_due, now, free):
+                        self._launch(campaign_id, scheduled_at, now)
+                self.next_due = await loop.run_in_executor(None, self._next_due)
+            except Exception as e:
+                logger.warning(f"⚠️ Campaign scheduler error: {e}")
+                self.next_due = None
+
+            # Sleep until the next due time; with no free slot, until a run finishes
+            timeout = SCHEDULER_MAX_SLEEP
+            if self.next_due is not None and self.runner.has_capacity:
+                timeout = min(timeout, max(0.0, (self.next_due - get_wib_now()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "next_due": self.next_due.isoformat(timespec="seconds") if self.next_due else None,
+            "launched": self.launched,
+        }
+
+
+campaign_scheduler = CampaignScheduler(campaign_runner)
@@ -0,0 +1,233 @@
+"""
+Campaign dry-run simulator.
+
+Runs the real CampaignRun loop over a campaign's real audience, but on a
+virtual clock (every jitter / batch / device sleep returns instantly and
+just advances time) and with a fake Fonnte transport. The campaign, its send
+log and its targets are copied into a throwaway in-memory SQLite database, so
+the live tables are never written.
+
+Reports projected duration, messages per hour and the time-of-day spread,
+next to the pacing engine's up-front ETA so the estimate can be checked.
+
+Usage:
+    python campaign_sim.py --campaign 3 --failure-rate 0.05 --runs 5
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from campaign_pacing import PacingPolicy
+from campaign_runner import CampaignRunner, Clock, audience_query, materialize_audience
+from database import SessionLocal
+from message_pregen import TARGET_MODELS
+from models import Base, Campaign, CampaignSend, get_wib_now
+from wa_gateway import normalize_phone
+
+COPY_CHUNK = 500
+
+
+class VirtualClock(Clock):
+    """Clock whose sleeps advance virtual time instead of waiting."""
+
+    def __init__(self, start: datetime):
+        self.start = start
+        self.elapsed = 0.0
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+    def advance(self, seconds: float):
+        self.elapsed += max(0.0, seconds)
+
+    async def sleep(self, seconds: float, stop_event: Optional[asyncio.Event] = None):
+        if stop_event is not None and stop_event.is_set():
+            return
+        self.advance(seconds)
+        await asyncio.sleep(0)  # still yield, so the API stays responsive
+
+
+class FakeTransport:
+    """Stands in for wa_gateway: records sends at virtual time, fails at `failure_rate`."""
+
+    def __init__(self, clock: VirtualClock, failure_rate: float = 0.0, latency: float = 1.0):
+        self.clock = clock
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.sends = []  # (virtual time, success)
+
+    async def send(self, target: str, message: str = "", token: Optional[str] = None, **kwargs) -> dict:
+        self.clock.advance(self.latency)
+        phone = normalize_phone(target)
+        success = phone is not None and random.random() >= self.failure_rate
+        self.sends.append((self.clock.now(), success))
+        if success:
+            return {"success": True, "detail": "simulated", "target": phone}
+        return {"success": False, "detail": "simulated", "error": "Simulated failure", "target": phone}
+
+
+def _copy_rows(source, sim, model, *criteria):
+    table = model.__table__
+    chunk = []
+    for row in source.query(model).filter(*criteria).yield_per(COPY_CHUNK):
+        chunk.append({attr.columns[0].name: getattr(row, attr.key) for attr in model.__mapper__.column_attrs})
+        if len(chunk) >= COPY_CHUNK:
+            sim.execute(insert(table), chunk)
+            chunk = []
+    if chunk:
+        sim.execute(insert(table), chunk)
+
+
+def build_sim_db(campaign_id: int):
+    """In-memory copy of the campaign, its send log and its targets. Returns (sessionmaker, engine)."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Sim = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db, Sim() as sim:
+        campaign = db.query(Campaign).filter(Campaign.id == campaign_id).first()
+        if not campaign:
+            raise ValueError("Campaign not found")
+        _copy_rows(db, sim, Campaign, Campaign.id == campaign_id)
+        sim.query(Campaign).update({"runner_id": None, "lease_expires_at": None, "status": "draft"})
+
+        has_sends = db.query(CampaignSend.id).filter(CampaignSend.campaign_id == campaign_id).first() is not None
+        if has_sends:
+            _copy_rows(db, sim, CampaignSend, CampaignSend.campaign_id == campaign_id)
+            for target_type, model in TARGET_MODELS.items():
+                ids = db.query(CampaignSend.target_id).filter(
+                    CampaignSend.campaign_id == campaign_id, CampaignSend.target_type == target_type
+                )
+                _copy_rows(db, sim, model, model.id.in_(ids.scalar_subquery()))
+        else:
+            target_type, ids = audience_query(db, campaign)
+            model = TARGET_MODELS[target_type]
+            _copy_rows(db, sim, model, model.id.in_(ids.scalar_subquery()))
+            materialize_audience(sim, sim.query(Campaign).first())
+
+        # No model calls in a dry run: AI drafts fall back to the template
+        sim.query(CampaignSend).filter(
+            CampaignSend.state == "pending", CampaignSend.message_state.isnot(None)
+        ).update({"message_state": "ready"}, synchronize_session=False)
+        sim.commit()
+    return Sim, engine
+
+
+def _human(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m" if days else f"{hours}h {minutes}m"
+
+
+async def simulate_campaign(
+    campaign_id: int,
+    failure_rate: float = 0.0,
+    latency: float = 1.0,
+    start: Optional[datetime] = None,
+) -> dict:
+    """
+    Dry-run a campaign (remaining pending sends only) and report the projection.
+    The simulation does its SQLite work synchronously, so it runs on its own
+    event loop in a worker thread; the caller's loop (the API) keeps serving.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, lambda: asyncio.run(_simulate(campaign_id, failure_rate, latency, start))
+    )
+
+
+async def _simulate(campaign_id: int, failure_rate: float, latency: float, start: Optional[datetime]) -> dict:
+    Sim, engine = build_sim_db(campaign_id)
+    try:
+        clock = VirtualClock(start or get_wib_now())
+        transport = FakeTransport(clock, failure_rate=failure_rate, latency=latency)
+        # One shared in-memory connection (StaticPool): keep all DB work on this thread
+        runner = CampaignRunner(clock=clock, session_factory=Sim, transport=transport, simulated=True,
+                                db_in_executor=False)
+        with Sim() as sim:
+            pacing = sim.query(Campaign.pacing).scalar()
+            pending = sim.query(CampaignSend).filter(CampaignSend.state == "pending").count()
+        try:
+            policy = PacingPolicy.from_json(pacing)
+        except ValueError:
+            policy = PacingPolicy()
+        eta = policy.eta(clock.now(), pending, 0, runner.devices.min_interval)
+
+        wall_start = time.perf_counter()
+        await runner.run_campaign(campaign_id)
+        wall = time.perf_counter() - wall_start
+
+        duration = clock.elapsed
+        attempts = len(transport.sends)
+        sent = sum(1 for _, ok in transport.sends if ok)
+        errors = [e["data"].get("line") for e in runner.events.since(0)
+                  if e["type"] == "log" and "❌" in e["data"].get("line", "")]
+        return {
+            "campaign_id": campaign_id,
+            "attempts": attempts,
+            "sent": sent,
+            "failed": attempts - sent,
+            "start": clock.start.isoformat(timespec="seconds"),
+            "projected_end": clock.now().isoformat(timespec="seconds"),
+            "projected_duration_s": round(duration),
+            "projected_duration": _human(duration),
+            "messages_per_hour": round(attempts / (duration / 3600), 1) if duration else 0.0,
+            "pacing": policy.to_dict(),
+            "pacing_eta": eta.isoformat(timespec="seconds") if eta else None,
+            "eta_error_s": round((clock.now() - eta).total_seconds()) if eta else None,
+            "by_hour": dict(sorted(Counter(f"{t.hour:02d}:00" for t, _ in transport.sends).items())),
+            "by_day": dict(sorted(Counter(t.date().isoformat() for t, _ in transport.sends).items())),
+            "errors": errors,
+            "simulation_ms": round(wall * 1000, 1),
+        }
+    finally:
+        engine.dispose()
+
+
+def _print_report(report: dict):
+    print(f"Campaign {report['campaign_id']}: {report['attempts']} sends "
+          f"({report['sent']} ok, {report['failed']} failed)")
+    print(f"Start -> end:  {report['start']} -> {report['projected_end']}")
+    print(f"Duration:      {report['projected_duration']} ({report['messages_per_hour']} msg/h)")
+    if report["pacing_eta"]:
+        print(f"Pacing ETA:    {report['pacing_eta']} (simulation {report['eta_error_s']:+d}s)")
+    print("By hour (WIB): " + ", ".join(f"{h} {n}" for h, n in report["by_hour"].items()))
+    print(f"Simulated in:  {report['simulation_ms']} ms")
+    for line in report["errors"]:
+        print(f"  {line}")
+
+
+async def _main(args):
+    start = datetime.fromisoformat(args.start) if args.start else None
+    durations = []
+    for _ in range(args.runs):
+        report = await simulate_campaign(args.campaign, args.failure_rate, args.latency, start)
+        durations.append(report["projected_duration_s"])
+        _print_report(report)
+        print()
+    if args.runs > 1:
+        print(f"Over {args.runs} runs: mean {_human(statistics.mean(durations))}, "
+              f"min {_human(min(durations))}, max {_human(max(durations))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dry-run a campaign on a virtual clock")
+    parser.add_argument("--campaign", type=int, required=True)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=1.0, help="Simulated seconds per Fonnte call")
+    parser.add_argument("--start", help="Virtual start time in WIB, e.g. 2026-10-20T08:00")
+    parser.add_argument("--runs", type=int, default=1, help="Repeat to see the spread caused by jitter")
+    args = parser.parse_args()
+    asyncio.run(_main(args))
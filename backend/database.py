@@ -1,18 +1,168 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from models import Base
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-engine = create_engine(DATABASE_URL)
+# Pool tuning (env overridable). Defaults sized for a single API worker plus
+# background scraper/campaign tasks sharing the same engine.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Connections checked out longer than this are reported as "long held"
+DB_LONG_HOLD_SECONDS = float(os.getenv("DB_LONG_HOLD_SECONDS", "30"))
+
+
+class PoolStats:
+    """Thread-safe counters for pool checkouts, wait time and hold time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.long_holds = 0
+        self.active = {}  # id(connection_record) -> checkout timestamp
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_checkout(self, key: int):
+        with self._lock:
+            self.checkouts += 1
+            self.active[key] = time.monotonic()
+
+    def record_checkin(self, key: int):
+        with self._lock:
+            started = self.active.pop(key, None)
+            self.checkins += 1
+            if started is None:
+                return None
+            held = time.monotonic() - started
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+            if held > DB_LONG_HOLD_SECONDS:
+                self.long_holds += 1
+            return held
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            held_now = sorted((now - t for t in self.active.values()), reverse=True)
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 2),
+                "hold_avg_ms": round(self.hold_total / self.checkins * 1000, 2) if self.checkins else 0.0,
+                "hold_max_ms": round(self.hold_max * 1000, 2),
+                "long_holds_total": self.long_holds,
+                "long_held_now": [round(s, 1) for s in held_now if s > DB_LONG_HOLD_SECONDS],
+                "long_hold_threshold_s": DB_LONG_HOLD_SECONDS,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a free connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+def _engine_kwargs(url: str) -> dict:
+    # SQLite (local dev) keeps SQLAlchemy's default pool; sizing args don't apply.
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.incr("connects")
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.record_checkout(id(connection_record))
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    held = pool_stats.record_checkin(id(connection_record))
+    if held is not None and held > DB_LONG_HOLD_SECONDS:
+        logger.warning(f"DB connection held for {held:.1f}s (threshold {DB_LONG_HOLD_SECONDS:.0f}s)")
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.incr("invalidations")
+
+
+def get_pool_metrics() -> dict:
+    """Current pool usage plus cumulative checkout/wait/hold statistics."""
+    pool = engine.pool
+    metrics = {
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        metrics.update({"max_overflow": DB_MAX_OVERFLOW, "timeout_s": DB_POOL_TIMEOUT})
+    metrics.update(pool_stats.snapshot())
+    return metrics
+
+
 def init_db():
     Base.metadata.create_all(bind=engine)
 
@@ -0,0 +1,170 @@
+"""
+In-process event bus + Server-Sent Events helpers.
+
+In-process producers (campaign runner) publish small dict events into a
+bounded ring buffer; every event gets a monotonically increasing sequence
+number. SSE clients stream everything after the last sequence they saw, so a
+reconnect (EventSource sends Last-Event-ID automatically) resumes without
+losing events as long as they are still in the buffer. Events persisted by
+other processes (scrape jobs) are streamed with sse_poll_stream instead.
+"""
+import asyncio
+import itertools
+import json
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+KEEPALIVE_SECONDS = 15
+
+
+class EventBus:
+    """Bounded ring buffer of sequenced events with async wake-up for readers."""
+
+    def __init__(self, maxlen: int = 500):
+        self._events = deque(maxlen=maxlen)
+        self._seq = 0
+        self._waiter = asyncio.Event()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def first_seq(self) -> int:
+        return self._events[0]["seq"] if self._events else self._seq + 1
+
+    def publish(self, type: str, data: Optional[dict] = None) -> dict:
+        """Append an event and wake every waiting subscriber. Must run on the event loop thread."""
+        self._seq += 1
+        event = {
+            "seq": self._seq,
+            "type": type,
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "data": data or {},
+        }
+        self._events.append(event)
+        waiter, self._waiter = self._waiter, asyncio.Event()
+        waiter.set()
+        return event
+
+    def clear(self):
+        """Drop buffered events. Sequence numbers keep increasing."""
+        self._events.clear()
+
+    def since(self, seq: int) -> List[dict]:
+        """Events with sequence number greater than `seq`, oldest first."""
+        if not self._events or seq >= self._seq:
+            return []
+        start = max(0, seq - self._events[0]["seq"] + 1)
+        return list(itertools.islice(self._events, start, None))
+
+    async def wait_since(self, seq: int, timeout: float) -> List[dict]:
+        """Return new events after `seq`, waiting up to `timeout` seconds for one to arrive."""
+        events = self.since(seq)
+        if events:
+            return events
+        waiter = self._waiter
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.since(seq)
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def sse_stream(
+    bus: EventBus,
+    last_seq: int,
+    is_disconnected: Callable,
+    stop_when: Optional[Callable[[dict], bool]] = None,
+) -> AsyncIterator[str]:
+    """
+    Yield SSE frames for events after `last_seq` until the client disconnects
+    (or `stop_when(event)` returns True). A `gap` event is sent first if the
+    requested position already fell out of the ring buffer.
+    """
+    if 0 < last_seq < bus.first_seq - 1:
+        yield format_sse({
+            "seq": last_seq,
+            "type": "gap",
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "data": {"missed": bus.first_seq - 1 - last_seq},
+        })
+    yield "retry: 3000\n\n"
+
+    while True:
+        if await is_disconnected():
+            return
+        events = await bus.wait_since(last_seq, KEEPALIVE_SECONDS)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            last_seq = event["seq"]
+            yield format_sse(event)
+            if stop_when and stop_when(event):
+                return
+
+
+async def sse_poll_stream(
+    fetch: Callable[[int], List[dict]],
+    last_seq: int,
+    is_disconnected: Callable,
+    interval: float = 0.5,
+    stop_when: Optional[Callable[[dict], bool]] = None,
+) -> AsyncIterator[str]:
+    """
+    Like sse_stream, but for events persisted elsewhere (e.g. a DB table
+    written by another process): `fetch(seq)` returns events after `seq`.
+    """
+    yield "retry: 3000\n\n"
+    idle = 0.0
+    while True:
+        if await is_disconnected():
+            return
+        events = await asyncio.get_running_loop().run_in_executor(None, fetch, last_seq)
+        for event in events:
+            last_seq = event["seq"]
+            yield format_sse(event)
+            if stop_when and stop_when(event):
+                return
+        if events:
+            idle = 0.0
+            continue
+        idle += interval
+        if idle >= KEEPALIVE_SECONDS:
+            idle = 0.0
+            yield ": keepalive\n\n"
+        await asyncio.sleep(interval)
+
+
+def resume_seq(request: Request, since: Optional[int] = None) -> int:
+    """
+    Resume position from the Last-Event-ID header or ?since= (0 = from start).
+    The header wins: the browser only sends it when reconnecting, and by then
+    it is further along than the ?since= the stream was first opened with.
+    """
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    if last_event_id.isdigit():
+        return int(last_event_id)
+    return since if since is not None else 0
+
+
+def sse_response(bus: EventBus, request: Request, since: Optional[int] = None) -> StreamingResponse:
+    """StreamingResponse for `bus`, resuming from ?since= or the Last-Event-ID header."""
+    return sse_streaming_response(sse_stream(bus, resume_seq(request, since), request.is_disconnected))
+
+
+def sse_streaming_response(frames: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
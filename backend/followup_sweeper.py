@@ -0,0 +1,92 @@
+"""
+Overdue follow-up sweeper.
+
+Every FOLLOWUP_SWEEP_SECONDS, pending follow-ups whose next_follow_date has
+passed and that were not reported yet are read with one query on the
+(status, next_follow_date) index and sent as a single Telegram digest.
+Reported rows get overdue_notified_at so the next sweep skips them;
+rescheduling a follow-up clears it. Rows are claimed before the digest is
+queued (safe with several API processes); delivery retries are left to the
+Telegram notification outbox.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from database import SessionLocal
+from models import FollowUp, Lead, Prospect, get_wib_now
+import telegram_notifier
+
+logger = logging.getLogger(__name__)
+
+FOLLOWUP_SWEEP_SECONDS = float(os.getenv("FOLLOWUP_SWEEP_SECONDS", "3600"))
+# Follow-ups listed by name in one digest; the rest are counted
+DIGEST_MAX_ITEMS = int(os.getenv("FOLLOWUP_DIGEST_MAX_ITEMS", "30"))
+# Upper bound on follow-ups claimed per sweep
+SWEEP_LIMIT = int(os.getenv("FOLLOWUP_SWEEP_LIMIT", "1000"))
+
+
+def _claim_overdue(now: datetime):
+    """Claim unreported overdue follow-ups. Returns (ids, digest items) most overdue first."""
+    db = SessionLocal()
+    try:
+        today = now.date()
+        rows = db.query(
+            FollowUp.id, FollowUp.type, FollowUp.next_follow_date,
+            Lead.title.label("lead_title"), Prospect.name.label("prospect_name"),
+        ).outerjoin(Lead, FollowUp.lead_id == Lead.id).outerjoin(
+            Prospect, FollowUp.prospect_id == Prospect.id
+        ).filter(
+            FollowUp.status == "pending",
+            FollowUp.next_follow_date < today,
+            FollowUp.overdue_notified_at.is_(None),
+        ).order_by(FollowUp.next_follow_date.asc(), FollowUp.id.asc()).limit(SWEEP_LIMIT).all()
+        if not rows:
+            return [], []
+
+        claimed = db.query(FollowUp).filter(
+            FollowUp.id.in_([r.id for r in rows]), FollowUp.overdue_notified_at.is_(None)
+        ).update({"overdue_notified_at": now}, synchronize_session=False)
+        db.commit()
+        if claimed != len(rows):
+            # Another process claimed some of them in between: keep only ours
+            ours = {fid for (fid,) in db.query(FollowUp.id).filter(
+                FollowUp.id.in_([r.id for r in rows]), FollowUp.overdue_notified_at == now
+            )}
+            rows = [r for r in rows if r.id in ours]
+        items = [
+            (r.lead_title or r.prospect_name, r.type, (today - r.next_follow_date).days)
+            for r in rows
+        ]
+        return [r.id for r in rows], items
+    finally:
+        db.close()
+
+
+async def sweep_overdue() -> int:
+    """Send one digest for newly overdue follow-ups. Returns how many were reported."""
+    if not telegram_notifier.is_configured():
+        return 0
+    loop = asyncio.get_running_loop()
+    now = get_wib_now()
+    ids, items = await loop.run_in_executor(None, _claim_overdue, now)
+    if not ids:
+        return 0
+
+    # Queued; a failed send is kept in the notification outbox and retried from there
+    await telegram_notifier.notify_overdue_digest(items[:DIGEST_MAX_ITEMS], len(items))
+    logger.info(f"⏰ Reported {len(ids)} overdue follow-up(s) to Telegram")
+    return len(ids)
+
+
+async def sweeper_loop(stop_event: asyncio.Event):
+    while not stop_event.is_set():
+        try:
+            await sweep_overdue()
+        except Exception as e:
+            logger.warning(f"⚠️ Overdue sweep failed: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=FOLLOWUP_SWEEP_SECONDS)
+        except asyncio.TimeoutError:
+            pass
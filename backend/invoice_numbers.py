@@ -0,0 +1,51 @@
+"""
+Invoice number allocation (INV-YYYYMM-NNN).
+
+Each month has a counter row in invoice_counters. A number is taken with one
+INSERT ... ON CONFLICT DO UPDATE ... RETURNING, which creates or bumps the
+row atomically, so concurrent creates never collide and no retry is needed.
+The counter is bumped in the caller's transaction: the row stays locked
+until the invoice commits, and a rolled-back invoice gives its number back.
+Numbers are never reused after a delete.
+"""
+import re
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import InvoiceCounter, get_wib_now
+
+INVOICE_NUMBER = re.compile(r"^INV-(\d{6})-(\d+)$")
+
+
+def _upsert(db: Session):
+    return (postgresql if db.bind.dialect.name == "postgresql" else sqlite).insert(InvoiceCounter)
+
+
+def allocate_invoice_number(db: Session, now: Optional[datetime] = None) -> str:
+    """Next number for the current WIB month, e.g. INV-202610-007."""
+    period = (now or get_wib_now()).strftime("%Y%m")
+    stmt = _upsert(db).values(period=period, last_number=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[InvoiceCounter.period],
+        set_={"last_number": InvoiceCounter.last_number + 1},
+    ).returning(InvoiceCounter.last_number)
+    number = db.execute(stmt).scalar_one()
+    return f"INV-{period}-{number:03d}"
+
+
+def reserve_invoice_number(db: Session, invoice_number: str):
+    """Keep the counter ahead of a manually entered number in the INV-YYYYMM-NNN format."""
+    match = INVOICE_NUMBER.match(invoice_number or "")
+    if not match:
+        return
+    period, number = match.group(1), int(match.group(2))
+    stmt = _upsert(db).values(period=period, last_number=number)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[InvoiceCounter.period],
+        set_={"last_number": number},
+        where=InvoiceCounter.last_number < number,
+    )
+    db.execute(stmt)
@@ -1,16 +1,34 @@
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Request, Response, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db, get_db, SessionLocal
-from sqlalchemy.orm import Session
+from database import init_db, get_db, SessionLocal, get_pool_metrics
+from sqlalchemy.orm import Session, make_transient_to_detached
 from sqlalchemy import or_, and_, func, desc
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta
 import asyncio
+import json
 import os
-from auth import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from models import User, Lead, Setting, Prospect, PromotionTemplate, Campaign
+from auth import verify_password_async, get_password_hash, create_access_token, create_stream_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM, token_user_cache, STREAM_TOKEN_SCOPE, STREAM_TOKEN_EXPIRE_SECONDS
+from jose import JWTError, jwt
+from models import User, Lead, Setting, Prospect, PromotionTemplate, Campaign, CampaignSend, ScrapeJob, ScrapeJobEvent
 import schemas
-from typing import List
+from event_stream import sse_response, sse_poll_stream, sse_streaming_response, resume_seq
+from campaign_pacing import PacingPolicy
+from campaign_runner import campaign_runner, materialize_audience
+from campaign_scheduler import apply_schedule, campaign_scheduler
+from campaign_sim import simulate_campaign
+from message_pregen import ensure_pregeneration, is_generating as is_drafting, load_recipients
+from wa_gateway import wa_gateway
+from followup_sweeper import sweeper_loop as followup_sweeper_loop
+from telegram_notifier import telegram
+from activity_log import activity_log
+from activity_retention import retention_loop as activity_retention_loop
+from scrape_worker import (
+    enqueue_job as enqueue_scrape_job, request_cancel as request_scrape_cancel,
+    job_to_dict as scrape_job_to_dict, fetch_events as fetch_scrape_events, worker_loop as scrape_worker_loop,
+    ACTIVE_STATES as ACTIVE_SCRAPE_STATES, TERMINAL_STATES as TERMINAL_SCRAPE_STATES,
+)
+from typing import List, Optional
 
 app = FastAPI(title="Velora Jobs API")
 
@@ -50,6 +68,46 @@ def on_startup():
     finally:
         db.close()
 
+# Run a scrape worker inside the API process unless dedicated workers are deployed
+SCRAPE_WORKER_EMBEDDED = os.getenv("SCRAPE_WORKER_EMBEDDED", "true").lower() in ("1", "true", "yes")
+_background_stop = asyncio.Event()
+
+# Seconds the loops get to finish their current step on shutdown before they are cancelled
+BACKGROUND_SHUTDOWN_GRACE = float(os.getenv("BACKGROUND_SHUTDOWN_GRACE", "10"))
+
+@app.on_event("startup")
+async def start_background_workers():
+    # Keep references: the event loop only holds weak ones, and shutdown has to await them
+    tasks = app.state.background_tasks = []
+    if SCRAPE_WORKER_EMBEDDED:
+        tasks.append(asyncio.create_task(scrape_worker_loop(_background_stop)))
+    # Pick up campaigns that were running when the process last stopped
+    tasks.append(asyncio.create_task(campaign_runner.resume_interrupted()))
+    # Start scheduled campaigns when they fall due (recomputed from the DB)
+    tasks.append(asyncio.create_task(campaign_scheduler.run(_background_stop)))
+    # Telegram digest of follow-ups that went overdue
+    tasks.append(asyncio.create_task(followup_sweeper_loop(_background_stop)))
+    # Retry Telegram notifications saved to the outbox
+    tasks.append(asyncio.create_task(telegram.run_outbox(_background_stop)))
+    # Bulk-insert buffered activity log entries
+    tasks.append(asyncio.create_task(activity_log.run(_background_stop)))
+    # Archive and prune activity logs past the retention window
+    tasks.append(asyncio.create_task(activity_retention_loop(_background_stop)))
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    _background_stop.set()
+    campaign_scheduler.nudge()
+    tasks = getattr(app.state, "background_tasks", [])
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=BACKGROUND_SHUTDOWN_GRACE)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await wa_gateway.aclose()
+    await telegram.aclose()
+    await activity_log.aclose()
+
 # Configure CORS
 import os
 origins = os.getenv("CORS_ORIGINS", "*").split(",")
@@ -61,32 +119,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    from jose import JWTError, jwt
-    from auth import SECRET_KEY, ALGORITHM
-    
+def _resolve_user(token: str, db: Session, scope: str = None) -> User:
+    """
+    User for a token. Access tokens carry no scope; stream tokens (scope
+    "stream") are only accepted where `scope` asks for them, and vice versa.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
+
+    # Fast path: access token already verified and resolved recently. The user
+    # is attached to this request's session without a SELECT, so handlers can
+    # lazy-load or merge it like a queried one.
+    cached = token_user_cache.get(token) if scope is None else None
+    if cached:
+        user_id, email = cached
+        user = User(id=user_id, email=email, is_active=True)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
         
     user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    if user is None or user.is_active is False:
         raise credentials_exception
+    if scope is None:
+        token_user_cache.put(token, user.id, user.email, payload.get("exp"))
     return user
 
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return _resolve_user(token, db)
+
+async def get_stream_user(request: Request, token: str = None):
+    """
+    Auth for SSE endpoints: EventSource can't set headers, so ?token= is also
+    accepted — but only with a stream token from /api/stream-token, never the
+    access token itself. Uses its own short session (a get_db one would hold a
+    pooled connection for as long as the stream is open) and returns the user
+    detached.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    with SessionLocal() as db:
+        if auth_header.lower().startswith("bearer "):
+            return _resolve_user(auth_header[7:], db)
+        return _resolve_user(token, db, scope=STREAM_TOKEN_SCOPE)
+
 @app.post("/api/login")
 async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -99,6 +190,11 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/api/stream-token")
+async def stream_token(current_user: User = Depends(get_current_user)):
+    """Short-lived token for the ?token= parameter of SSE endpoints."""
+    return {"token": create_stream_token(current_user.email), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
 @app.get("/")
 async def root():
     return {"message": "Velora Jobs API is running"}
@@ -107,41 +203,96 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/api/metrics")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """Runtime metrics: DB connection pool usage, wait and hold times; WhatsApp send latency and errors."""
+    return {"db_pool": get_pool_metrics(), "wa_gateway": wa_gateway.metrics()}
+
 # ──────────────────────────────────────────────
-# GLOBAL SCRAPER STATE
+# SCRAPE JOB QUEUE (state lives in scrape_jobs, run by scrape_worker.py)
 # ──────────────────────────────────────────────
-SCRAPER_LOGS = []
-SCRAPER_RUNNING = False
-SCRAPER_INTERRUPT = None # Will hold asyncio.Event
+
+def _scrape_events_since(job_id: int, since: int):
+    db = SessionLocal()
+    try:
+        return fetch_scrape_events(db, job_id, since)
+    finally:
+        db.close()
 
 @app.get("/api/scrape/status")
-async def scrape_status(current_user: User = Depends(get_current_user)):
+async def scrape_status(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    active = db.query(ScrapeJob).filter(ScrapeJob.state.in_(ACTIVE_SCRAPE_STATES)).count()
+    job = db.query(ScrapeJob).order_by(ScrapeJob.id.desc()).first()
+    logs = []
+    if job:
+        recent = db.query(ScrapeJobEvent).filter(
+            ScrapeJobEvent.job_id == job.id, ScrapeJobEvent.type == "log"
+        ).order_by(ScrapeJobEvent.seq.desc()).limit(50).all()
+        logs = [json.loads(e.data)["line"] for e in reversed(recent)]
+    last_seq = (job.event_seq or 0) if job else 0
     return {
-        "running": SCRAPER_RUNNING,
-        "logs": SCRAPER_LOGS[-50:] # Return last 50 lines
+        "running": active > 0,
+        "active_jobs": active,
+        "logs": logs, # Last 50 lines of the latest job
+        "last_seq": last_seq, # Event seq of the latest job, for /api/scrape/stream?since=
+        "job": scrape_job_to_dict(job) if job else None,
     }
 
+@app.get("/api/scrape/stream")
+async def scrape_stream(
+    request: Request,
+    job_id: int,
+    since: int = None,
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    SSE stream of one scrape job's events: `log` (one line), `progress`
+    (source, found, saved, dupes) and `status` (job state). Ends when the job
+    finishes. Sequence numbers are per job; resume with ?since=<seq> or
+    Last-Event-ID.
+    """
+    stop_when = lambda e: e["type"] == "status" and e["data"].get("state") in TERMINAL_SCRAPE_STATES
+    frames = sse_poll_stream(
+        lambda seq: _scrape_events_since(job_id, seq),
+        resume_seq(request, since),
+        request.is_disconnected,
+        stop_when=stop_when,
+    )
+    return sse_streaming_response(frames)
+
+@app.get("/api/scrape/jobs")
+async def list_scrape_jobs(limit: int = 20, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    jobs = db.query(ScrapeJob).order_by(ScrapeJob.id.desc()).limit(limit).all()
+    return [scrape_job_to_dict(j) for j in jobs]
+
+@app.get("/api/scrape/jobs/{job_id}")
+async def get_scrape_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return scrape_job_to_dict(job)
+
+@app.post("/api/scrape/jobs/{job_id}/cancel")
+async def cancel_scrape_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    if not request_scrape_cancel(db, job):
+        return {"message": f"Job already {job.state}"}
+    return {"message": "Stopping scraper..." if job.state == "running" else "Job cancelled"}
+
 @app.post("/api/scrape/stop")
-async def stop_scrape(current_user: User = Depends(get_current_user)):
-    global SCRAPER_INTERRUPT, SCRAPER_RUNNING
-    if SCRAPER_RUNNING and SCRAPER_INTERRUPT:
-        SCRAPER_INTERRUPT.set()
-        log_message("🛑 Stopping scraper by user request...")
+async def stop_scrape(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Stop every running scrape job (queued jobs stay queued)."""
+    running = db.query(ScrapeJob).filter(ScrapeJob.state == "running").all()
+    for job in running:
+        request_scrape_cancel(db, job)
+    if running:
         return {"message": "Stopping scraper..."}
     return {"message": "Scraper not running"}
 
-def log_message(msg: str):
-    """Add message to global logs"""
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    SCRAPER_LOGS.append(f"[{timestamp}] {msg}")
-    # Keep log size manageable
-    if len(SCRAPER_LOGS) > 200:
-        SCRAPER_LOGS.pop(0)
-
 @app.get("/api/scrape")
 async def scrape(
-    background_tasks: BackgroundTasks,
     keywords: str = "Fullstack Developer",
     location: str = "Indonesia",
     sources: str = "linkedin,upwork,indeed,glints,gmaps",
@@ -150,210 +301,17 @@ async def scrape(
     db: Session = Depends(get_db), 
     current_user: User = Depends(get_current_user)
 ):
-    global SCRAPER_RUNNING, SCRAPER_INTERRUPT, SCRAPER_LOGS
-    
-    if SCRAPER_RUNNING:
-        return {"message": "Scraper is already running", "status": "running"}
-
-    try:
-        # Reset State
-        SCRAPER_LOGS.clear()
-        SCRAPER_RUNNING = True
-        SCRAPER_INTERRUPT = asyncio.Event()
-        
-        # Fetch settings
-        settings = {s.key: s.value for s in db.query(Setting).all()}
-        li_cookie = settings.get("linkedin_cookie", "")
-        proxy_url = os.getenv("PROXY_URL", settings.get("proxy_url", ""))
-        
-        # Parse sources
-        source_list = [s.strip().lower() for s in sources.split(",") if s.strip()]
-        
-        background_tasks.add_task(
-            run_scraper_task, 
-            keywords, 
-            location, 
-            source_list, 
-            limit, 
-            safe_mode, 
-            li_cookie, 
-            proxy_url, 
-            SCRAPER_INTERRUPT
-        )
-
-        return {"message": "Scraping started", "status": "started"}
-    except Exception as e:
-        SCRAPER_RUNNING = False
-        raise HTTPException(status_code=500, detail=f"Failed to start scraper: {str(e)}")
-
-async def run_scraper_task(keywords, location, sources, limit, safe_mode, cookie, proxy, interrupt_event):
-    global SCRAPER_RUNNING
-    from scraper import JobScraper
-    from ai_scorer import score_lead
-    import asyncio
-    from database import SessionLocal
-
-    is_gmaps = 'gmaps' in sources
-    log_message(f"🚀 Starting background scrape for '{keywords}' ({'Prospects' if is_gmaps else 'Jobs'} mode)")
-    
-    scraper = JobScraper(
-        headless=True,
-        cookie=cookie,
-        proxy=proxy,
-        safe_mode=safe_mode,
-        log_callback=log_message,
-        interrupt_event=interrupt_event
-    )
-    
-    db = SessionLocal()
+    # Parse sources
+    source_list = [s.strip().lower() for s in sources.split(",") if s.strip()]
     try:
-        results = await scraper.scrape_all(keywords, location, sources, limit=limit)
-        
-        saved_leads = 0
-        saved_prospects = 0
-        skipped_dupes = 0
-        
-        for item in results:
-            if interrupt_event.is_set(): 
-                log_message("🛑 Loop interrupted, stopping save...")
-                break
-            
-            source = item.get('source', '')
-            
-            # ── Google Maps → save to PROSPECTS table ──
-            if source == 'Google Maps':
-                maps_url = item.get('maps_url', '')
-                phone = item.get('phone', '').strip()
-                name = item.get('name', '').strip()
-                category_val = item.get('category', 'Local Business')
-
-                # Multi-field dedup: maps_url OR phone OR name+category
-                existing = None
-                if maps_url:
-                    existing = db.query(Prospect).filter(Prospect.maps_url == maps_url).first()
-                if not existing and phone:
-                    existing = db.query(Prospect).filter(Prospect.phone == phone).first()
-                if not existing and name:
-                    existing = db.query(Prospect).filter(
-                        Prospect.name == name,
-                        Prospect.category == category_val
-                    ).first()
-                
-                if not existing:
-                    log_message(f"✨ New prospect: {item['name']} | Phone: {item.get('phone', '-')}")
-                    # Score with AI
-                    try:
-                        ai_result = await score_lead(
-                            title=item['name'],
-                            company=item.get('category', 'Local Business'),
-                            description=f"Category: {item.get('category', '')} | Address: {item.get('address', '')}",
-                            has_website=item.get('has_website', False),
-                            category=item.get('category', '')
-                        )
-                    except Exception as ai_e:
-                        log_message(f"⚠️ AI Scorer error: {str(ai_e)}")
-                        ai_result = {"score": 0, "reason": "AI scoring failed"}
-                    
-                    new_prospect = Prospect(
-                        name=item['name'],
-                        category=item.get('category', 'Local Business'),
-                        address=item.get('address', ''),
-                        phone=item.get('phone', ''),
-                        email=item.get('email', ''),
-                        website=item.get('website', ''),
-                        has_website=item.get('has_website', False),
-                        rating=item.get('rating'),
-                        review_count=item.get('review_count'),
-                        maps_url=maps_url,
-                        match_score=ai_result['score'],
-                        match_reason=ai_result['reason'],
-                        source_keyword=item.get('source_keyword', keywords),
-                        status="new",
-                    )
-                    db.add(new_prospect)
-                    saved_prospects += 1
-                else:
-                    skipped_dupes += 1
-                    log_message(f"⏭️ Duplicate prospect (skip): {item['name']} — matched by {'maps_url' if maps_url and db.query(Prospect).filter(Prospect.maps_url == maps_url).first() else 'phone' if phone and db.query(Prospect).filter(Prospect.phone == phone).first() else 'name+category'}")
-            
-            # ── Other sources → save to LEADS table (as before) ──
-            else:
-                lead_url = item.get('url', '')
-                lead_title = item.get('title', '').strip()
-                lead_company = item.get('company', '').strip()
-
-                # Multi-field dedup: url OR title+company
-                existing = None
-                if lead_url:
-                    existing = db.query(Lead).filter(Lead.url == lead_url).first()
-                if not existing and lead_title and lead_company:
-                    existing = db.query(Lead).filter(
-                        Lead.title == lead_title,
-                        Lead.company == lead_company
-                    ).first()
-
-                if not existing:
-                    log_message(f"✨ New lead found: {item['title']} @ {item['company']}")
-                    try:
-                        ai_result = await score_lead(
-                            title=item['title'],
-                            company=item['company'],
-                            description=item.get('description', ''),
-                            has_website=item.get('has_website', True),
-                            category=item.get('company', '')
-                        )
-                    except Exception as ai_e:
-                        log_message(f"⚠️ AI Scorer error: {str(ai_e)}")
-                        ai_result = {"score": 0, "reason": "AI scoring failed"}
-                    
-                    new_lead = Lead(
-                        title=item['title'],
-                        company=item['company'],
-                        location=item['location'],
-                        description=item.get('description', ''),
-                        url=item['url'],
-                        source=item['source'],
-                        match_score=ai_result['score'],
-                        match_reason=ai_result['reason'],
-                        phone=item.get('phone', ''),
-                        has_website=item.get('has_website'),
-                        status="new",
-                    )
-                    db.add(new_lead)
-                    saved_leads += 1
-                else:
-                    skipped_dupes += 1
-                    log_message(f"⏭️ Duplicate lead (skip): {item['title']} @ {item['company']}")
-        
-        db.commit()
-        
-        total = saved_leads + saved_prospects
-        if saved_prospects > 0:
-            log_message(f"🎉 Scraping finished! Saved {saved_prospects} new prospects.")
-        if saved_leads > 0:
-            log_message(f"🎉 Scraping finished! Saved {saved_leads} new leads.")
-        if skipped_dupes > 0:
-            log_message(f"🔄 Skipped {skipped_dupes} duplicate entries.")
-        if total == 0:
-            log_message(f"📭 Scraping finished. No new data found (all {skipped_dupes} entries were duplicates).")
-
-        # Telegram notification
-        if total > 0:
-            from telegram_notifier import notify_new_leads, is_configured
-            if is_configured():
-                await notify_new_leads(total, ", ".join(sources))
-                
+        job = enqueue_scrape_job(db, keywords, location, source_list, limit, safe_mode)
     except Exception as e:
-        log_message(f"❌ Error during scraping: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-    finally:
-        db.close()
-        SCRAPER_RUNNING = False
-        log_message("💤 Scraper task ended.")
+        raise HTTPException(status_code=500, detail=f"Failed to queue scraper: {str(e)}")
+    ahead = db.query(ScrapeJob).filter(ScrapeJob.state.in_(ACTIVE_SCRAPE_STATES), ScrapeJob.id < job.id).count()
+    return {"message": "Scraping queued", "status": "queued", "job_id": job.id, "jobs_ahead": ahead}
 
-@app.get("/api/leads", response_model=List[schemas.LeadResponse])
-async def get_leads(
+def _filter_leads(
+    query,
     start_date: str = None,
     end_date: str = None,
     source: str = None,
@@ -362,20 +320,18 @@ async def get_leads(
     max_score: int = None,
     wa_status: str = None, # 'contacted', 'not_contacted'
     search: str = None,
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
 ):
+    """Apply the /api/leads filters (also used by the bulk endpoints); returns (query, whether any applied)."""
     from models import Lead
     from datetime import datetime, time
 
-    query = db.query(Lead)
-
+    conditions = []
     if start_date:
         try:
             start_dt = datetime.fromisoformat(start_date)
             # Ensure start of day
             start_dt = datetime.combine(start_dt.date(), time.min)
-            query = query.filter(Lead.created_at >= start_dt)
+            conditions.append(Lead.created_at >= start_dt)
         except ValueError:
             pass # Ignore invalid date format
             
@@ -384,36 +340,53 @@ async def get_leads(
             end_dt = datetime.fromisoformat(end_date)
             # Ensure end of day
             end_dt = datetime.combine(end_dt.date(), time.max)
-            query = query.filter(Lead.created_at <= end_dt)
+            conditions.append(Lead.created_at <= end_dt)
         except ValueError:
             pass
 
     if source and source != 'all':
-        query = query.filter(Lead.source == source)
+        conditions.append(Lead.source == source)
     
     if status and status != 'all':
-        query = query.filter(Lead.status == status)
+        conditions.append(Lead.status == status)
 
     if min_score is not None:
-        query = query.filter(Lead.match_score >= min_score)
+        conditions.append(Lead.match_score >= min_score)
     
     if max_score is not None:
-        query = query.filter(Lead.match_score <= max_score)
+        conditions.append(Lead.match_score <= max_score)
 
     if wa_status:
         if wa_status == 'contacted':
-            query = query.filter(Lead.wa_contacted_at.isnot(None))
+            conditions.append(Lead.wa_contacted_at.isnot(None))
         elif wa_status == 'not_contacted':
-            query = query.filter(Lead.wa_contacted_at.is_(None))
+            conditions.append(Lead.wa_contacted_at.is_(None))
 
     if search:
         search_term = f"%{search}%"
-        query = query.filter(or_(
+        conditions.append(or_(
             Lead.title.ilike(search_term),
             Lead.company.ilike(search_term),
             Lead.location.ilike(search_term)
         ))
+    return query.filter(*conditions), bool(conditions)
+
+@app.get("/api/leads", response_model=List[schemas.LeadResponse])
+async def get_leads(
+    start_date: str = None,
+    end_date: str = None,
+    source: str = None,
+    status: str = None,
+    min_score: int = None,
+    max_score: int = None,
+    wa_status: str = None, # 'contacted', 'not_contacted'
+    search: str = None,
+    db: Session = Depends(get_db), 
+    current_user: User = Depends(get_current_user)
+):
+    from models import Lead
 
+    query, _ = _filter_leads(db.query(Lead), start_date, end_date, source, status, min_score, max_score, wa_status, search)
     return query.order_by(Lead.id.desc()).all()
 
 @app.get("/api/campaigns", response_model=List[schemas.CampaignResponse])
@@ -422,21 +395,34 @@ async def get_campaigns(db: Session = Depends(get_db), current_user: User = Depe
     camp = db.query(Campaign).order_by(Campaign.created_at.desc()).all()
     return camp
 
+def _validate_pacing(raw: Optional[str]):
+    try:
+        PacingPolicy.from_json(raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pacing policy: {e}")
+
 @app.post("/api/campaigns", response_model=schemas.CampaignResponse)
 async def create_campaign(campaign_in: schemas.CampaignCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     from models import Campaign
     
+    _validate_pacing(campaign_in.pacing)
     # Logic similar to before, but validation handled by Pydantic
     camp = Campaign(
         name=campaign_in.name,
         status=campaign_in.status,
         message_template=campaign_in.message_template,
         target_criteria=campaign_in.target_criteria,
-        scheduled_at=campaign_in.scheduled_at
+        target_type=campaign_in.target_type,
+        template_id=campaign_in.template_id,
+        smart_ai=campaign_in.smart_ai,
+        scheduled_at=campaign_in.scheduled_at,
+        pacing=campaign_in.pacing
     )
+    apply_schedule(camp)
     db.add(camp)
     db.commit()
     db.refresh(camp)
+    campaign_scheduler.nudge()
     return camp
 
 @app.put("/api/campaigns/{id}", response_model=schemas.CampaignResponse)
@@ -448,11 +434,16 @@ async def update_campaign(id: int, campaign_in: schemas.CampaignUpdate, db: Sess
         raise HTTPException(status_code=404, detail="Campaign not found")
 
     update_data = campaign_in.dict(exclude_unset=True)
+    if "pacing" in update_data:
+        _validate_pacing(update_data["pacing"])
     for key, value in update_data.items():
         setattr(camp, key, value)
+    if "scheduled_at" in update_data:
+        apply_schedule(camp)
     
     db.commit()
     db.refresh(camp)
+    campaign_scheduler.nudge()
     return camp
 
 @app.delete("/api/campaigns/{id}")
@@ -574,28 +565,89 @@ async def update_lead(lead_id: int, lead_in: schemas.LeadUpdate, db: Session = D
     db.refresh(lead)
     return lead
 
+def _delete_lead_dependents(db: Session, lead_ids):
+    """Delete follow-ups and projects (with their tasks, invoices and invoice lines) of the given leads."""
+    from models import FollowUp, Project, Task, Invoice, InvoiceItem
+    from sqlalchemy import select
+    project_ids = select(Project.id).where(Project.lead_id.in_(lead_ids))
+    invoice_ids = select(Invoice.id).where(Invoice.project_id.in_(project_ids))
+    db.query(InvoiceItem).filter(InvoiceItem.invoice_id.in_(invoice_ids)).delete(synchronize_session=False)
+    db.query(Invoice).filter(Invoice.project_id.in_(project_ids)).delete(synchronize_session=False)
+    db.query(Task).filter(Task.project_id.in_(project_ids)).delete(synchronize_session=False)
+    db.query(Project).filter(Project.lead_id.in_(lead_ids)).delete(synchronize_session=False)
+    db.query(FollowUp).filter(FollowUp.lead_id.in_(lead_ids)).delete(synchronize_session=False)
+
 @app.delete("/api/leads/{lead_id}")
 async def delete_lead(lead_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    from models import Lead, FollowUp, Project, Campaign
+    from models import Lead
     
     lead = db.query(Lead).filter(Lead.id == lead_id).first()
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
         
     # Cascade delete related items (OR relies on DB cascade, but manual here for safety)
-    db.query(FollowUp).filter(FollowUp.lead_id == lead_id).delete()
-    db.query(Project).filter(Project.lead_id == lead_id).delete()
+    _delete_lead_dependents(db, [lead_id])
     
     db.delete(lead)
     db.commit()
     return {"status": "deleted"}
 
+# Filters the list views match against fixed values; anything else would be skipped
+BULK_FILTER_CHOICES = {"wa_status": ("contacted", "not_contacted"), "has_website": ("yes", "no")}
+
+def _bulk_selection(query, model, selection, apply_filters):
+    """
+    Narrow `query` to a bulk selection's ids or filters. Refuses an empty selection (= every row):
+    values the list filters would silently skip are a 400 here, and the filters must add a condition.
+    """
+    from datetime import datetime
+
+    if selection.ids is not None:
+        if not selection.ids:
+            raise HTTPException(status_code=400, detail="ids is empty")
+        return query.filter(model.id.in_(selection.ids))
+    filters = {}
+    for key, value in (selection.filters.model_dump(exclude_none=True) if selection.filters else {}).items():
+        if value == "all" or (isinstance(value, str) and not value.strip()):
+            continue
+        if key in ("start_date", "end_date"):
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {key}: {value!r}")
+        elif key in BULK_FILTER_CHOICES and value not in BULK_FILTER_CHOICES[key]:
+            raise HTTPException(status_code=400, detail=f"Invalid {key}: {value!r}, expected one of {', '.join(BULK_FILTER_CHOICES[key])}")
+        filters[key] = value
+    narrowed, applied = apply_filters(query, **filters)
+    if not applied:
+        raise HTTPException(status_code=400, detail="Pass ids or at least one filter")
+    return narrowed
+
+@app.post("/api/leads/bulk-update")
+async def bulk_update_leads(data: schemas.LeadBulkUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Set the status of many leads in one UPDATE."""
+    from models import Lead
+    updated = _bulk_selection(db.query(Lead), Lead, data, _filter_leads) \
+        .update({"status": data.status}, synchronize_session=False)
+    db.commit()
+    return {"updated": updated}
+
+@app.post("/api/leads/bulk-delete")
+async def bulk_delete_leads(data: schemas.LeadSelection, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Delete many leads (and their follow-ups and projects) with set-based DELETEs in one transaction."""
+    from models import Lead
+    lead_ids = _bulk_selection(db.query(Lead.id), Lead, data, _filter_leads).scalar_subquery()
+    _delete_lead_dependents(db, lead_ids)
+    deleted = db.query(Lead).filter(Lead.id.in_(lead_ids)).delete(synchronize_session=False)
+    db.commit()
+    return {"deleted": deleted}
+
 # ---------------------------------------------------------------------
 # PROSPECT CRUD (Google Maps Business Prospects)
 # ---------------------------------------------------------------------
 
-@app.get("/api/prospects", response_model=List[schemas.Prospect])
-async def get_prospects(
+def _filter_prospects(
+    query,
     start_date: str = None,
     end_date: str = None, 
     category: str = None,
@@ -605,56 +657,72 @@ async def get_prospects(
     wa_status: str = None,
     has_website: str = None,
     search: str = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
 ):
+    """Apply the /api/prospects filters (also used by the bulk endpoints); returns (query, whether any applied)."""
     from datetime import datetime, time
-    query = db.query(Prospect)
-    
+
+    conditions = []
     if start_date:
         try:
             start_dt = datetime.fromisoformat(start_date)
             start_dt = datetime.combine(start_dt.date(), time.min)
-            query = query.filter(Prospect.created_at >= start_dt)
+            conditions.append(Prospect.created_at >= start_dt)
         except ValueError:
             pass
     if end_date:
         try:
             end_dt = datetime.fromisoformat(end_date)
             end_dt = datetime.combine(end_dt.date(), time.max)
-            query = query.filter(Prospect.created_at <= end_dt)
+            conditions.append(Prospect.created_at <= end_dt)
         except ValueError:
             pass
     if category and category != "all":
-        query = query.filter(Prospect.category.ilike(f"%{category}%"))
+        conditions.append(Prospect.category.ilike(f"%{category}%"))
     if status and status != "all":
-        query = query.filter(Prospect.status == status)
+        conditions.append(Prospect.status == status)
 
     if min_score is not None:
-        query = query.filter(Prospect.match_score >= min_score)
+        conditions.append(Prospect.match_score >= min_score)
     if max_score is not None:
-        query = query.filter(Prospect.match_score <= max_score)
+        conditions.append(Prospect.match_score <= max_score)
 
     if has_website and has_website != 'all':
         if has_website == 'yes':
-            query = query.filter(Prospect.has_website == True)
+            conditions.append(Prospect.has_website == True)
         elif has_website == 'no':
-            query = query.filter(Prospect.has_website == False)
+            conditions.append(Prospect.has_website == False)
 
     if wa_status:
         if wa_status == 'contacted':
-            query = query.filter(Prospect.wa_contacted_at.isnot(None))
+            conditions.append(Prospect.wa_contacted_at.isnot(None))
         elif wa_status == 'not_contacted':
-            query = query.filter(Prospect.wa_contacted_at.is_(None))
+            conditions.append(Prospect.wa_contacted_at.is_(None))
             
     if search:
         search_term = f"%{search}%"
-        query = query.filter(or_(
+        conditions.append(or_(
             Prospect.name.ilike(search_term),
             Prospect.category.ilike(search_term),
             Prospect.address.ilike(search_term)
         ))
-    
+    return query.filter(*conditions), bool(conditions)
+
+@app.get("/api/prospects", response_model=List[schemas.Prospect])
+async def get_prospects(
+    start_date: str = None,
+    end_date: str = None, 
+    category: str = None,
+    status: str = None,
+    min_score: int = None,
+    max_score: int = None,
+    wa_status: str = None,
+    has_website: str = None,
+    search: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query, _ = _filter_prospects(db.query(Prospect), start_date, end_date, category, status,
+                              min_score, max_score, wa_status, has_website, search)
     return query.order_by(Prospect.created_at.desc()).all()
 
 @app.get("/api/prospects/stats")
@@ -718,32 +786,185 @@ async def delete_prospect(prospect_id: int, db: Session = Depends(get_db), curre
     db.commit()
     return {"status": "deleted"}
 
+@app.post("/api/prospects/bulk-update")
+async def bulk_update_prospects(data: schemas.ProspectBulkUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Set the status of many prospects in one UPDATE."""
+    updated = _bulk_selection(db.query(Prospect), Prospect, data, _filter_prospects) \
+        .update({"status": data.status}, synchronize_session=False)
+    db.commit()
+    return {"updated": updated}
+
+@app.post("/api/prospects/bulk-delete")
+async def bulk_delete_prospects(data: schemas.ProspectSelection, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Delete many prospects in one DELETE; their follow-ups are kept and unlinked, as with a single delete."""
+    from models import FollowUp
+    prospect_ids = _bulk_selection(db.query(Prospect.id), Prospect, data, _filter_prospects).scalar_subquery()
+    db.query(FollowUp).filter(FollowUp.prospect_id.in_(prospect_ids)) \
+        .update({"prospect_id": None}, synchronize_session=False)
+    deleted = db.query(Prospect).filter(Prospect.id.in_(prospect_ids)).delete(synchronize_session=False)
+    db.commit()
+    return {"deleted": deleted}
+
+# ---------------------------------------------------------------------
+# BULK IMPORT (CSV / XLSX)
+# ---------------------------------------------------------------------
+
+@app.post("/api/import/{kind}")
+async def import_records(kind: str, file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    """Import leads or prospects from a CSV/XLSX upload: validated, deduplicated and inserted in chunks."""
+    from bulk_import import IMPORT_KINDS, import_file
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown import kind: {kind}")
+    try:
+        report = await asyncio.get_running_loop().run_in_executor(None, import_file, kind, file.file, file.filename)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read {file.filename}: {e}")
+    summary = {k: report[k] for k in ("rows", "inserted", "duplicates", "rejected", "seconds")}
+    activity_log.log("system", f"📥 Imported {report['inserted']} {kind} from {file.filename}",
+                     details={"kind": kind, "file": file.filename, **summary})
+    return report
+
 # ---------------------------------------------------------------------
 # CAMPAIGN RUNNER CONTROL
 # ---------------------------------------------------------------------
 
 @app.post("/api/campaigns/{id}/launch")
 async def launch_campaign(id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    if campaign_runner.is_running:
-        raise HTTPException(status_code=400, detail="A campaign is already running.")
+    if campaign_runner.is_campaign_running(id):
+        raise HTTPException(status_code=400, detail="This campaign is already running.")
+    if not campaign_runner.has_capacity:
+        raise HTTPException(status_code=400, detail="Too many campaigns running. Stop one first.")
     
     # Verify campaign exists
     camp = db.query(Campaign).filter(Campaign.id == id).first()
     if not camp:
         raise HTTPException(status_code=404, detail="Campaign not found.")
     
-    # Start in background
-    background_tasks.add_task(campaign_runner.run_campaign, db, id)
+    # Start in background (resumes from the send log if it ran before)
+    background_tasks.add_task(campaign_runner.run_campaign, id)
     return {"status": "started", "campaign": camp.name}
 
+@app.post("/api/campaigns/{id}/prepare")
+async def prepare_campaign(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Snapshot the audience and start generating Smart AI drafts ahead of
+    launch, so they can be reviewed (and the campaign never waits on the model).
+    """
+    camp = db.query(Campaign).filter(Campaign.id == id).first()
+    if not camp:
+        raise HTTPException(status_code=404, detail="Campaign not found.")
+    if not camp.smart_ai:
+        raise HTTPException(status_code=400, detail="Drafts are only generated for Smart AI campaigns.")
+
+    created = 0
+    if db.query(CampaignSend.id).filter(CampaignSend.campaign_id == id).first() is None:
+        created = materialize_audience(db, camp)
+    ensure_pregeneration(id)
+    return {"status": "generating", "recipients_added": created, **_draft_counts(db, id)}
+
+@app.post("/api/campaigns/{id}/simulate")
+async def simulate_campaign_run(
+    id: int,
+    failure_rate: float = 0.0,
+    latency: float = 1.0,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Dry-run the campaign's remaining sends on a virtual clock with a fake
+    Fonnte transport (nothing is sent or written) and report the projected
+    duration, messages per hour and time-of-day spread.
+    """
+    try:
+        return await simulate_campaign(id, failure_rate=failure_rate, latency=latency)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def _draft_counts(db: Session, campaign_id: int) -> dict:
+    counts = dict(
+        db.query(CampaignSend.message_state, func.count(CampaignSend.id))
+        .filter(CampaignSend.campaign_id == campaign_id, CampaignSend.state == "pending")
+        .group_by(CampaignSend.message_state).all()
+    )
+    return {"drafts": {state or "none": n for state, n in counts.items()}, "generating": is_drafting(campaign_id)}
+
+@app.get("/api/campaigns/{id}/drafts")
+def list_campaign_drafts(
+    id: int,
+    message_state: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Review pre-generated messages in send order, with per-state counts."""
+    query = db.query(CampaignSend).filter(CampaignSend.campaign_id == id)
+    if message_state:
+        query = query.filter(CampaignSend.message_state == message_state)
+    sends = query.order_by(CampaignSend.position.asc()).offset(skip).limit(min(limit, 200)).all()
+    recipients = load_recipients(db, sends)
+    items = [_draft_response(send, recipients.get((send.target_type, send.target_id))) for send in sends]
+    return {"items": items, **_draft_counts(db, id)}
+
+def _draft_response(send: CampaignSend, recipient: Optional[dict]) -> schemas.CampaignDraftResponse:
+    return schemas.CampaignDraftResponse(
+        id=send.id, target_id=send.target_id, position=send.position, state=send.state,
+        message=send.message, message_state=send.message_state,
+        lead_name=recipient["name"] if recipient else None,
+        lead_phone=recipient["phone"] if recipient else None,
+    )
+
+@app.patch("/api/campaigns/{id}/drafts/{send_id}", response_model=schemas.CampaignDraftResponse)
+def update_campaign_draft(
+    id: int,
+    send_id: int,
+    payload: schemas.CampaignDraftUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Edit a draft before it is sent, or skip the recipient altogether."""
+    send = db.query(CampaignSend).filter(CampaignSend.id == send_id, CampaignSend.campaign_id == id).first()
+    if not send:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    if send.state not in ("pending", "skipped"):
+        raise HTTPException(status_code=400, detail=f"Message already {send.state}.")
+
+    if payload.skip:
+        send.state = "skipped"
+    elif payload.skip is False and send.state == "skipped":
+        send.state = "pending"
+    if payload.message is not None:
+        send.message = payload.message
+        send.message_state = "edited"
+    db.commit()
+    return _draft_response(send, load_recipients(db, [send]).get((send.target_type, send.target_id)))
+
 @app.get("/api/campaigns/status")
 def get_campaign_status():
-    return campaign_runner.status
+    return {**campaign_runner.status, "scheduler": campaign_scheduler.snapshot()}
+
+@app.get("/api/campaigns/pacing-defaults")
+def get_pacing_defaults(current_user: User = Depends(get_current_user)):
+    """Pacing policy a campaign gets for every option it leaves unset."""
+    return PacingPolicy().to_dict()
+
+@app.get("/api/campaigns/stream")
+async def campaign_stream(
+    request: Request,
+    since: int = None,
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    SSE stream of campaign runner events: `state`, `log`, `sent`, `failed` and
+    `sleeping` (kind, seconds, until). Each event carries the running counters.
+    Resume with ?since=<seq> or the Last-Event-ID header.
+    """
+    return sse_response(campaign_runner.events, request, since)
 
 @app.post("/api/campaigns/stop")
-def stop_campaign():
-    campaign_runner.stop()
-    return {"status": "stopping"}
+def stop_campaign(campaign_id: int = None):
+    """Stop one running campaign (?campaign_id=) or all of them."""
+    campaign_runner.stop(campaign_id)
+    return {"status": "stopping", "campaign_id": campaign_id}
 @app.post("/api/send-wa")
 async def send_wa_individual(payload: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Send a single WhatsApp message via Fonnte."""
@@ -755,7 +976,6 @@ async def send_wa_individual(payload: dict, db: Session = Depends(get_db), curre
     if not phone or not message:
         raise HTTPException(status_code=400, detail="Phone and message are required")
 
-    from campaign_runner import campaign_runner
     success = await campaign_runner._send_via_fonnte(
         Lead(phone=phone, title="Contact", company=""), # Temporary object for helper
         message
@@ -840,6 +1060,8 @@ async def update_settings(config: schemas.SettingsUpdate, db: Session = Depends(
             setting.value = str(value)
     
     db.commit()
+    if "fonnte_token" in config_dict:
+        wa_gateway.invalidate_token()
     return {"status": "updated", "config": config_dict}
 
 # --- WhatsApp (Fonnte) API ---
@@ -847,8 +1069,7 @@ async def update_settings(config: schemas.SettingsUpdate, db: Session = Depends(
 @app.post("/api/wa/send")
 async def send_whatsapp(payload: schemas.WhatsAppSend, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Send WhatsApp message via Fonnte API."""
-    import httpx
-    from models import Setting, Lead
+    from models import Lead
     
     target = payload.target
     message = payload.message
@@ -857,40 +1078,13 @@ async def send_whatsapp(payload: schemas.WhatsAppSend, db: Session = Depends(get
     if not target or not message:
         return {"success": False, "error": "target and message required"}
     
-    # Get Fonnte token: env var first, then DB settings
-    fonnte_token = os.getenv("FONNTE_TOKEN", "")
-    if not fonnte_token:
-        settings = {s.key: s.value for s in db.query(Setting).all()}
-        fonnte_token = settings.get("fonnte_token", "")
-    
-    if not fonnte_token:
-        return {"success": False, "error": "Fonnte token not configured. Set FONNTE_TOKEN in .env or go to Settings."}
-    
-    # Format phone number
-    phone = target.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-    if phone.startswith("0"):
-        phone = "62" + phone[1:]
-    if phone.startswith("+"):
-        phone = phone[1:]
-    
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
-                "https://api.fonnte.com/send",
-                headers={
-                    "Authorization": fonnte_token,
-                },
-                data={
-                    "target": phone,
-                    "message": message,
-                    "delay": "2",
-                    "countryCode": "62",
-                },
-            )
-            result = response.json()
+        result = await wa_gateway.send(target, message, delay="2")
+        if not result["success"] and "detail" not in result:
+            return result
         
         # Update lead/prospect status + auto-create FollowUp
-        if result.get("status"):
+        if result["success"]:
             from models import FollowUp, Prospect, get_wib_now
             now = get_wib_now()
             
@@ -952,9 +1146,9 @@ async def send_whatsapp(payload: schemas.WhatsAppSend, db: Session = Depends(get
                     db.commit()
         
         return {
-            "success": result.get("status", False),
+            "success": result["success"],
             "detail": result.get("detail", "Unknown"),
-            "target": phone,
+            "target": result["target"],
         }
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -962,53 +1156,63 @@ async def send_whatsapp(payload: schemas.WhatsAppSend, db: Session = Depends(get
 @app.post("/api/wa/send-document")
 async def send_wa_document(payload: schemas.WhatsAppSendDocument, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Send a document (PDF) via WhatsApp using Fonnte API."""
-    import httpx
-    from models import Setting
-    
     target = payload.target
     if not target or not payload.file:
         return {"success": False, "error": "target and file required"}
     
-    fonnte_token = os.getenv("FONNTE_TOKEN", "")
-    if not fonnte_token:
-        settings = {s.key: s.value for s in db.query(Setting).all()}
-        fonnte_token = settings.get("fonnte_token", "")
-    
-    if not fonnte_token:
-        return {"success": False, "error": "Fonnte token not configured."}
-    
-    phone = target.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-    if phone.startswith("0"):
-        phone = "62" + phone[1:]
-    if phone.startswith("+"):
-        phone = phone[1:]
-    
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.fonnte.com/send",
-                headers={"Authorization": fonnte_token},
-                data={
-                    "target": phone,
-                    "message": payload.message,
-                    "file": payload.file,
-                    "filename": payload.filename,
-                    "countryCode": "62",
-                },
-            )
-            result = response.json()
-        return {
-            "success": result.get("status", False),
-            "detail": result.get("detail", "Unknown"),
-            "target": phone,
-        }
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    result = await wa_gateway.send(target, payload.message, file=payload.file, filename=payload.filename)
+    if not result["success"] and "detail" not in result:
+        return result
+    return {
+        "success": result["success"],
+        "detail": result.get("detail", "Unknown"),
+        "target": result["target"],
+    }
 
 # ═══════════════════════════════════════════════════
 # ──── FOLLOW-UP API ────
 # ═══════════════════════════════════════════════════
 
+AGENDA_PAGE_MAX = 500
+
+def _followup_query(db: Session):
+    """Follow-ups joined to their lead/prospect, selecting only the flattened response columns."""
+    from models import FollowUp
+    return db.query(
+        FollowUp.id, FollowUp.lead_id, FollowUp.prospect_id, FollowUp.type, FollowUp.note,
+        FollowUp.status, FollowUp.next_follow_date, FollowUp.created_at, FollowUp.updated_at,
+        Lead.title.label("lead_title"), Lead.company.label("lead_company"),
+        Prospect.name.label("prospect_name"), Prospect.category.label("prospect_category"),
+    ).outerjoin(Lead, FollowUp.lead_id == Lead.id).outerjoin(Prospect, FollowUp.prospect_id == Prospect.id)
+
+def _followup_row(row) -> dict:
+    has_lead = row.lead_id is not None and row.lead_title is not None
+    has_prospect = row.prospect_id is not None and row.prospect_name is not None
+    return {
+        "id": row.id,
+        "lead_id": row.lead_id,
+        "prospect_id": row.prospect_id,
+        "lead_title": row.lead_title if has_lead else (row.prospect_name if has_prospect else "Unknown"),
+        "lead_company": row.lead_company if has_lead else (row.prospect_category if has_prospect else ""),
+        "prospect_name": row.prospect_name,
+        "prospect_category": row.prospect_category,
+        "type": row.type,
+        "note": row.note,
+        "status": row.status,
+        "next_follow_date": row.next_follow_date,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at
+    }
+
+def _parse_date(value: Optional[str], field: str):
+    from datetime import date
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} must be YYYY-MM-DD")
+
 @app.get("/api/followups", response_model=List[schemas.FollowUpResponse])
 async def get_followups(
     lead_id: int = None, 
@@ -1017,24 +1221,20 @@ async def get_followups(
     db: Session = Depends(get_db), 
     current_user: User = Depends(get_current_user)
 ):
-    from models import FollowUp, Lead, Prospect
-    from sqlalchemy.orm import joinedload
-    from datetime import datetime, time
+    from models import FollowUp
     
-    query = db.query(FollowUp).options(joinedload(FollowUp.lead), joinedload(FollowUp.prospect))
+    query = _followup_query(db)
     
     if lead_id:
         query = query.filter(FollowUp.lead_id == lead_id)
 
-    if start_date and end_date:
-        try:
-            # Filter by next_follow_date
-            # Assuming format YYYY-MM-DD
-            start_dt = datetime.fromisoformat(start_date).date()
-            end_dt = datetime.fromisoformat(end_date).date()
-            query = query.filter(FollowUp.next_follow_date >= start_dt, FollowUp.next_follow_date <= end_dt)
-        except ValueError:
-            pass
+    # Filter by next_follow_date; either bound may be given on its own
+    start_dt = _parse_date(start_date, "start_date")
+    end_dt = _parse_date(end_date, "end_date")
+    if start_dt:
+        query = query.filter(FollowUp.next_follow_date >= start_dt)
+    if end_dt:
+        query = query.filter(FollowUp.next_follow_date <= end_dt)
             
     # Default order: Priority to upcoming tasks
     if start_date:
@@ -1044,27 +1244,58 @@ async def get_followups(
         # Default view: catch-all, newest created first
         query = query.order_by(FollowUp.created_at.desc())
 
-    follow_ups = query.all()
-    
-    # Map to schema (Pydantic orm_mode handles most, but we need flattened fields)
-    results = []
-    for fu in follow_ups:
-        results.append({
-            "id": fu.id,
-            "lead_id": fu.lead_id,
-            "prospect_id": fu.prospect_id,
-            "lead_title": fu.lead.title if fu.lead else (fu.prospect.name if fu.prospect else "Unknown"),
-            "lead_company": fu.lead.company if fu.lead else (fu.prospect.category if fu.prospect else ""),
-            "prospect_name": fu.prospect.name if fu.prospect else None,
-            "prospect_category": fu.prospect.category if fu.prospect else None,
-            "type": fu.type,
-            "note": fu.note,
-            "status": fu.status,
-            "next_follow_date": fu.next_follow_date,
-            "created_at": fu.created_at,
-            "updated_at": fu.updated_at
-        })
-    return results
+    return [_followup_row(row) for row in query.all()]
+
+@app.get("/api/followups/agenda", response_model=schemas.FollowUpAgendaPage)
+async def get_followup_agenda(
+    start: str = None,
+    end: str = None,
+    status: str = None,
+    lead_id: int = None,
+    prospect_id: int = None,
+    cursor: str = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Dated follow-ups in [start, end], ordered by (next_follow_date, id) and
+    paged by keyset: pass `next_cursor` back as `cursor` for the next page.
+    A calendar month reads only that month's rows via the
+    (status, next_follow_date) index.
+    """
+    from models import FollowUp
+    from sqlalchemy import tuple_
+
+    limit = max(1, min(limit, AGENDA_PAGE_MAX))
+    query = _followup_query(db).filter(FollowUp.next_follow_date.isnot(None))
+    if status:
+        query = query.filter(FollowUp.status == status)
+    start_dt = _parse_date(start, "start")
+    end_dt = _parse_date(end, "end")
+    if start_dt:
+        query = query.filter(FollowUp.next_follow_date >= start_dt)
+    if end_dt:
+        query = query.filter(FollowUp.next_follow_date <= end_dt)
+    if lead_id:
+        query = query.filter(FollowUp.lead_id == lead_id)
+    if prospect_id:
+        query = query.filter(FollowUp.prospect_id == prospect_id)
+    if cursor:
+        after_date, _, after_id = cursor.partition("_")
+        if not after_id.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(
+            tuple_(FollowUp.next_follow_date, FollowUp.id) > (_parse_date(after_date, "cursor"), int(after_id))
+        )
+
+    rows = query.order_by(FollowUp.next_follow_date.asc(), FollowUp.id.asc()).limit(limit + 1).all()
+    items = [_followup_row(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = f"{last.next_follow_date.isoformat()}_{last.id}"
+    return {"items": items, "next_cursor": next_cursor}
 
 @app.post("/api/followups", response_model=schemas.FollowUpResponse)
 async def create_followup(fu_in: schemas.FollowUpCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -1125,6 +1356,9 @@ async def update_followup(fu_id: int, fu_in: schemas.FollowUpUpdate, db: Session
     update_data = fu_in.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(fu, key, value)
+    if "next_follow_date" in update_data:
+        # Rescheduled: report it again if the new date passes too
+        fu.overdue_notified_at = None
     
     db.commit()
     db.refresh(fu)
@@ -1158,6 +1392,20 @@ async def delete_followup(fu_id: int, db: Session = Depends(get_db), current_use
 # ──── PROJECT API ────
 # ═══════════════════════════════════════════════════
 
+def _project_invoice_totals(db: Session, project_id: int = None) -> dict:
+    """project_id -> (invoice count, total invoiced, total paid), aggregated in SQL."""
+    from models import Invoice
+    from sqlalchemy import case
+    query = db.query(
+        Invoice.project_id,
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.total), 0.0),
+        func.coalesce(func.sum(case((Invoice.status == "paid", Invoice.total), else_=0.0)), 0.0),
+    ).group_by(Invoice.project_id)
+    if project_id is not None:
+        query = query.filter(Invoice.project_id == project_id)
+    return {pid: (count, invoiced, paid) for pid, count, invoiced, paid in query.all()}
+
 @app.get("/api/projects", response_model=List[schemas.ProjectResponse])
 async def get_projects(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     from models import Project, Invoice, Task
@@ -1165,14 +1413,13 @@ async def get_projects(db: Session = Depends(get_db), current_user: User = Depen
     
     projects = db.query(Project).options(
         joinedload(Project.lead), 
-        joinedload(Project.invoices),
         joinedload(Project.tasks)
     ).order_by(Project.created_at.desc()).all()
+    invoice_totals = _project_invoice_totals(db)
     
     results = []
     for p in projects:
-        total_invoiced = sum(i.total for i in p.invoices)
-        total_paid = sum(i.total for i in p.invoices if i.status == "paid")
+        invoice_count, total_invoiced, total_paid = invoice_totals.get(p.id, (0, 0.0, 0.0))
         
         results.append({
             "id": p.id,
@@ -1186,7 +1433,7 @@ async def get_projects(db: Session = Depends(get_db), current_user: User = Depen
             "budget": p.budget,
             "deadline": p.deadline,
             "progress": p.progress,
-            "invoice_count": len(p.invoices),
+            "invoice_count": invoice_count,
             "total_invoiced": total_invoiced,
             "total_paid": total_paid,
             "task_count": len(p.tasks),
@@ -1259,6 +1506,7 @@ async def update_project(project_id: int, project_in: schemas.ProjectUpdate, db:
     
     # For response, we need to re-calculate stats or return basic info
     # Re-fetching is safer for relations
+    invoice_count, total_invoiced, total_paid = _project_invoice_totals(db, project.id).get(project.id, (0, 0.0, 0.0))
     return {
         "id": project.id,
         "lead_id": project.lead_id,
@@ -1271,9 +1519,9 @@ async def update_project(project_id: int, project_in: schemas.ProjectUpdate, db:
         "budget": project.budget,
         "deadline": project.deadline,
         "progress": project.progress,
-        "invoice_count": len(project.invoices),
-        "total_invoiced": sum(i.total for i in project.invoices),
-        "total_paid": sum(i.total for i in project.invoices if i.status == "paid"),
+        "invoice_count": invoice_count,
+        "total_invoiced": total_invoiced,
+        "total_paid": total_paid,
         "task_count": len(project.tasks),
         "task_done_count": len([t for t in project.tasks if t.status == "done"]),
         "created_at": project.created_at,
@@ -1289,6 +1537,10 @@ async def delete_project(project_id: int, db: Session = Depends(get_db), current
         raise HTTPException(status_code=404, detail="Project not found")
 
     # Cascade delete invoices matches DB configuration usually, but explicit here
+    from models import InvoiceItem
+    db.query(InvoiceItem).filter(
+        InvoiceItem.invoice_id.in_(db.query(Invoice.id).filter(Invoice.project_id == project_id).scalar_subquery())
+    ).delete(synchronize_session=False)
     db.query(Invoice).filter(Invoice.project_id == project_id).delete()
     
     db.delete(project)
@@ -1345,14 +1597,39 @@ async def delete_task(task_id: int, db: Session = Depends(get_db), current_user:
 # ──── INVOICE API ────
 # ═══════════════════════════════════════════════════
 
+def _invoice_items(inv) -> list:
+    return [{"desc": li.description, "qty": li.qty, "price": li.price} for li in inv.line_items]
+
+def _set_invoice_items(db: Session, inv, items):
+    """Replace an invoice's line items (list of schemas.InvoiceItem)."""
+    from models import InvoiceItem
+    db.query(InvoiceItem).filter(InvoiceItem.invoice_id == inv.id).delete(synchronize_session=False)
+    db.add_all([
+        InvoiceItem(invoice_id=inv.id, position=i, description=item.desc, qty=item.qty, price=item.price)
+        for i, item in enumerate(items or [])
+    ])
+    db.expire(inv, ["line_items"])
+
+def _recalculate_invoice_totals(db: Session, inv_id: int):
+    """subtotal = SUM(qty * price) of the line items, total = subtotal plus tax, in one UPDATE."""
+    from models import Invoice, InvoiceItem
+    from sqlalchemy import func, select
+    db.flush()
+    subtotal = select(func.coalesce(func.sum(InvoiceItem.qty * InvoiceItem.price), 0.0)) \
+        .where(InvoiceItem.invoice_id == inv_id).scalar_subquery()
+    db.query(Invoice).filter(Invoice.id == inv_id).update({
+        "subtotal": subtotal,
+        "total": subtotal + subtotal * func.coalesce(Invoice.tax_percent, 0) / 100.0,
+    }, synchronize_session=False)
+
 @app.get("/api/invoices", response_model=List[schemas.InvoiceResponse])
 async def get_invoices(project_id: int = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     from models import Invoice, Project, Lead
-    from sqlalchemy.orm import joinedload
-    import json
+    from sqlalchemy.orm import joinedload, selectinload
     
     query = db.query(Invoice).options(
-        joinedload(Invoice.project).joinedload(Project.lead)
+        joinedload(Invoice.project).joinedload(Project.lead),
+        selectinload(Invoice.line_items),
     ).order_by(Invoice.created_at.desc())
     
     if project_id:
@@ -1361,9 +1638,7 @@ async def get_invoices(project_id: int = None, db: Session = Depends(get_db), cu
     
     results = []
     for inv in invoices:
-        # Pydantic doesn't automatically parse JSON string fields to List[dict], we need to handle it
-        # However, our schema expects List[InvoiceItem] for 'items'.
-        parsed_items = json.loads(inv.items) if inv.items else []
+        parsed_items = _invoice_items(inv)
         
         results.append({
             "id": inv.id,
@@ -1387,40 +1662,31 @@ async def get_invoices(project_id: int = None, db: Session = Depends(get_db), cu
 @app.post("/api/invoices", response_model=schemas.InvoiceResponse)
 async def create_invoice(invoice_in: schemas.InvoiceCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     from models import Invoice, Project
-    from datetime import date
-    import json
     
     project = db.query(Project).filter(Project.id == invoice_in.project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Auto-generate invoice number: INV-YYYYMM-NNN
-    from datetime import datetime
-    now = datetime.utcnow()
-    count = db.query(Invoice).count() + 1
-    inv_number = invoice_in.invoice_number or f"INV-{now.strftime('%Y%m')}-{count:03d}"
-    
-    # Serialize items
-    items_data = [item.dict() for item in invoice_in.items]
-    items_json = json.dumps(items_data)
-    
-    # Calculate totals
-    subtotal = sum(item.qty * item.price for item in invoice_in.items)
-    tax_pct = invoice_in.tax_percent
-    total = subtotal + (subtotal * tax_pct / 100)
+    # Auto-generate invoice number: INV-YYYYMM-NNN from the per-month counter
+    from invoice_numbers import allocate_invoice_number, reserve_invoice_number
+    if invoice_in.invoice_number:
+        inv_number = invoice_in.invoice_number
+        reserve_invoice_number(db, inv_number)
+    else:
+        inv_number = allocate_invoice_number(db)
     
     invoice = Invoice(
         project_id=invoice_in.project_id,
         invoice_number=inv_number,
-        items=items_json,
-        subtotal=subtotal,
-        tax_percent=tax_pct,
-        total=total,
+        tax_percent=invoice_in.tax_percent,
         status="draft",
         due_date=invoice_in.due_date,
         notes=invoice_in.notes,
     )
     db.add(invoice)
+    db.flush()
+    _set_invoice_items(db, invoice, invoice_in.items)
+    _recalculate_invoice_totals(db, invoice.id)
     db.commit()
     db.refresh(invoice)
     
@@ -1430,7 +1696,7 @@ async def create_invoice(invoice_in: schemas.InvoiceCreate, db: Session = Depend
         "project_name": project.name,
         "client_name": project.lead.company if project.lead else "Unknown",
         "invoice_number": invoice.invoice_number,
-        "items": items_data,
+        "items": _invoice_items(invoice),
         "subtotal": invoice.subtotal,
         "tax_percent": invoice.tax_percent,
         "total": invoice.total,
@@ -1445,8 +1711,6 @@ async def create_invoice(invoice_in: schemas.InvoiceCreate, db: Session = Depend
 @app.put("/api/invoices/{inv_id}", response_model=schemas.InvoiceResponse)
 async def update_invoice(inv_id: int, invoice_in: schemas.InvoiceUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     from models import Invoice
-    from datetime import date, datetime
-    import json
     
     inv = db.query(Invoice).filter(Invoice.id == inv_id).first()
     if not inv:
@@ -1460,28 +1724,12 @@ async def update_invoice(inv_id: int, invoice_in: schemas.InvoiceUpdate, db: Ses
         if update_data["status"] == "paid":
             from models import get_wib_now
             inv.paid_at = get_wib_now()
-            # Telegram notification for paid invoice
-            from telegram_notifier import notify_invoice_paid, is_configured as tg_configured
-            if tg_configured():
-                await notify_invoice_paid(inv.invoice_number, inv.total)
                 
     if "items" in update_data:
-        items_list = update_data["items"] # List[InvoiceItem]
-        items_dicts = [item.dict() for item in items_list] if items_list else [] # convert to dicts
-        inv.items = json.dumps(items_dicts)
-        
-        # Recalculate subtotal
-        # items_list is list of Pydantic models (InvoiceItem)
-        if items_list:
-            inv.subtotal = sum(item.qty * item.price for item in items_list)
-        else:
-            inv.subtotal = 0
-            
-        inv.total = inv.subtotal + (inv.subtotal * inv.tax_percent / 100)
+        _set_invoice_items(db, inv, invoice_in.items)
         
     if "tax_percent" in update_data:
         inv.tax_percent = update_data["tax_percent"]
-        inv.total = inv.subtotal + (inv.subtotal * inv.tax_percent / 100)
         
     if "due_date" in update_data:
         inv.due_date = update_data["due_date"]
@@ -1489,11 +1737,20 @@ async def update_invoice(inv_id: int, invoice_in: schemas.InvoiceUpdate, db: Ses
     if "notes" in update_data:
         inv.notes = update_data["notes"]
     
+    # Recompute subtotal/total from the line items
+    if "items" in update_data or "tax_percent" in update_data:
+        _recalculate_invoice_totals(db, inv.id)
+    
     db.commit()
     db.refresh(inv)
+
+    # Telegram notification for paid invoice (queued; sent after the commit with the final total)
+    if update_data.get("status") == "paid":
+        from telegram_notifier import notify_invoice_paid, is_configured as tg_configured
+        if tg_configured():
+            await notify_invoice_paid(inv.invoice_number, inv.total)
     
-    # Parse items back for response
-    parsed_items = json.loads(inv.items) if inv.items else []
+    parsed_items = _invoice_items(inv)
     
     return {
         "id": inv.id,
@@ -1548,7 +1805,7 @@ async def get_stats(db: Session = Depends(get_db), current_user: User = Depends(
     active_projects = db.query(Project).filter(Project.status == "active").count()
     total_projects = db.query(Project).count()
     pending_followups = db.query(FollowUp).filter(FollowUp.status == "pending").count()
-    total_revenue = sum(i.total for i in db.query(Invoice).filter(Invoice.status == "paid").all())
+    total_revenue = db.query(func.coalesce(func.sum(Invoice.total), 0.0)).filter(Invoice.status == "paid").scalar()
     unpaid_invoices = db.query(Invoice).filter(Invoice.status.in_(["sent", "overdue"])).count()
     
     # Campaign stats
@@ -1594,30 +1851,186 @@ async def get_stats(db: Session = Depends(get_db), current_user: User = Depends(
         "weekly": weekly,
     }
 
+REVENUE_GROUPS = ("month", "client", "project")
+
+@app.get("/api/stats/revenue")
+async def get_revenue(
+    group_by: str = "month",
+    status: str = "paid",
+    start: str = None,
+    end: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Invoice totals grouped by month (of paid_at, else created_at), client or
+    project, summed by the database. `status` filters invoices ("all" for
+    every status); start/end bound the same date as the month grouping.
+    """
+    from models import Invoice, Project, Lead
+
+    if group_by not in REVENUE_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(REVENUE_GROUPS)}")
+    when = func.coalesce(Invoice.paid_at, Invoice.created_at)
+    if group_by == "month":
+        if db.bind.dialect.name == "postgresql":
+            key = func.to_char(when, "YYYY-MM")
+        else:
+            key = func.strftime("%Y-%m", when)
+        label = key
+    elif group_by == "client":
+        key = label = func.coalesce(Lead.company, Project.client_name, "Unknown")
+    else:
+        key, label = Project.id, Project.name
+
+    query = db.query(
+        key.label("key"), label.label("label"),
+        func.count(Invoice.id).label("invoices"),
+        func.coalesce(func.sum(Invoice.total), 0.0).label("revenue"),
+    ).select_from(Invoice).join(Project, Invoice.project_id == Project.id).outerjoin(Lead, Project.lead_id == Lead.id)
+    if status != "all":
+        query = query.filter(Invoice.status == status)
+    start_dt = _parse_date(start, "start")
+    end_dt = _parse_date(end, "end")
+    if start_dt:
+        query = query.filter(when >= start_dt)
+    if end_dt:
+        query = query.filter(when < end_dt + timedelta(days=1))
+    query = query.group_by(key) if group_by != "project" else query.group_by(Project.id, Project.name)
+    order = key.asc() if group_by == "month" else desc("revenue")
+    return [
+        {"key": row.key, "label": row.label, "invoices": row.invoices, "revenue": row.revenue}
+        for row in query.order_by(order).all()
+    ]
+
 # --- Activity Logs ---
+LOG_PAGE_MAX = 500
+
+def _parse_datetime(value: Optional[str], field: str):
+    from datetime import datetime
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} must be an ISO date or datetime")
+
+def _activity_log_query(db: Session, category, level, start, end, details):
+    """ActivityLog query with the shared filters; `details` is a JSON object the row's details must contain."""
+    from models import ActivityLog
+    from activity_log import details_filter
+
+    query = db.query(ActivityLog)
+    if category:
+        query = query.filter(ActivityLog.category.in_(category.split(",")))
+    if level:
+        query = query.filter(ActivityLog.level.in_(level.split(",")))
+    start_dt = _parse_datetime(start, "start")
+    end_dt = _parse_datetime(end, "end")
+    if start_dt:
+        query = query.filter(ActivityLog.created_at >= start_dt)
+    if end_dt:
+        query = query.filter(ActivityLog.created_at < end_dt)
+    if details:
+        try:
+            criteria = json.loads(details)
+            if not isinstance(criteria, dict):
+                raise ValueError("details must be a JSON object")
+            query = query.filter(details_filter(ActivityLog.details, criteria, db.bind.dialect.name))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return query
+
 @app.get("/api/logs")
 async def get_activity_logs(
     limit: int = 50,
     category: str = None,
+    level: str = None,
+    start: str = None,
+    end: str = None,
+    details: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     from models import ActivityLog
-    
-    query = db.query(ActivityLog)
-    if category:
-        query = query.filter(ActivityLog.category == category)
-    
-    logs = query.order_by(ActivityLog.created_at.desc()).limit(limit).all()
+
+    query = _activity_log_query(db, category, level, start, end, details)
+    logs = query.order_by(ActivityLog.created_at.desc()).limit(max(1, min(limit, LOG_PAGE_MAX))).all()
     return logs
 
+@app.get("/api/logs/search", response_model=schemas.ActivityLogPage)
+async def search_activity_logs(
+    category: str = None,
+    level: str = None,
+    start: str = None,
+    end: str = None,
+    details: str = None,
+    cursor: str = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Activity logs newest first, paged by keyset on (created_at, id): pass
+    `next_cursor` back as `cursor`. category/level take comma-separated
+    values, start/end bound created_at, and `details` is a JSON object the
+    entry's details must contain, e.g. {"lead_id": 42}. details come back parsed.
+    """
+    from models import ActivityLog
+    from sqlalchemy import tuple_
+
+    limit = max(1, min(limit, LOG_PAGE_MAX))
+    query = _activity_log_query(db, category, level, start, end, details)
+    if cursor:
+        before, _, before_id = cursor.rpartition("_")
+        if not before_id.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(
+            tuple_(ActivityLog.created_at, ActivityLog.id) < (_parse_datetime(before, "cursor"), int(before_id))
+        )
+
+    rows = query.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc()).limit(limit + 1).all()
+    items = []
+    for row in rows[:limit]:
+        try:
+            parsed = json.loads(row.details) if row.details else None
+        except ValueError:
+            parsed = row.details
+        items.append({"id": row.id, "category": row.category, "level": row.level, "message": row.message,
+                      "details": parsed, "created_at": row.created_at})
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/api/logs/retention")
+async def get_log_retention(current_user: User = Depends(get_current_user)):
+    """Retention policy, table size and archived months."""
+    from activity_retention import retention_status
+    return await asyncio.get_running_loop().run_in_executor(None, retention_status)
+
+@app.post("/api/logs/prune")
+async def prune_logs(current_user: User = Depends(get_current_user)):
+    """Archive and delete expired activity logs now instead of waiting for the daily run."""
+    from activity_retention import prune_expired
+    archived = await asyncio.get_running_loop().run_in_executor(None, prune_expired)
+    return {"archived": archived}
+
+@app.get("/api/logs/archives/{name}")
+async def download_log_archive(name: str, current_user: User = Depends(get_current_user)):
+    from fastapi.responses import FileResponse
+    from activity_retention import ARCHIVE_NAME, ACTIVITY_LOG_ARCHIVE_DIR
+    path = os.path.join(ACTIVITY_LOG_ARCHIVE_DIR, name)
+    if not ARCHIVE_NAME.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Archive not found")
+    return FileResponse(path, media_type="application/gzip", filename=name)
+
 # --- AI Mission Briefing ---
 @app.get("/api/stats/ai-briefing")
 async def get_ai_briefing(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    from models import Lead, Prospect, Campaign, ActivityLog
+    from models import Lead, Prospect, Campaign
     from ai_scorer import analyze_briefing
-    from datetime import datetime
-    import json
     
     # Gather stats
     stats = {
@@ -1634,15 +2047,8 @@ async def get_ai_briefing(db: Session = Depends(get_db), current_user: User = De
     briefing = await analyze_briefing(stats)
     
     # Log this activity
-    log = ActivityLog(
-        category="ai_scoring",
-        level="info",
-        message="AI Mission Briefing generated",
-        details=json.dumps({"model": "deepseek-r1", "stats": stats}),
-        created_at=datetime.now()
-    )
-    db.add(log)
-    db.commit()
+    activity_log.log("ai_scoring", "AI Mission Briefing generated",
+                     details={"model": "deepseek-r1", "stats": stats})
     
     return {"briefing": briefing, "stats": stats}
 
@@ -1653,10 +2059,8 @@ async def enrich_lead(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from models import Lead, ActivityLog
+    from models import Lead
     from ai_scorer import enrich_web_data
-    from datetime import datetime
-    import json
     
     lead = db.query(Lead).filter(Lead.id == lead_id).first()
     if not lead:
@@ -1669,15 +2073,8 @@ async def enrich_lead(
     enrichment = await enrich_web_data(website_url, lead.company)
     
     # Log this activity
-    log = ActivityLog(
-        category="enrichment",
-        level="info",
-        message=f"Lead #{lead_id} enriched via Kimi-K2",
-        details=json.dumps({"model": "kimi-k2", "lead_id": lead_id, "result": enrichment}),
-        created_at=datetime.now()
-    )
-    db.add(log)
-    db.commit()
+    activity_log.log("enrichment", f"Lead #{lead_id} enriched via Kimi-K2",
+                     details={"model": "kimi-k2", "lead_id": lead_id, "result": enrichment})
     
     return {"lead_id": lead_id, "enrichment": enrichment}
 
@@ -1687,27 +2084,16 @@ async def generate_template(
     target_category: str,
     service_type: str,
     tone: str = "professional",
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from models import ActivityLog
     from ai_scorer import generate_campaign_template
-    from datetime import datetime
-    import json
     
     # Call GLM-4 for creative copywriting
     template = await generate_campaign_template(target_category, service_type, tone)
     
     # Log this activity
-    log = ActivityLog(
-        category="campaign",
-        level="info",
-        message=f"Campaign template generated for {target_category}",
-        details=json.dumps({"model": "glm-4", "category": target_category, "service": service_type}),
-        created_at=datetime.now()
-    )
-    db.add(log)
-    db.commit()
+    activity_log.log("campaign", f"Campaign template generated for {target_category}",
+                     details={"model": "glm-4", "category": target_category, "service": service_type})
     
     return {"template": template, "category": target_category, "service": service_type}
 
@@ -1715,53 +2101,31 @@ async def generate_template(
 @app.post("/api/ai/personalize")
 async def personalize_message(
     payload: dict,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from models import ActivityLog
     from ai_scorer import generate_personalized_message
-    from datetime import datetime
-    import json
     
     # payload should contain prospect/lead data
     message = await generate_personalized_message(payload)
     
     # Log this activity
-    log = ActivityLog(
-        category="ai_personalization",
-        level="info",
-        message=f"Personalized message generated for {payload.get('name', 'Unknown')}",
-        details=json.dumps({"model": "glm-4", "biz": payload.get('name')}),
-        created_at=datetime.now()
-    )
-    db.add(log)
-    db.commit()
+    activity_log.log("ai_personalization", f"Personalized message generated for {payload.get('name', 'Unknown')}",
+                     details={"model": "glm-4", "biz": payload.get('name')})
     
     return {"message": message}
 @app.post("/api/ai/proposal")
 async def generate_proposal_ai(
     payload: dict,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from models import ActivityLog
     from ai_scorer import generate_proposal_content
-    from datetime import datetime
-    import json
     
     # payload should contain lead/prospect data
     proposal = await generate_proposal_content(payload)
     
     # Log this activity
-    log = ActivityLog(
-        category="ai_proposal",
-        level="info",
-        message=f"AI Proposal generated for {payload.get('company', 'Unknown')}",
-        details=json.dumps({"model": "glm-4", "biz": payload.get('company')}),
-        created_at=datetime.now()
-    )
-    db.add(log)
-    db.commit()
+    activity_log.log("ai_proposal", f"AI Proposal generated for {payload.get('company', 'Unknown')}",
+                     details={"model": "glm-4", "biz": payload.get('company')})
     
     return proposal
 
@@ -1871,17 +2235,23 @@ async def create_campaign(payload: dict, db: Session = Depends(get_db), current_
         except ValueError:
             pass
             
+    _validate_pacing(payload.get("pacing"))
     camp = Campaign(
         name=payload.get("name", "New Campaign"),
         status="draft",
         message_template=payload.get("message_template", ""),
         target_criteria=payload.get("target_criteria", "{}"),
+        target_type=payload.get("target_type", "leads"),
+        template_id=payload.get("template_id"),
         scheduled_at=scheduled_at,
-        smart_ai=payload.get("smart_ai", False)
+        smart_ai=payload.get("smart_ai", False),
+        pacing=payload.get("pacing")
     )
+    apply_schedule(camp)
     db.add(camp)
     db.commit()
     db.refresh(camp)
+    campaign_scheduler.nudge()
     return {"id": camp.id, "status": "created"}
 
 @app.put("/api/campaigns/{camp_id}")
@@ -1898,13 +2268,18 @@ async def update_campaign(camp_id: int, payload: dict, db: Session = Depends(get
     if "message_template" in payload: camp.message_template = payload["message_template"]
     if "target_criteria" in payload: camp.target_criteria = payload["target_criteria"]
     if "smart_ai" in payload: camp.smart_ai = payload["smart_ai"]
+    if "pacing" in payload:
+        _validate_pacing(payload["pacing"])
+        camp.pacing = payload["pacing"]
     if "scheduled_at" in payload:
         try:
             camp.scheduled_at = datetime.fromisoformat(payload["scheduled_at"]) if payload["scheduled_at"] else None
         except:
             pass
+        apply_schedule(camp)
             
     db.commit()
+    campaign_scheduler.nudge()
     return {"id": camp.id, "status": "updated"}
 
 @app.delete("/api/campaigns/{camp_id}")
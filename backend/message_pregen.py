@@ -0,0 +1,166 @@
+"""
+Ahead-of-time message generation for Smart AI campaigns.
+
+Personalized drafts are generated for the whole audience concurrently and
+stored on the campaign's send records (campaign_sends.message), ahead of the
+send cursor. The runner only sends rows whose draft is ready, so a slow model
+never stalls pacing, and drafts can be reviewed or edited before launch.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from database import SessionLocal
+from models import CampaignSend, Lead, Prospect
+
+logger = logging.getLogger(__name__)
+
+# Concurrent model calls per campaign, and how many drafts are claimed at a time
+PREGEN_CONCURRENCY = int(os.getenv("AI_PREGEN_CONCURRENCY", "4"))
+PREGEN_BATCH = int(os.getenv("AI_PREGEN_BATCH", "20"))
+
+# States of CampaignSend.message_state a send can go out with
+SENDABLE_MESSAGE_STATES = ("ready", "edited", "failed")
+
+_tasks: Dict[int, asyncio.Task] = {}
+
+
+# CampaignSend.target_type -> model holding the recipient
+TARGET_MODELS = {"lead": Lead, "prospect": Prospect}
+
+
+def recipient_data(target_type: str, row) -> dict:
+    """Plain recipient fields (what generate_personalized_message expects) from a Lead or Prospect."""
+    if target_type == "prospect":
+        return {
+            "name": row.name,
+            "company": row.name,
+            "category": row.category or '',
+            "address": row.address or '',
+            "has_website": bool(row.has_website),
+            "rating": row.rating,
+            "phone": row.phone,
+        }
+    return {
+        "name": row.title,
+        "company": row.company,
+        "category": getattr(row, 'category', ''),
+        "address": getattr(row, 'location', ''),
+        "has_website": getattr(row, 'has_website', True),
+        "phone": row.phone,
+    }
+
+
+def load_recipients(db, sends) -> dict:
+    """(target_type, target_id) -> recipient dict for a page of sends, one query per target type."""
+    recipients = {}
+    for target_type, model in TARGET_MODELS.items():
+        ids = [s.target_id for s in sends if s.target_type == target_type]
+        if ids:
+            for row in db.query(model).filter(model.id.in_(ids)).all():
+                recipients[(target_type, row.id)] = recipient_data(target_type, row)
+    return recipients
+
+
+def render_template(template: str, recipient: dict) -> str:
+    """Standard {name}/{company} template replacement."""
+    return (template or "").replace("{name}", recipient.get("name") or "Partner") \
+                           .replace("{company}", recipient.get("company") or "")
+
+
+def queue_drafts(db, campaign_id: int) -> int:
+    """Queue drafts for pending sends that don't have one yet; un-stick rows left `generating`."""
+    queued = db.query(CampaignSend).filter(
+        CampaignSend.campaign_id == campaign_id,
+        CampaignSend.state == "pending",
+        (CampaignSend.message_state.is_(None)) | (CampaignSend.message_state == "generating"),
+    ).update({"message_state": "queued"}, synchronize_session=False)
+    db.commit()
+    return queued
+
+
+def _claim_batch(campaign_id: int) -> list:
+    db = SessionLocal()
+    try:
+        rows = db.query(CampaignSend).filter(
+            CampaignSend.campaign_id == campaign_id,
+            CampaignSend.state == "pending",
+            CampaignSend.message_state == "queued",
+        ).order_by(CampaignSend.position.asc()).limit(PREGEN_BATCH).all()
+        recipients = load_recipients(db, rows)
+        batch = []
+        for row in rows:
+            row.message_state = "generating"
+            batch.append((row.id, recipients.get((row.target_type, row.target_id))))
+        db.commit()
+        return batch
+    finally:
+        db.close()
+
+
+def _store(send_id: int, message: Optional[str], state: str):
+    db = SessionLocal()
+    try:
+        # Only fill drafts nobody edited or skipped in the meantime
+        db.query(CampaignSend).filter(
+            CampaignSend.id == send_id, CampaignSend.message_state == "generating"
+        ).update({"message": message, "message_state": state}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def pregenerate(campaign_id: int) -> int:
+    """Generate every queued draft of a campaign, PREGEN_CONCURRENCY at a time."""
+    from ai_scorer import generate_personalized_message
+
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(PREGEN_CONCURRENCY)
+    generated = 0
+
+    async def store(send_id: int, message: Optional[str], state: str):
+        await loop.run_in_executor(None, _store, send_id, message, state)
+
+    async def one(send_id: int, recipient: Optional[dict]):
+        nonlocal generated
+        if recipient is None:
+            await store(send_id, None, "failed")
+            return
+        async with sem:
+            try:
+                message = await generate_personalized_message(recipient)
+            except Exception as e:
+                logger.warning(f"Draft generation failed for send {send_id}: {e}")
+                await store(send_id, None, "failed")
+                return
+            await store(send_id, message, "ready")
+            generated += 1
+
+    while True:
+        batch = await loop.run_in_executor(None, _claim_batch, campaign_id)
+        if not batch:
+            break
+        await asyncio.gather(*(one(send_id, data) for send_id, data in batch))
+
+    logger.info(f"🧠 Pre-generated {generated} message draft(s) for campaign {campaign_id}")
+    return generated
+
+
+def is_generating(campaign_id: int) -> bool:
+    task = _tasks.get(campaign_id)
+    return task is not None and not task.done()
+
+
+def ensure_pregeneration(campaign_id: int) -> asyncio.Task:
+    """Start draft generation for a campaign unless it is already running in this process."""
+    task = _tasks.get(campaign_id)
+    if task is None or task.done():
+        db = SessionLocal()
+        try:
+            queue_drafts(db, campaign_id)
+        finally:
+            db.close()
+        task = asyncio.create_task(pregenerate(campaign_id))
+        _tasks[campaign_id] = task
+    return task
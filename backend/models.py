@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey, Date, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -37,6 +37,11 @@ class Lead(Base):
 
 class FollowUp(Base):
     __tablename__ = "follow_ups"
+    __table_args__ = (
+        # Agenda / calendar windows and the overdue sweep
+        Index("ix_follow_ups_status_next_follow_date", "status", "next_follow_date"),
+        Index("ix_follow_ups_next_follow_date", "next_follow_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     lead_id = Column(Integer, ForeignKey("leads.id"), nullable=True, index=True)
@@ -45,6 +50,7 @@ class FollowUp(Base):
     note = Column(Text, nullable=True)
     status = Column(String, default="pending", index=True)  # pending, done, skipped
     next_follow_date = Column(Date, nullable=True)
+    overdue_notified_at = Column(DateTime, nullable=True)  # set once the overdue sweep reported it
     created_at = Column(DateTime, default=get_wib_now, index=True)
     updated_at = Column(DateTime, default=get_wib_now, onupdate=get_wib_now)
 
@@ -92,7 +98,6 @@ class Invoice(Base):
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
     invoice_number = Column(String, unique=True, nullable=False)
-    items = Column(Text, nullable=True)  # JSON string: [{desc, qty, price}]
     subtotal = Column(Float, default=0)
     tax_percent = Column(Float, default=0)
     total = Column(Float, default=0)
@@ -104,6 +109,28 @@ class Invoice(Base):
     updated_at = Column(DateTime, default=get_wib_now, onupdate=get_wib_now)
 
     project = relationship("Project", back_populates="invoices")
+    line_items = relationship("InvoiceItem", back_populates="invoice", order_by="InvoiceItem.position",
+                              cascade="all, delete-orphan")
+
+class InvoiceItem(Base):
+    """One line of an invoice; Invoice.subtotal/total are recomputed from these in SQL."""
+    __tablename__ = "invoice_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)
+    description = Column(Text, nullable=False, default="")
+    qty = Column(Integer, nullable=False, default=1)
+    price = Column(Float, nullable=False, default=0)
+
+    invoice = relationship("Invoice", back_populates="line_items")
+
+class InvoiceCounter(Base):
+    """Last invoice sequence number issued per month (INV-YYYYMM-NNN), bumped with one upsert."""
+    __tablename__ = "invoice_counters"
+
+    period = Column(String, primary_key=True)  # YYYYMM
+    last_number = Column(Integer, nullable=False, default=0)
 
 class User(Base):
     __tablename__ = "users"
@@ -122,6 +149,10 @@ class Setting(Base):
 
 class Campaign(Base):
     __tablename__ = "campaigns"
+    __table_args__ = (
+        # Scheduler: earliest `scheduled` campaign, and which ones are due
+        Index("ix_campaigns_status_scheduled_at", "status", "scheduled_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
@@ -134,9 +165,41 @@ class Campaign(Base):
     sent_count = Column(Integer, default=0)
     failed_count = Column(Integer, default=0)
     scheduled_at = Column(DateTime, nullable=True)
+    pacing = Column(Text, nullable=True)  # JSON pacing policy (campaign_pacing.py); null = defaults
+    runner_id = Column(String, nullable=True)          # host:pid holding the run lease
+    lease_expires_at = Column(DateTime, nullable=True) # lease renewed while running; expired = runner died
     created_at = Column(DateTime, default=get_wib_now, index=True)
     updated_at = Column(DateTime, default=get_wib_now, onupdate=get_wib_now)
 
+    sends = relationship("CampaignSend", back_populates="campaign", cascade="all, delete-orphan", passive_deletes=True)
+
+class CampaignSend(Base):
+    """Per-recipient send record — the durable cursor of a campaign run."""
+    __tablename__ = "campaign_sends"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "target_type", "target_id", name="uq_campaign_sends_target"),
+        Index("ix_campaign_sends_cursor", "campaign_id", "state", "position"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False)
+    target_type = Column(String, default="lead")      # lead, prospect
+    target_id = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)        # send order within the campaign
+    state = Column(String, default="pending")         # pending, sending, sent, failed, skipped
+    attempt = Column(Integer, default=0)
+    # Smart AI drafts, generated ahead of the send cursor (null for template campaigns)
+    message = Column(Text, nullable=True)
+    message_state = Column(String, nullable=True)     # queued, generating, ready, failed, edited
+    # Side effects (FollowUp, target status, campaign counters) applied for this result
+    recorded = Column(Boolean, default=False)
+    error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=get_wib_now)
+    updated_at = Column(DateTime, default=get_wib_now, onupdate=get_wib_now)
+
+    campaign = relationship("Campaign", back_populates="sends")
+
 class PromotionTemplate(Base):
     """Reusable message templates for WhatsApp campaigns."""
     __tablename__ = "promotion_templates"
@@ -178,6 +241,10 @@ class Prospect(Base):
 class ActivityLog(Base):
     """Centralized audit log for all AI and automation activities."""
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Per-category history, newest first (/api/logs/search)
+        Index("ix_activity_logs_category_created_at", "category", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     category = Column(String, index=True)  # scraper, ai_scoring, campaign, system, enrichment
@@ -185,3 +252,59 @@ class ActivityLog(Base):
     message = Column(Text, nullable=False)  # Human-readable description
     details = Column(Text, nullable=True)  # JSON string for extra details (AI reasoning, stats, etc.)
     created_at = Column(DateTime, default=get_wib_now, index=True)
+
+class ScrapeJob(Base):
+    """Queued scrape request. Claimed by scrape workers with SELECT ... FOR UPDATE SKIP LOCKED."""
+    __tablename__ = "scrape_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    keywords = Column(String, nullable=False)
+    location = Column(String, default="Indonesia")
+    sources = Column(String, nullable=False)           # comma-separated, e.g. "linkedin,gmaps"
+    limit = Column(Integer, default=10)
+    safe_mode = Column(Boolean, default=False)
+    state = Column(String, default="queued", index=True)  # queued, running, completed, failed, cancelled
+    progress = Column(Text, nullable=True)             # JSON: latest progress event
+    cancel_requested = Column(Boolean, default=False)
+    worker_id = Column(String, nullable=True)          # host:pid of the claiming worker
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)     # refreshed while running; stale = worker died
+    event_seq = Column(Integer, default=0)             # last ScrapeJobEvent.seq handed out (under the row lock)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=get_wib_now, index=True)
+
+    events = relationship("ScrapeJobEvent", back_populates="job", cascade="all, delete-orphan")
+
+class ScrapeJobEvent(Base):
+    """Append-only log/progress/status events of a scrape job. seq (per job) is the SSE sequence number."""
+    __tablename__ = "scrape_job_events"
+    __table_args__ = (
+        Index("ix_scrape_job_events_job_id_seq", "job_id", "seq", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("scrape_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    seq = Column(Integer, nullable=False)
+    type = Column(String, nullable=False)  # log, progress, status
+    data = Column(Text, nullable=True)     # JSON payload
+    created_at = Column(DateTime, default=get_wib_now)
+
+    job = relationship("ScrapeJob", back_populates="events")
+
+class NotificationOutbox(Base):
+    """Telegram messages that failed or overflowed the in-process queue; retried with backoff."""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_state_next_attempt_at", "state", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)               # new_leads, invoice_paid, overdue_digest, ...
+    text = Column(Text, nullable=False)                 # rendered message (HTML)
+    state = Column(String, default="pending")           # pending, failed (gave up)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=get_wib_now)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=get_wib_now)
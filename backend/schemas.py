@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, HttpUrl
-from typing import List, Optional
+from typing import Any, List, Optional
 from datetime import datetime, date
 
 # ---------------------------------------------------------------------
@@ -54,6 +54,25 @@ class LeadResponse(LeadBase, TimestampMixin):
     id: int
     wa_contacted_at: Optional[datetime] = None
 
+class LeadFilters(BaseModel):
+    """Same filters as GET /api/leads."""
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    source: Optional[str] = None
+    status: Optional[str] = None
+    min_score: Optional[int] = None
+    max_score: Optional[int] = None
+    wa_status: Optional[str] = None
+    search: Optional[str] = None
+
+class LeadSelection(BaseModel):
+    """Rows for a bulk operation: explicit ids, or everything matching filters."""
+    ids: Optional[List[int]] = None
+    filters: Optional[LeadFilters] = None
+
+class LeadBulkUpdate(LeadSelection):
+    status: str
+
 # ---------------------------------------------------------------------
 # FOLLOW-UP MODELS
 # ---------------------------------------------------------------------
@@ -83,6 +102,10 @@ class FollowUpResponse(FollowUpBase, TimestampMixin):
     prospect_name: Optional[str] = None
     prospect_category: Optional[str] = None
 
+class FollowUpAgendaPage(BaseModel):
+    items: List[FollowUpResponse]
+    next_cursor: Optional[str] = None
+
 # ---------------------------------------------------------------------
 # PROJECT MODELS
 # ---------------------------------------------------------------------
@@ -197,6 +220,7 @@ class CampaignBase(BaseModel):
     template_id: Optional[int] = None
     smart_ai: bool = False
     scheduled_at: Optional[datetime] = None
+    pacing: Optional[str] = None  # JSON string, see campaign_pacing.py
 
 class CampaignCreate(CampaignBase):
     pass
@@ -210,12 +234,27 @@ class CampaignUpdate(BaseModel):
     template_id: Optional[int] = None
     smart_ai: Optional[bool] = None
     scheduled_at: Optional[datetime] = None
+    pacing: Optional[str] = None
 
 class CampaignResponse(CampaignBase, TimestampMixin):
     id: int
     sent_count: int = 0
     failed_count: int = 0
 
+class CampaignDraftResponse(BaseModel):
+    id: int
+    target_id: int
+    position: int
+    state: str
+    message: Optional[str] = None
+    message_state: Optional[str] = None
+    lead_name: Optional[str] = None
+    lead_phone: Optional[str] = None
+
+class CampaignDraftUpdate(BaseModel):
+    message: Optional[str] = None
+    skip: Optional[bool] = None
+
 # ---------------------------------------------------------------------
 # PROMOTION TEMPLATE MODELS
 # ---------------------------------------------------------------------
@@ -280,6 +319,26 @@ class Prospect(ProspectBase, TimestampMixin):
     maps_url: str
     wa_contacted_at: Optional[datetime] = None
 
+class ProspectFilters(BaseModel):
+    """Same filters as GET /api/prospects."""
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    min_score: Optional[int] = None
+    max_score: Optional[int] = None
+    wa_status: Optional[str] = None
+    has_website: Optional[str] = None
+    search: Optional[str] = None
+
+class ProspectSelection(BaseModel):
+    """Rows for a bulk operation: explicit ids, or everything matching filters."""
+    ids: Optional[List[int]] = None
+    filters: Optional[ProspectFilters] = None
+
+class ProspectBulkUpdate(ProspectSelection):
+    status: str
+
 # ---------------------------------------------------------------------
 # ACTIVITY LOG MODELS
 # ---------------------------------------------------------------------
@@ -299,6 +358,18 @@ class ActivityLog(ActivityLogBase):
 
     class Config:
         from_attributes = True
+
+class ActivityLogEntry(BaseModel):
+    id: int
+    category: Optional[str] = None
+    level: Optional[str] = None
+    message: str
+    details: Optional[Any] = None  # parsed JSON
+    created_at: Optional[datetime] = None
+
+class ActivityLogPage(BaseModel):
+    items: List[ActivityLogEntry]
+    next_cursor: Optional[str] = None
 # ---------------------------------------------------------------------
 # SETTINGS & MISC
 # ---------------------------------------------------------------------
@@ -0,0 +1,506 @@
+"""
+Scrape job queue + worker.
+
+Scrape requests are rows in `scrape_jobs`. Any number of worker processes
+(`python scrape_worker.py`) — or the API process itself when
+SCRAPE_WORKER_EMBEDDED is on — claim queued jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, run them, and append log/progress/status
+events to `scrape_job_events`. The API streams those events to clients and
+requests cancellation by setting `cancel_requested`, so no scraper state
+lives in API process memory.
+
+Events are numbered per job (seq), handed out from scrape_jobs.event_seq while
+the job row is locked. Writers of one job's events are thus serialized and
+commit in seq order, so a client resuming after seq N can't skip an event
+that was numbered earlier but committed later.
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from models import ScrapeJob, ScrapeJobEvent, Lead, Prospect, Setting, get_wib_now
+
+load_dotenv()
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+POLL_INTERVAL = float(os.getenv("SCRAPE_WORKER_POLL_SECONDS", "2"))
+FLUSH_INTERVAL = float(os.getenv("SCRAPE_EVENT_FLUSH_SECONDS", "0.5"))
+# A running job whose heartbeat is older than this is assumed orphaned (worker died) and requeued
+STALE_AFTER = timedelta(seconds=int(os.getenv("SCRAPE_JOB_STALE_SECONDS", "120")))
+MAX_ATTEMPTS = int(os.getenv("SCRAPE_JOB_MAX_ATTEMPTS", "2"))
+
+ACTIVE_STATES = ("queued", "running")
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+
+# ──────────────────────────────────────────────
+# QUEUE API (used by main.py)
+# ──────────────────────────────────────────────
+
+def add_events(db, job: ScrapeJob, events: List[tuple]):
+    """
+    Append (type, data) events to `job`, numbered from job.event_seq. The job
+    row must be locked (SELECT ... FOR UPDATE) or created in this transaction.
+    """
+    seq = job.event_seq or 0
+    for type, data in events:
+        seq += 1
+        db.add(ScrapeJobEvent(job_id=job.id, seq=seq, type=type, data=json.dumps(data, default=str)))
+    job.event_seq = seq
+
+
+def enqueue_job(db, keywords: str, location: str, sources: List[str], limit: int, safe_mode: bool) -> ScrapeJob:
+    job = ScrapeJob(
+        keywords=keywords,
+        location=location,
+        sources=",".join(sources),
+        limit=limit,
+        safe_mode=safe_mode,
+        state="queued",
+        event_seq=0,
+    )
+    db.add(job)
+    db.flush()
+    add_events(db, job, [("status", {"state": "queued", "running": False})])
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def request_cancel(db, job: ScrapeJob) -> bool:
+    """Cancel a job: queued jobs are cancelled immediately, running ones are flagged for the worker."""
+    db.refresh(job, with_for_update=True)
+    if job.state == "queued":
+        job.state = "cancelled"
+        job.finished_at = get_wib_now()
+        add_events(db, job, [("status", {"state": "cancelled", "running": False})])
+    elif job.state == "running":
+        job.cancel_requested = True
+        add_events(db, job, [("log", {"line": _stamp("🛑 Stopping scraper by user request...")})])
+    else:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def job_to_dict(job: ScrapeJob) -> dict:
+    return {
+        "id": job.id,
+        "keywords": job.keywords,
+        "location": job.location,
+        "sources": job.sources.split(",") if job.sources else [],
+        "limit": job.limit,
+        "safe_mode": job.safe_mode,
+        "state": job.state,
+        "progress": json.loads(job.progress) if job.progress else None,
+        "cancel_requested": bool(job.cancel_requested),
+        "worker_id": job.worker_id,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def event_to_dict(event: ScrapeJobEvent) -> dict:
+    data = json.loads(event.data) if event.data else {}
+    data["job_id"] = event.job_id
+    return {
+        "seq": event.seq,
+        "type": event.type,
+        "ts": event.created_at.isoformat(timespec="seconds") if event.created_at else None,
+        "data": data,
+    }
+
+
+def fetch_events(db, job_id: int, since: int, limit: int = 500) -> List[dict]:
+    """Events of one job after seq `since`, oldest first."""
+    events = db.query(ScrapeJobEvent).filter(
+        ScrapeJobEvent.job_id == job_id, ScrapeJobEvent.seq > since,
+    ).order_by(ScrapeJobEvent.seq.asc()).limit(limit).all()
+    return [event_to_dict(e) for e in events]
+
+
+def _stamp(msg: str) -> str:
+    return f"[{datetime.now().strftime('%H:%M:%S')}] {msg}"
+
+
+# ──────────────────────────────────────────────
+# WORKER
+# ──────────────────────────────────────────────
+
+class JobReporter:
+    """
+    Buffers a running job's events and, every FLUSH_INTERVAL, writes them in
+    one transaction together with the heartbeat and latest progress. Also picks
+    up the cancel flag and trips the scraper's interrupt event. Flushes run in
+    the default executor, off the event loop.
+    """
+
+    def __init__(self, job_id: int, interrupt_event: asyncio.Event):
+        self.job_id = job_id
+        self.interrupt_event = interrupt_event
+        self._pending = []
+        self._progress = None
+        self._lock = threading.Lock()
+        self._stop = asyncio.Event()
+        self._task = None
+        self.cancel_requested = False
+
+    def _add(self, type: str, data: dict):
+        with self._lock:
+            self._pending.append((type, data))
+
+    def log(self, msg: str):
+        self._add("log", {"line": _stamp(msg)})
+
+    def progress(self, **progress):
+        self._progress = progress
+        self._add("progress", progress)
+
+    def status(self, state: str, **extra):
+        self._add("status", {"state": state, "running": state == "running", **extra})
+
+    def flush(self, final_state: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            with SessionLocal() as db:
+                job = db.query(ScrapeJob).filter(ScrapeJob.id == self.job_id).with_for_update().first()
+                if job:
+                    add_events(db, job, pending)
+                    job.heartbeat_at = get_wib_now()
+                    if self._progress is not None:
+                        job.progress = json.dumps(self._progress, default=str)
+                    if final_state:
+                        job.state = final_state
+                        job.finished_at = get_wib_now()
+                        job.error = error
+                    if job.cancel_requested:
+                        self.cancel_requested = True
+                db.commit()
+        except Exception:
+            # Keep the events for the next flush, ahead of anything logged meanwhile
+            with self._lock:
+                self._pending = pending + self._pending
+            raise
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), FLUSH_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                print(f"[ScrapeWorker] Event flush failed: {e}")
+            # Back on the loop: asyncio.Event isn't safe to set from the executor thread
+            if self.cancel_requested:
+                self.interrupt_event.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush, letting one already in progress finish first."""
+        self._stop.set()
+        if self._task:
+            await self._task
+
+
+def requeue_stale_jobs(db) -> int:
+    """Return orphaned running jobs (no heartbeat for STALE_AFTER) to the queue, or fail them."""
+    cutoff = get_wib_now() - STALE_AFTER
+    stale = db.query(ScrapeJob).filter(
+        ScrapeJob.state == "running",
+        ScrapeJob.heartbeat_at < cutoff,
+    ).with_for_update(skip_locked=True).all()
+    for job in stale:
+        if job.attempts >= MAX_ATTEMPTS:
+            job.state = "failed"
+            job.error = f"Worker {job.worker_id} stopped responding"
+            job.finished_at = get_wib_now()
+        else:
+            job.state = "queued"
+        add_events(db, job, [("status", {"state": job.state, "running": False})])
+    db.commit()
+    return len(stale)
+
+
+def claim_next_job(db) -> Optional[ScrapeJob]:
+    """Atomically claim the oldest queued job; concurrent workers skip rows already locked."""
+    job = db.query(ScrapeJob).filter(
+        ScrapeJob.state == "queued",
+    ).order_by(ScrapeJob.id.asc()).with_for_update(skip_locked=True).first()
+    if not job:
+        db.rollback()
+        return None
+    now = get_wib_now()
+    job.state = "running"
+    job.worker_id = WORKER_ID
+    job.attempts = (job.attempts or 0) + 1
+    job.started_at = now
+    job.heartbeat_at = now
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+async def run_job(job_id: int):
+    """Scrape, score and save results for one claimed job."""
+    from scraper import JobScraper
+    from ai_scorer import score_lead
+
+    db = SessionLocal()
+    try:
+        job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+        keywords, location, limit, safe_mode = job.keywords, job.location, job.limit, job.safe_mode
+        sources = [s for s in (job.sources or "").split(",") if s]
+        settings = {s.key: s.value for s in db.query(Setting).all()}
+    finally:
+        db.close()
+    cookie = settings.get("linkedin_cookie", "")
+    proxy = os.getenv("PROXY_URL", settings.get("proxy_url", ""))
+
+    interrupt_event = asyncio.Event()
+    reporter = JobReporter(job_id, interrupt_event)
+    reporter.status("running", worker_id=WORKER_ID)
+    reporter.start()
+
+    is_gmaps = 'gmaps' in sources
+    reporter.log(f"🚀 Starting background scrape for '{keywords}' ({'Prospects' if is_gmaps else 'Jobs'} mode)")
+
+    scraper = JobScraper(
+        headless=True,
+        cookie=cookie,
+        proxy=proxy,
+        safe_mode=safe_mode,
+        log_callback=reporter.log,
+        interrupt_event=interrupt_event
+    )
+
+    final_state, error = "completed", None
+    db = SessionLocal()
+    try:
+        results = await scraper.scrape_all(keywords, location, sources, limit=limit)
+
+        saved_leads = 0
+        saved_prospects = 0
+        skipped_dupes = 0
+
+        found_by_source = {}
+        for item in results:
+            found_by_source[item.get('source', '')] = found_by_source.get(item.get('source', ''), 0) + 1
+        reporter.progress(stage="scraped", found=len(results), by_source=found_by_source)
+        
+        for index, item in enumerate(results, start=1):
+            if interrupt_event.is_set(): 
+                reporter.log("🛑 Loop interrupted, stopping save...")
+                break
+            
+            source = item.get('source', '')
+            
+            # ── Google Maps → save to PROSPECTS table ──
+            if source == 'Google Maps':
+                maps_url = item.get('maps_url', '')
+                phone = item.get('phone', '').strip()
+                name = item.get('name', '').strip()
+                category_val = item.get('category', 'Local Business')
+
+                # Multi-field dedup: maps_url OR phone OR name+category
+                existing = None
+                if maps_url:
+                    existing = db.query(Prospect).filter(Prospect.maps_url == maps_url).first()
+                if not existing and phone:
+                    existing = db.query(Prospect).filter(Prospect.phone == phone).first()
+                if not existing and name:
+                    existing = db.query(Prospect).filter(
+                        Prospect.name == name,
+                        Prospect.category == category_val
+                    ).first()
+                
+                if not existing:
+                    reporter.log(f"✨ New prospect: {item['name']} | Phone: {item.get('phone', '-')}")
+                    # Score with AI
+                    try:
+                        ai_result = await score_lead(
+                            title=item['name'],
+                            company=item.get('category', 'Local Business'),
+                            description=f"Category: {item.get('category', '')} | Address: {item.get('address', '')}",
+                            has_website=item.get('has_website', False),
+                            category=item.get('category', '')
+                        )
+                    except Exception as ai_e:
+                        reporter.log(f"⚠️ AI Scorer error: {str(ai_e)}")
+                        ai_result = {"score": 0, "reason": "AI scoring failed"}
+                    
+                    new_prospect = Prospect(
+                        name=item['name'],
+                        category=item.get('category', 'Local Business'),
+                        address=item.get('address', ''),
+                        phone=item.get('phone', ''),
+                        email=item.get('email', ''),
+                        website=item.get('website', ''),
+                        has_website=item.get('has_website', False),
+                        rating=item.get('rating'),
+                        review_count=item.get('review_count'),
+                        maps_url=maps_url,
+                        match_score=ai_result['score'],
+                        match_reason=ai_result['reason'],
+                        source_keyword=item.get('source_keyword', keywords),
+                        status="new",
+                    )
+                    db.add(new_prospect)
+                    saved_prospects += 1
+                else:
+                    skipped_dupes += 1
+                    reporter.log(f"⏭️ Duplicate prospect (skip): {item['name']} — matched by {'maps_url' if maps_url and db.query(Prospect).filter(Prospect.maps_url == maps_url).first() else 'phone' if phone and db.query(Prospect).filter(Prospect.phone == phone).first() else 'name+category'}")
+            
+            # ── Other sources → save to LEADS table (as before) ──
+            else:
+                lead_url = item.get('url', '')
+                lead_title = item.get('title', '').strip()
+                lead_company = item.get('company', '').strip()
+
+                # Multi-field dedup: url OR title+company
+                existing = None
+                if lead_url:
+                    existing = db.query(Lead).filter(Lead.url == lead_url).first()
+                if not existing and lead_title and lead_company:
+                    existing = db.query(Lead).filter(
+                        Lead.title == lead_title,
+                        Lead.company == lead_company
+                    ).first()
+
+                if not existing:
+                    reporter.log(f"✨ New lead found: {item['title']} @ {item['company']}")
+                    try:
+                        ai_result = await score_lead(
+                            title=item['title'],
+                            company=item['company'],
+                            description=item.get('description', ''),
+                            has_website=item.get('has_website', True),
+                            category=item.get('company', '')
+                        )
+                    except Exception as ai_e:
+                        reporter.log(f"⚠️ AI Scorer error: {str(ai_e)}")
+                        ai_result = {"score": 0, "reason": "AI scoring failed"}
+                    
+                    new_lead = Lead(
+                        title=item['title'],
+                        company=item['company'],
+                        location=item['location'],
+                        description=item.get('description', ''),
+                        url=item['url'],
+                        source=item['source'],
+                        match_score=ai_result['score'],
+                        match_reason=ai_result['reason'],
+                        phone=item.get('phone', ''),
+                        has_website=item.get('has_website'),
+                        status="new",
+                    )
+                    db.add(new_lead)
+                    saved_leads += 1
+                else:
+                    skipped_dupes += 1
+                    reporter.log(f"⏭️ Duplicate lead (skip): {item['title']} @ {item['company']}")
+
+            reporter.progress(
+                stage="saving",
+                source=source,
+                processed=index,
+                found=len(results),
+                saved_leads=saved_leads,
+                saved_prospects=saved_prospects,
+                dupes=skipped_dupes,
+            )
+        
+        db.commit()
+        
+        total = saved_leads + saved_prospects
+        reporter.progress(
+            stage="done",
+            found=len(results),
+            saved_leads=saved_leads,
+            saved_prospects=saved_prospects,
+            dupes=skipped_dupes,
+        )
+        if saved_prospects > 0:
+            reporter.log(f"🎉 Scraping finished! Saved {saved_prospects} new prospects.")
+        if saved_leads > 0:
+            reporter.log(f"🎉 Scraping finished! Saved {saved_leads} new leads.")
+        if skipped_dupes > 0:
+            reporter.log(f"🔄 Skipped {skipped_dupes} duplicate entries.")
+        if total == 0:
+            reporter.log(f"📭 Scraping finished. No new data found (all {skipped_dupes} entries were duplicates).")
+
+        # Telegram notification (queued; coalesced with other finished jobs)
+        if total > 0:
+            from telegram_notifier import notify_new_leads, is_configured
+            if is_configured():
+                await notify_new_leads(total, ", ".join(sources))
+                
+    except Exception as e:
+        final_state, error = "failed", str(e)
+        reporter.log(f"❌ Error during scraping: {str(e)}")
+        print(traceback.format_exc())
+    finally:
+        db.close()
+        if final_state == "completed" and interrupt_event.is_set():
+            final_state = "cancelled"
+        reporter.log("💤 Scraper task ended.")
+        reporter.status(final_state)
+        await reporter.stop()
+        await asyncio.get_running_loop().run_in_executor(None, reporter.flush, final_state, error)
+
+
+async def worker_loop(stop_event: Optional[asyncio.Event] = None):
+    """Claim and run jobs one at a time until `stop_event` is set."""
+    stop_event = stop_event or asyncio.Event()
+    print(f"[ScrapeWorker] {WORKER_ID} polling for jobs every {POLL_INTERVAL:.0f}s")
+    while not stop_event.is_set():
+        job_id = None
+        db = SessionLocal()
+        try:
+            requeue_stale_jobs(db)
+            job = claim_next_job(db)
+            job_id = job.id if job else None
+        except Exception as e:
+            db.rollback()
+            print(f"[ScrapeWorker] Claim failed: {e}")
+        finally:
+            db.close()
+
+        if job_id:
+            await run_job(job_id)
+            continue
+        try:
+            await asyncio.wait_for(stop_event.wait(), POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _main():
+    from telegram_notifier import telegram
+    try:
+        await worker_loop()
+    finally:
+        # Unsent notifications go to the outbox instead of being lost
+        await telegram.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
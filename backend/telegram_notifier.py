@@ -1,16 +1,46 @@
 """
 Telegram Bot Notifier — sends CRM notifications to Telegram.
 Config loaded from environment variables (backend/.env).
+
+notify_* calls only enqueue: a bounded in-process queue is drained by one
+sender task over a pooled httpx client, so API handlers never wait on
+Telegram. Bursts of the same kind (several invoices paid, several scrape
+jobs finishing) are coalesced into one message. Messages that fail — or
+don't fit in the queue — go to the notification_outbox table and are
+retried with backoff by run_outbox(), which also survives restarts. Sends
+are spaced TELEGRAM_MIN_INTERVAL apart (Telegram allows about one message
+per second per chat); a 429 is retried after the `retry_after` it asks for.
 """
+import asyncio
+import html
+import logging
 import os
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
 import httpx
 from dotenv import load_dotenv
 
+from database import SessionLocal
+from models import NotificationOutbox, get_wib_now
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
 TELEGRAM_API = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "10"))
+TELEGRAM_MIN_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+# In-memory queue bound; overflow goes straight to the outbox table
+TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", "100"))
+# How long the sender waits for a burst to accumulate before sending coalescable events
+TELEGRAM_COALESCE_SECONDS = float(os.getenv("TELEGRAM_COALESCE_SECONDS", "3"))
+# Outbox: poll interval, attempts before a message is parked as failed
+TELEGRAM_OUTBOX_POLL = float(os.getenv("TELEGRAM_OUTBOX_POLL", "30"))
+TELEGRAM_OUTBOX_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_OUTBOX_MAX_ATTEMPTS", "10"))
 
 
 def is_configured() -> bool:
@@ -18,50 +48,305 @@ def is_configured() -> bool:
     return bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
 
 
+# ─── Rendering ───
+# Each kind renders a list of payloads into message texts. Kinds in
+# COALESCED turn a burst into one message; the rest render one per payload.
+
+def _render_new_leads(payloads: List[dict]) -> List[str]:
+    count = sum(p["count"] for p in payloads)
+    sources = ", ".join(dict.fromkeys(s for p in payloads for s in p["source"].split(", ") if s))
+    return [f"🔔 <b>{count} new leads</b> scraped from <b>{html.escape(sources)}</b>"]
+
+
+def _render_invoice_paid(payloads: List[dict]) -> List[str]:
+    if len(payloads) == 1:
+        p = payloads[0]
+        return [f"💰 <b>Invoice Paid!</b>\n#{html.escape(p['invoice_number'])}\nTotal: Rp {p['total']:,.0f}"]
+    lines = [f"💰 <b>{len(payloads)} Invoices Paid!</b>"]
+    lines += [f"#{html.escape(p['invoice_number'])} — Rp {p['total']:,.0f}" for p in payloads]
+    lines.append(f"Total: Rp {sum(p['total'] for p in payloads):,.0f}")
+    return ["\n".join(lines)]
+
+
+def _render_overdue_followup(payloads: List[dict]) -> List[str]:
+    return [
+        f"⚠️ <b>Follow-up overdue</b>\nLead: {html.escape(p['lead_name'])}\nOverdue: {p['days_overdue']} day(s)"
+        for p in payloads
+    ]
+
+
+def _render_overdue_digest(payloads: List[dict]) -> List[str]:
+    texts = []
+    for p in payloads:
+        lines = [f"⚠️ <b>{p['total']} follow-up(s) overdue</b>"]
+        for name, kind, days in p["items"]:
+            lines.append(f"• {html.escape(name or 'Unknown')} ({kind}) — {days} day(s)")
+        if p["total"] > len(p["items"]):
+            lines.append(f"…and {p['total'] - len(p['items'])} more")
+        texts.append("\n".join(lines))
+    return texts
+
+
+def _render_message(payloads: List[dict]) -> List[str]:
+    return [p["text"] for p in payloads]
+
+
+RENDERERS: Dict[str, Callable[[List[dict]], List[str]]] = {
+    "new_leads": _render_new_leads,
+    "invoice_paid": _render_invoice_paid,
+    "overdue_followup": _render_overdue_followup,
+    "overdue_digest": _render_overdue_digest,
+    "message": _render_message,
+}
+COALESCED = {"new_leads", "invoice_paid"}
+
+
+class _Outgoing:
+    def __init__(self, kind: str, payload: dict, durable: bool, future: Optional[asyncio.Future] = None):
+        self.kind = kind
+        self.payload = payload
+        self.durable = durable  # failed sends go to the outbox instead of being dropped
+        self.future = future
+
+
+class TelegramNotifier:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._sender: Optional[asyncio.Task] = None
+        self.stats = {"queued": 0, "sent": 0, "coalesced": 0, "outboxed": 0, "failed": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=TELEGRAM_TIMEOUT)
+        return self._client
+
+    async def aclose(self):
+        """Stop the sender; anything still queued is saved to the outbox for the next process."""
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+        leftovers = []
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item.durable:
+                leftovers.append(item)
+        if leftovers:
+            try:
+                _persist([(i.kind, text, None) for i in leftovers for text in RENDERERS[i.kind]([i.payload])])
+            except Exception as e:
+                logger.warning(f"[Telegram] Could not save {len(leftovers)} queued notification(s): {e}")
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def deliver(self, message: str, parse_mode: str = "HTML") -> dict:
+        """POST one message, waiting out 429s (up to TELEGRAM_MAX_RETRIES times)."""
+        for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+            try:
+                response = await self.client.post(
+                    f"{TELEGRAM_API}/sendMessage",
+                    json={"chat_id": TELEGRAM_CHAT_ID, "text": message, "parse_mode": parse_mode},
+                )
+                data = response.json()
+            except Exception as e:
+                logger.warning(f"[Telegram] Error: {e}")
+                return {"success": False, "error": str(e)}
+
+            if data.get("ok"):
+                return {"success": True}
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+            if response.status_code == 429 and attempt < TELEGRAM_MAX_RETRIES:
+                wait = float(retry_after or 2 ** attempt)
+                logger.warning(f"[Telegram] Rate limited; retrying in {wait:.0f}s")
+                await asyncio.sleep(wait)
+                continue
+            return {"success": False, "error": data.get("description", "Unknown Telegram error"), "retry_after": retry_after}
+        return {"success": False, "error": "Rate limited"}
+
+    # ─── Queue ───
+
+    def enqueue(self, kind: str, payload: dict, durable: bool = True, future: Optional[asyncio.Future] = None):
+        """Queue a notification without waiting. A full queue spills to the outbox."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=TELEGRAM_QUEUE_SIZE)
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._drain())
+        try:
+            self._queue.put_nowait(_Outgoing(kind, payload, durable, future))
+            self.stats["queued"] += 1
+        except asyncio.QueueFull:
+            if durable:
+                _persist([(kind, text, None) for text in RENDERERS[kind]([payload])])
+                self.stats["outboxed"] += 1
+            elif future is not None:
+                future.set_result({"success": False, "error": "Notification queue is full"})
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            if items[0].kind in COALESCED:
+                await asyncio.sleep(TELEGRAM_COALESCE_SECONDS)
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            # Group coalescable kinds (keeping first-seen order); everything else goes one by one
+            groups: Dict[object, List[_Outgoing]] = {}
+            for item in items:
+                groups.setdefault(item.kind if item.kind in COALESCED else id(item), []).append(item)
+            for group in groups.values():
+                kind = group[0].kind
+                parse_mode = group[0].payload.get("parse_mode", "HTML")
+                self.stats["coalesced"] += len(group) - 1
+                for text in RENDERERS[kind]([i.payload for i in group]):
+                    try:
+                        result = await self.deliver(text, parse_mode)
+                    except Exception as e:
+                        result = {"success": False, "error": str(e)}
+                    if result["success"]:
+                        self.stats["sent"] += 1
+                    else:
+                        self.stats["failed"] += 1
+                    if not result["success"] and any(i.durable for i in group):
+                        try:
+                            await loop.run_in_executor(None, _persist, [(kind, text, result.get("error"))], 1)
+                            self.stats["outboxed"] += 1
+                        except Exception as e:
+                            logger.warning(f"[Telegram] Could not save failed notification: {e}")
+                    for i in group:
+                        if i.future is not None and not i.future.done():
+                            i.future.set_result(result)
+                    await asyncio.sleep(TELEGRAM_MIN_INTERVAL)
+
+    # ─── Outbox ───
+
+    async def run_outbox(self, stop_event: asyncio.Event):
+        """Retry outbox messages whose next attempt is due, until `stop_event` is set."""
+        loop = asyncio.get_running_loop()
+        while not stop_event.is_set():
+            if is_configured():
+                try:
+                    for row_id, text in await loop.run_in_executor(None, _claim_due):
+                        result = await self.deliver(text)
+                        await loop.run_in_executor(None, _settle, row_id, result)
+                        if result["success"]:
+                            self.stats["sent"] += 1
+                        await asyncio.sleep(TELEGRAM_MIN_INTERVAL)
+                except Exception as e:
+                    logger.warning(f"[Telegram] Outbox retry failed: {e}")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=TELEGRAM_OUTBOX_POLL)
+            except asyncio.TimeoutError:
+                pass
+
+    def metrics(self) -> dict:
+        return {**self.stats, "queue_depth": self._queue.qsize() if self._queue else 0}
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(3600, 30 * 2 ** max(0, attempts - 1)))
+
+
+def _persist(rows: list, attempts: int = 0):
+    """Save (kind, text, error) rows to the outbox, due after the backoff for `attempts`."""
+    now = get_wib_now()
+    db = SessionLocal()
+    try:
+        db.add_all([
+            NotificationOutbox(kind=kind, text=text, last_error=error, attempts=attempts,
+                               next_attempt_at=now + _backoff(attempts) if attempts else now)
+            for kind, text, error in rows
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim_due(limit: int = 20) -> list:
+    """Due pending outbox rows, each pushed out by a lease so no other process sends it meanwhile."""
+    now = get_wib_now()
+    db = SessionLocal()
+    try:
+        rows = db.query(NotificationOutbox.id, NotificationOutbox.text).filter(
+            NotificationOutbox.state == "pending", NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.next_attempt_at.asc()).limit(limit).all()
+        claimed = []
+        for row_id, text in rows:
+            updated = db.query(NotificationOutbox).filter(
+                NotificationOutbox.id == row_id, NotificationOutbox.next_attempt_at <= now
+            ).update({"next_attempt_at": now + timedelta(minutes=5)}, synchronize_session=False)
+            if updated:
+                claimed.append((row_id, text))
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _settle(row_id: int, result: dict):
+    db = SessionLocal()
+    try:
+        row = db.query(NotificationOutbox).filter(NotificationOutbox.id == row_id).first()
+        if row is None:
+            return
+        if result["success"]:
+            db.delete(row)
+        else:
+            row.attempts = (row.attempts or 0) + 1
+            row.last_error = result.get("error")
+            if row.attempts >= TELEGRAM_OUTBOX_MAX_ATTEMPTS:
+                row.state = "failed"
+            else:
+                row.next_attempt_at = get_wib_now() + _backoff(row.attempts)
+        db.commit()
+    finally:
+        db.close()
+
+
+telegram = TelegramNotifier()
+
+
+def _notify(kind: str, payload: dict) -> dict:
+    if not is_configured():
+        return {"success": False, "error": "Telegram not configured. Set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID in .env"}
+    telegram.enqueue(kind, payload)
+    return {"success": True, "queued": True}
+
+
 async def send_notification(message: str, parse_mode: str = "HTML") -> dict:
     """
-    Send a notification message to the configured Telegram chat.
+    Send a notification message to the configured Telegram chat and wait
+    for the outcome (e.g. the settings "test" button).
     Returns {"success": True/False, "error": "..."}.
     """
     if not is_configured():
         return {"success": False, "error": "Telegram not configured. Set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID in .env"}
-
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{TELEGRAM_API}/sendMessage",
-                json={
-                    "chat_id": TELEGRAM_CHAT_ID,
-                    "text": message,
-                    "parse_mode": parse_mode,
-                },
-            )
-
-            data = response.json()
-            if data.get("ok"):
-                return {"success": True}
-            else:
-                return {"success": False, "error": data.get("description", "Unknown Telegram error")}
-
-    except Exception as e:
-        print(f"[Telegram] Error: {e}")
-        return {"success": False, "error": str(e)}
+    future = asyncio.get_running_loop().create_future()
+    telegram.enqueue("message", {"text": message, "parse_mode": parse_mode}, durable=False, future=future)
+    return await future
 
 
 async def notify_new_leads(count: int, source: str):
-    """Notify about newly scraped leads."""
-    msg = f"🔔 <b>{count} new leads</b> scraped from <b>{source}</b>"
-    return await send_notification(msg)
+    """Notify about newly scraped leads (queued; coalesced with other scrape results)."""
+    return _notify("new_leads", {"count": count, "source": source})
 
 
 async def notify_overdue_followup(lead_name: str, days_overdue: int):
     """Notify about overdue follow-ups."""
-    msg = f"⚠️ <b>Follow-up overdue</b>\nLead: {lead_name}\nOverdue: {days_overdue} day(s)"
-    return await send_notification(msg)
+    return _notify("overdue_followup", {"lead_name": lead_name, "days_overdue": days_overdue})
+
+
+async def notify_overdue_digest(items: list, total: int):
+    """
+    One message for a sweep's overdue follow-ups. `items` are
+    (name, type, days_overdue) tuples, most overdue first; `total` may
+    exceed len(items) when the list was truncated.
+    """
+    return _notify("overdue_digest", {"items": [list(i) for i in items], "total": total})
 
 
 async def notify_invoice_paid(invoice_number: str, total: float):
-    """Notify when an invoice is marked as paid."""
-    formatted = f"Rp {total:,.0f}"
-    msg = f"💰 <b>Invoice Paid!</b>\n#{invoice_number}\nTotal: {formatted}"
-    return await send_notification(msg)
+    """Notify when an invoice is marked as paid (queued; coalesced with other payments)."""
+    return _notify("invoice_paid", {"invoice_number": str(invoice_number or ""), "total": total or 0})
@@ -0,0 +1,48 @@
+"""
+Shared fixtures. Tests run against a throwaway SQLite database; DATABASE_URL,
+SECRET_KEY and the archive directory are set before any app module is imported.
+
+    cd backend && pip install -r requirements-dev.txt && python -m pytest
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="velora-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["ACTIVITY_LOG_ARCHIVE_DIR"] = os.path.join(_tmp, "archives")
+
+import pytest
+
+from database import SessionLocal, engine
+from models import Base
+
+
+@pytest.fixture(autouse=True)
+def schema():
+    """Fresh tables for every test."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    """API client with authentication bypassed."""
+    from fastapi.testclient import TestClient
+    from main import app, get_current_user
+
+    app.dependency_overrides[get_current_user] = lambda: None
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,110 @@
+import gzip
+import importlib.util
+import json
+import os
+import sys
+import types
+from datetime import datetime
+
+import pytest
+
+import activity_retention
+from activity_retention import _stage, archive_path, prune_expired
+from database import SessionLocal
+from models import ActivityLog
+
+NOW = datetime(2026, 10, 19, 12, 0)  # cutoff 2026-07-21 with the 90 day default
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(activity_retention, "ACTIVITY_LOG_ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _seed(db):
+    db.add_all([
+        ActivityLog(category="system", message="june", created_at=datetime(2026, 6, 30, 23, 0)),
+        ActivityLog(category="system", message="july", created_at=datetime(2026, 7, 1, 8, 0)),
+        ActivityLog(category="system", message="kept", created_at=datetime(2026, 10, 1, 8, 0)),
+        ActivityLog(category="system", message="undated", created_at=None),
+    ])
+    db.commit()
+
+
+def _archived(month):
+    with gzip.open(archive_path(month), "rt", encoding="utf-8") as f:
+        return [json.loads(line)["message"] for line in f]
+
+
+def _remaining(db):
+    db.expire_all()
+    return sorted(r.message for r in db.query(ActivityLog))
+
+
+def test_expired_rows_move_to_downloadable_monthly_archives(client, db, archive_dir):
+    _seed(db)
+    assert prune_expired(NOW) == 2
+    assert _archived("2026-06") == ["june"] and _archived("2026-07") == ["july"]
+    assert _remaining(db) == ["kept", "undated"]
+    assert sorted(os.listdir(archive_dir)) == [".lock", "activity_logs-2026-06.jsonl.gz", "activity_logs-2026-07.jsonl.gz"]
+
+    for name in ("activity_logs-2026-06.jsonl.gz", "activity_logs-2026-07.jsonl.gz"):
+        assert client.get(f"/api/logs/archives/{name}").status_code == 200
+
+
+def test_failed_commit_then_retry_archives_each_row_once(db, monkeypatch):
+    _seed(db)
+
+    class FailingCommit(SessionLocal.class_):
+        def commit(self):
+            raise RuntimeError("connection lost")
+    with monkeypatch.context() as m:
+        m.setattr(activity_retention, "SessionLocal", lambda: FailingCommit(bind=SessionLocal.kw["bind"]))
+        with pytest.raises(RuntimeError):
+            prune_expired(NOW)
+
+    assert _remaining(db) == ["july", "june", "kept", "undated"]
+    assert prune_expired(NOW) == 2
+    assert _archived("2026-06") == ["june"] and _archived("2026-07") == ["july"]
+
+
+def test_parts_left_by_a_crash_after_commit_are_appended_once(db, archive_dir):
+    db.add(ActivityLog(category="system", message="earlier", created_at=datetime(2026, 7, 2)))
+    db.commit()
+    prune_expired(NOW)
+    _seed(db)
+
+    # Crash right after the DELETE committed: the June part was never appended,
+    # the July one was renamed and half-appended
+    rows = db.query(ActivityLog).filter(ActivityLog.created_at < datetime(2026, 7, 21)).all()
+    parts = sorted(_stage(rows))
+    db.query(ActivityLog).filter(ActivityLog.id.in_([r.id for r in rows])).delete(synchronize_session=False)
+    db.commit()
+    july = next(p for p in parts if "2026-07" in p)
+    size = os.path.getsize(archive_path("2026-07"))
+    folding = july[:-len("part")] + f"{size}.fold"
+    os.replace(july, folding)
+    with open(folding, "rb") as src, open(archive_path("2026-07"), "ab") as dst:
+        dst.write(src.read()[:20])
+
+    assert prune_expired(NOW) == 0
+    assert _archived("2026-06") == ["june"]
+    assert _archived("2026-07") == ["earlier", "july"]
+    assert not [n for n in os.listdir(archive_dir) if n.endswith((".part", ".fold"))]
+
+
+def test_lock_falls_back_to_msvcrt_without_fcntl(monkeypatch, archive_dir):
+    calls = []
+    msvcrt = types.SimpleNamespace(LK_NBLCK=2, LK_UNLCK=0, locking=lambda fd, mode, n: calls.append(mode))
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    monkeypatch.setitem(sys.modules, "msvcrt", msvcrt)
+    spec = importlib.util.spec_from_file_location("activity_retention_windows", activity_retention.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.ACTIVITY_LOG_ARCHIVE_DIR = str(archive_dir)
+
+    assert module.fcntl is None
+    with module._archive_lock():
+        assert calls == [msvcrt.LK_NBLCK]
+    assert calls == [msvcrt.LK_NBLCK, msvcrt.LK_UNLCK]
@@ -0,0 +1,103 @@
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import inspect
+
+from auth import TokenUserCache, create_access_token, token_user_cache
+from main import _resolve_user
+from models import User
+
+
+@pytest.fixture
+def user(db):
+    user = User(email="admin@example.com", hashed_password="hash", is_active=True)
+    db.add(user)
+    db.commit()
+    token_user_cache.clear()
+    return user
+
+
+def _token(email):
+    return create_access_token({"sub": email}, expires_delta=timedelta(minutes=5))
+
+
+def test_cache_hit_returns_session_bound_user(db, user):
+    token = _token(user.email)
+    _resolve_user(token, db)
+    assert token_user_cache.get(token) == (user.id, user.email)
+
+    db.expunge_all()
+    cached = _resolve_user(token, db)
+    assert inspect(cached).persistent
+    assert cached in db
+    assert cached.hashed_password == "hash"  # not cached: lazy-loaded through the session
+    assert db.merge(cached) is cached
+
+
+def test_orm_deactivation_evicts_cached_token(db, user):
+    token = _token(user.email)
+    _resolve_user(token, db)
+
+    user.is_active = False
+    db.commit()
+
+    assert token_user_cache.get(token) is None
+    with pytest.raises(HTTPException) as exc:
+        _resolve_user(token, db)
+    assert exc.value.status_code == 401
+
+
+def test_entries_expire_after_ttl():
+    cache = TokenUserCache(maxsize=4, ttl=0.05)
+    cache.put("token", 1, "admin@example.com")
+    assert cache.get("token") == (1, "admin@example.com")
+    time.sleep(0.06)
+    assert cache.get("token") is None
+
+
+def test_entries_never_outlive_the_token():
+    cache = TokenUserCache(maxsize=4, ttl=60)
+    cache.put("token", 1, "admin@example.com", token_exp=time.time() - 1)
+    assert cache.get("token") is None
+
+
+def test_stream_token_is_short_lived_and_stream_only(db, user):
+    from fastapi.testclient import TestClient
+    from jose import jwt
+    from auth import ALGORITHM, SECRET_KEY, STREAM_TOKEN_EXPIRE_SECONDS
+    from main import app
+
+    client = TestClient(app)
+    access = _token(user.email)
+    resp = client.post("/api/stream-token", headers={"Authorization": f"Bearer {access}"})
+    assert resp.status_code == 200
+    stream = resp.json()["token"]
+    claims = jwt.decode(stream, SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["scope"] == "stream"
+    assert claims["exp"] - time.time() <= STREAM_TOKEN_EXPIRE_SECONDS
+
+    # Stream tokens don't work as API credentials...
+    assert client.get("/api/metrics", headers={"Authorization": f"Bearer {stream}"}).status_code == 401
+    with pytest.raises(HTTPException):
+        _resolve_user(stream, db)
+    # ...and SSE endpoints refuse the access token in the query string
+    assert client.get(f"/api/campaigns/stream?token={access}").status_code == 401
+    assert _resolve_user(stream, db, scope="stream").id == user.id
+
+
+def test_stream_auth_does_not_hold_a_connection(user):
+    import asyncio
+    from sqlalchemy import inspect
+    from starlette.requests import Request
+    from auth import create_stream_token
+    from database import engine
+    from main import get_stream_user
+
+    email = user.email
+    held = engine.pool.checkedout()  # the fixture's own session
+    request = Request({"type": "http", "headers": []})
+    resolved = asyncio.run(get_stream_user(request, token=create_stream_token(email)))
+    assert resolved.email == email and inspect(resolved).detached
+    assert engine.pool.checkedout() == held
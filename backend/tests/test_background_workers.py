@@ -0,0 +1,17 @@
+import main
+from main import app
+
+
+def test_background_loops_are_kept_and_awaited_on_shutdown(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "BACKGROUND_SHUTDOWN_GRACE", 5)
+    try:
+        with TestClient(app):
+            tasks = list(app.state.background_tasks)
+            running = [t for t in tasks if not t.done()]  # everything but the one-off resume
+            assert len(running) >= len(tasks) - 1
+        assert all(t.done() for t in tasks)
+        assert not any(t.cancelled() for t in running)  # each loop saw the stop event in time
+    finally:
+        main._background_stop.clear()
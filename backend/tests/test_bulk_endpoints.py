@@ -0,0 +1,72 @@
+import pytest
+
+from models import FollowUp, Lead, Project, Prospect
+
+
+@pytest.fixture
+def seeded(db):
+    leads = [Lead(title=f"Dev {i}", company=f"Co {i}", url=f"https://jobs/{i}", status=s)
+             for i, s in enumerate(["new", "new", "won"])]
+    prospects = [Prospect(name=f"Toko {i}", category="Retail", phone=f"0812000{i}", maps_url=f"https://maps/{i}",
+                          has_website=i == 0, status=s)
+                 for i, s in enumerate(["new", "new", "won"])]
+    db.add_all(leads + prospects)
+    db.flush()
+    db.add_all([Project(lead_id=leads[0].id, name="Site"), FollowUp(lead_id=leads[0].id),
+                FollowUp(prospect_id=prospects[0].id)])
+    db.commit()
+    return db
+
+
+def _statuses(db, model):
+    db.expire_all()
+    return sorted(r.status for r in db.query(model))
+
+
+UNUSABLE = [
+    {},
+    {"status": "all", "source": "all"},
+    {"search": ""},
+    {"search": "   "},
+    {"start_date": "x"},
+    {"end_date": "2026-13-45"},
+    {"wa_status": "maybe"},
+]
+
+
+@pytest.mark.parametrize("kind,model,filters",
+    [("leads", Lead, f) for f in UNUSABLE] +
+    [("prospects", Prospect, f) for f in UNUSABLE + [{"has_website": "sometimes"}]])
+def test_filters_that_narrow_nothing_are_refused(client, seeded, kind, model, filters):
+    for action, extra in (("bulk-delete", {}), ("bulk-update", {"status": "lost"})):
+        resp = client.post(f"/api/{kind}/{action}", json={"filters": filters, **extra})
+        assert resp.status_code == 400, (action, resp.json())
+    assert _statuses(seeded, model) == ["new", "new", "won"]
+
+
+def test_empty_values_are_ignored_next_to_a_real_filter(client, seeded):
+    resp = client.post("/api/leads/bulk-update", json={"filters": {"status": "new", "search": ""}, "status": "contacted"})
+    assert resp.json() == {"updated": 2}
+    assert _statuses(seeded, Lead) == ["contacted", "contacted", "won"]
+
+
+def test_bulk_delete_by_filter_takes_dependents_along(client, seeded):
+    assert client.post("/api/leads/bulk-delete", json={"filters": {"search": "Dev 0"}}).json() == {"deleted": 1}
+    assert seeded.query(Project).count() == 0
+    assert client.post("/api/prospects/bulk-delete", json={"filters": {"has_website": "yes"}}).json() == {"deleted": 1}
+    assert seeded.query(FollowUp).count() == 1  # the prospect's follow-up is kept, unlinked
+    assert _statuses(seeded, Lead) == ["new", "won"] and _statuses(seeded, Prospect) == ["new", "won"]
+
+
+def test_empty_id_list_is_refused(client, seeded):
+    assert client.post("/api/prospects/bulk-delete", json={"ids": []}).status_code == 400
+    assert client.post("/api/prospects/bulk-delete", json={"ids": [999]}).json() == {"deleted": 0}
+
+
+def test_score_filter_counts_as_a_filter_without_deprecation_warnings(client, seeded, recwarn):
+    seeded.query(Lead).filter(Lead.status == "won").update({"match_score": 90})
+    seeded.commit()
+    resp = client.post("/api/leads/bulk-update", json={"filters": {"min_score": 50}, "status": "lost"})
+    assert resp.json() == {"updated": 1}
+    assert _statuses(seeded, Lead) == ["lost", "new", "new"]
+    assert not [w for w in recwarn if "deprecated" in str(w.message).lower()]
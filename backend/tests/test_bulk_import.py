@@ -0,0 +1,73 @@
+import io
+
+import bulk_import
+from bulk_import import _existing_keys, _prospect_keys, import_file
+from models import Lead, Prospect
+
+
+def _csv(*lines):
+    return io.BytesIO(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def test_leads_are_deduplicated_against_the_file_and_the_database(db, monkeypatch):
+    monkeypatch.setattr(bulk_import, "IMPORT_CHUNK", 2)
+    db.add(Lead(title="Backend Dev", company="Acme", url="https://jobs/1"))
+    db.commit()
+
+    report = import_file("leads", _csv(
+        "Title,Company,URL,Email",
+        "Backend Dev,Acme,https://jobs/9,",        # title+company already stored
+        "Frontend Dev,Acme,https://jobs/1,",       # url already stored
+        "Data Engineer,Beta,https://jobs/2,",
+        "Data Engineer,Beta,https://jobs/3,",      # title+company repeated in the file
+        "QA,Gamma,https://jobs/4,not-an-email",
+        "QA,Delta,https://jobs/5,",
+    ), "leads.csv")
+
+    assert {k: report[k] for k in ("rows", "inserted", "duplicates", "rejected")} == \
+        {"rows": 6, "inserted": 2, "duplicates": 3, "rejected": 1}
+    assert [e["row"] for e in report["errors"]] == [6]
+    assert sorted(u for (u,) in db.query(Lead.url)) == ["https://jobs/1", "https://jobs/2", "https://jobs/5"]
+
+
+def test_prospects_are_deduplicated_by_maps_url_phone_and_name_category(db):
+    db.add(Prospect(name="Toko Maju", category="Retail", phone="0811", maps_url="https://maps/1"))
+    db.commit()
+
+    report = import_file("prospects", _csv(
+        "name,category,phone,maps_url",
+        "Other,Retail,0899,https://maps/1",       # maps_url
+        "Other,Retail,0811,https://maps/2",       # phone
+        "Toko Maju,Retail,0822,https://maps/3",   # name+category
+        "Toko Maju,,0833,https://maps/4",         # blank category: default, not a duplicate
+        "Toko Maju,,0844,https://maps/5",         # ...and this one repeats it
+        "No Phone,Retail,,https://maps/6",
+    ), "prospects.csv")
+
+    assert {k: report[k] for k in ("inserted", "duplicates", "rejected")} == {"inserted": 1, "duplicates": 4, "rejected": 1}
+    db.expire_all()
+    assert db.query(Prospect).filter(Prospect.phone == "0833").one().category == "Local Business"
+
+
+def test_missing_category_matches_stored_rows_without_one(db):
+    db.add_all([Prospect(name="Warung", category=None, phone="0811"),
+                Prospect(name="Kios", category="", phone="0822")])
+    db.commit()
+
+    keys = [_prospect_keys({"name": "Warung", "category": None}), _prospect_keys({"name": "Kios", "category": ""}),
+            _prospect_keys({"name": "Warung", "category": "Retail"})]
+    found = _existing_keys(db, [(k, None) for k in keys])
+    assert found == {("name_category", ("Warung", "")), ("name_category", ("Kios", ""))}
+
+
+def test_errors_point_at_the_spreadsheet_row_past_blank_lines(db):
+    report = import_file("leads", _csv(
+        "Title,Company,URL,Email",
+        "Backend Dev,Acme,https://jobs/1,",
+        "",
+        ",,,",
+        "QA,Gamma,https://jobs/2,not-an-email",
+    ), "leads.csv")
+
+    assert report["inserted"] == 1 and report["rejected"] == 1
+    assert [e["row"] for e in report["errors"]] == [5]
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import campaign_runner
+from campaign_runner import CampaignRun, CampaignRunner, DevicePool, ResultBuffer, materialize_audience
+from campaign_sim import FakeTransport, VirtualClock
+from database import SessionLocal
+from models import Campaign, CampaignSend, FollowUp, Lead, Prospect, get_wib_now
+
+# Monday 10:00 WIB: inside the default send window
+START = datetime(2026, 10, 19, 10, 0)
+
+
+def _runner():
+    clock = VirtualClock(START)
+    transport = FakeTransport(clock)
+    runner = CampaignRunner(clock=clock, session_factory=SessionLocal, transport=transport, simulated=True)
+    return runner, transport
+
+
+def _campaign(db, recipients=3, **fields):
+    for i in range(recipients):
+        db.add(Lead(title=f"Owner {i}", company=f"Shop {i}", phone=f"08123456780{i}", status="new"))
+    campaign = Campaign(name="Launch", message_template="Hi {name}", target_type="leads", status="draft", **fields)
+    db.add(campaign)
+    db.commit()
+    return campaign
+
+
+def _states(db, campaign_id):
+    db.expire_all()
+    return [s.state for s in db.query(CampaignSend).filter(
+        CampaignSend.campaign_id == campaign_id).order_by(CampaignSend.position)]
+
+
+def test_campaign_leased_elsewhere_is_left_alone_until_the_lease_expires(db):
+    campaign = _campaign(db)
+    campaign.runner_id = "other-host:1"
+    campaign.lease_expires_at = get_wib_now() + timedelta(minutes=5)
+    db.commit()
+
+    runner, transport = _runner()
+    asyncio.run(runner.run_campaign(campaign.id))
+    assert transport.sends == []
+    assert _states(db, campaign.id) == []
+
+    campaign.lease_expires_at = get_wib_now() - timedelta(seconds=1)
+    db.commit()
+    asyncio.run(runner.run_campaign(campaign.id))
+    assert len(transport.sends) == 3
+    db.refresh(campaign)
+    assert (campaign.status, campaign.sent_count, campaign.runner_id) == ("completed", 3, None)
+
+
+def test_resume_after_crash_neither_resends_nor_double_records(db):
+    campaign = _campaign(db)
+    materialize_audience(db, campaign)
+    sends = db.query(CampaignSend).order_by(CampaignSend.position).all()
+    # Crashed after Fonnte accepted #0 (side effects not yet recorded) and in the middle of #1
+    sends[0].state, sends[0].sent_at, sends[0].recorded = "sent", START, False
+    sends[1].state = "sending"
+    campaign.status = "running"
+    db.commit()
+
+    runner, transport = _runner()
+    asyncio.run(runner.run_campaign(campaign.id))
+
+    assert len(transport.sends) == 1
+    assert _states(db, campaign.id) == ["sent", "failed", "sent"]
+    db.refresh(campaign)
+    assert (campaign.sent_count, campaign.failed_count) == (2, 1)
+    assert db.query(FollowUp).count() == 2
+
+    # Nothing left to do: a relaunch sends and records nothing more
+    asyncio.run(runner.run_campaign(campaign.id))
+    assert len(transport.sends) == 1
+    db.refresh(campaign)
+    assert (campaign.sent_count, campaign.failed_count) == (2, 1)
+
+
+def test_stop_while_waiting_for_a_device_leaves_the_recipient_pending(db):
+    campaign = _campaign(db, recipients=1)
+    runner, transport = _runner()
+    # The only device is busy for an hour; the user stops the campaign during the wait
+    runner.devices.devices[0].next_free = runner.clock.monotonic() + 3600
+    sleep = runner.clock.sleep
+
+    async def stop_then_sleep(seconds, stop_event=None):
+        runner.stop(campaign.id)
+        await sleep(seconds, stop_event)
+    runner.clock.sleep = stop_then_sleep
+
+    asyncio.run(runner.run_campaign(campaign.id))
+
+    assert transport.sends == []
+    db.expire_all()
+    send = db.query(CampaignSend).one()
+    assert (send.state, send.attempt or 0) == ("pending", 0)
+    db.refresh(campaign)
+    assert (campaign.status, campaign.sent_count, campaign.failed_count) == ("paused", 0, 0)
+
+
+def test_prospect_campaign_created_over_the_api_targets_prospects(client, db):
+    db.add(Lead(title="Owner", company="Shop", phone="081234567800", status="new"))
+    db.add(Prospect(name="Toko Maju", category="Retail", phone="081234567801", maps_url="https://maps/1"))
+    db.commit()
+
+    resp = client.post("/api/campaigns", json={
+        "name": "Maps outreach", "message_template": "Hi {name}",
+        "target_type": "prospects", "smart_ai": True,
+    })
+    assert resp.status_code == 200
+    campaign = db.get(Campaign, resp.json()["id"])
+    assert (campaign.target_type, campaign.smart_ai) == ("prospects", True)
+
+    materialize_audience(db, campaign)
+    sends = db.query(CampaignSend).filter(CampaignSend.campaign_id == campaign.id).all()
+    assert [(s.target_type, s.target_id) for s in sends] == [("prospect", db.query(Prospect).one().id)]
+
+
+def test_unexpected_error_pauses_the_campaign_instead_of_leaving_it_running(db, monkeypatch):
+    campaign = _campaign(db)
+    runner, transport = _runner()
+
+    def broken_page(self, drafts_only=False):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(CampaignRun, "_fetch_page", broken_page)
+
+    asyncio.run(runner.run_campaign(campaign.id))
+
+    db.refresh(campaign)
+    assert (campaign.status, campaign.runner_id) == ("paused", None)
+    assert db.query(Campaign).filter(Campaign.status == "running").count() == 0
+
+
+def test_device_tokens_keep_their_equals_signs(monkeypatch):
+    monkeypatch.setenv("FONNTE_TOKENS", "cs-1=abc==, dGVzdA==, xyz=, sales=tok=en, a+b=c")
+    pool = DevicePool(VirtualClock(START))
+    assert [(d.name, d.token) for d in pool.devices] == [
+        ("cs-1", "abc=="), ("device-2", "dGVzdA=="), ("device-3", "xyz="),
+        ("sales", "tok=en"), ("device-5", "a+b=c"),
+    ]
+
+
+def test_result_flushes_run_off_the_event_loop(db, monkeypatch):
+    monkeypatch.setattr(campaign_runner, "FLUSH_SIZE", 2)
+    campaign = _campaign(db, recipients=5)
+    threads = []
+    apply = ResultBuffer._apply
+
+    def recording_apply(self):
+        threads.append(threading.current_thread())
+        return apply(self)
+    monkeypatch.setattr(ResultBuffer, "_apply", recording_apply)
+
+    runner, transport = _runner()
+    asyncio.run(runner.run_campaign(campaign.id))
+
+    assert len(threads) >= 2 and threading.main_thread() not in threads
+    db.refresh(campaign)
+    assert (campaign.sent_count, campaign.failed_count) == (5, 0)
+    assert db.query(FollowUp).count() == 5
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from campaign_runner import CampaignRunner
+from campaign_scheduler import CampaignScheduler, apply_schedule
+from campaign_sim import FakeTransport, VirtualClock
+from database import SessionLocal
+from models import Campaign
+
+NOW = datetime(2026, 10, 19, 10, 0)
+
+
+def _scheduler():
+    clock = VirtualClock(NOW)
+    runner = CampaignRunner(clock=clock, session_factory=SessionLocal, transport=FakeTransport(clock), simulated=True)
+    return CampaignScheduler(runner, session_factory=SessionLocal)
+
+
+def _schedule(db, *offsets_min):
+    campaigns = []
+    for i, offset in enumerate(offsets_min):
+        campaign = Campaign(name=f"C{i}", scheduled_at=NOW + timedelta(minutes=offset))
+        apply_schedule(campaign)
+        campaigns.append(campaign)
+    db.add_all(campaigns)
+    db.commit()
+    return [c.id for c in campaigns]
+
+
+def test_due_campaigns_are_claimed_once_across_schedulers(db):
+    late, due, future = _schedule(db, -30, 0, 5)
+    first, second = _scheduler(), _scheduler()
+
+    assert [c for c, _ in first._claim_due(NOW, limit=1)] == [late]
+    assert [c for c, _ in second._claim_due(NOW, limit=5)] == [due]
+    assert first._claim_due(NOW, limit=5) == []
+    assert first._next_due() == NOW + timedelta(minutes=5)
+
+    first._unclaim(due)
+    db.expire_all()
+    assert [db.get(Campaign, c).status for c in (late, due, future)] == ["running", "scheduled", "scheduled"]
+
+
+def test_clearing_a_schedule_only_touches_schedulable_campaigns():
+    campaign = Campaign(status="draft", scheduled_at=NOW)
+    apply_schedule(campaign)
+    assert campaign.status == "scheduled"
+    campaign.scheduled_at = None
+    apply_schedule(campaign)
+    assert campaign.status == "draft"
+
+    running = Campaign(status="running", scheduled_at=NOW)
+    apply_schedule(running)
+    assert running.status == "running"
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import campaign_sim
+from campaign_sim import simulate_campaign
+from models import Campaign, CampaignSend, Lead
+
+
+def test_simulation_runs_off_the_callers_loop_and_writes_nothing(db, monkeypatch):
+    db.add_all([Lead(title=f"Owner {i}", company=f"Shop {i}", phone=f"08123456780{i}") for i in range(4)])
+    campaign = Campaign(name="Dry run", message_template="Hi {name}", target_type="leads")
+    db.add(campaign)
+    db.commit()
+
+    threads = []
+    build = campaign_sim.build_sim_db
+    monkeypatch.setattr(campaign_sim, "build_sim_db",
+                        lambda campaign_id: (threads.append(threading.current_thread()), build(campaign_id))[1])
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+        task = asyncio.create_task(ticker())
+        report = await simulate_campaign(campaign.id, start=datetime(2026, 10, 19, 10, 0))
+        task.cancel()
+        return report, ticks
+
+    report, ticks = asyncio.run(main())
+    assert (report["attempts"], report["sent"]) == (4, 4)
+    assert threads and threading.main_thread() not in threads
+    assert ticks > 1  # the calling loop kept running meanwhile
+    db.expire_all()
+    assert db.query(CampaignSend).count() == 0
+    assert db.get(Campaign, campaign.id).sent_count in (None, 0)
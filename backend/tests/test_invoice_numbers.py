@@ -0,0 +1,61 @@
+import threading
+from datetime import datetime
+
+from database import SessionLocal
+from invoice_numbers import allocate_invoice_number, reserve_invoice_number
+from models import InvoiceCounter
+
+OCTOBER = datetime(2026, 10, 19)
+
+
+def _allocate(db, now=OCTOBER):
+    number = allocate_invoice_number(db, now)
+    db.commit()
+    return number
+
+
+def test_numbers_count_up_per_month(db):
+    assert [_allocate(db) for _ in range(3)] == ["INV-202610-001", "INV-202610-002", "INV-202610-003"]
+    assert _allocate(db, datetime(2026, 11, 1)) == "INV-202611-001"
+    assert _allocate(db) == "INV-202610-004"
+
+
+def test_rolled_back_invoice_gives_its_number_back(db):
+    _allocate(db)
+    assert allocate_invoice_number(db, OCTOBER) == "INV-202610-002"
+    db.rollback()
+    assert _allocate(db) == "INV-202610-002"
+
+
+def test_manual_numbers_push_the_counter_forward_only(db):
+    _allocate(db)
+    reserve_invoice_number(db, "INV-202610-050")
+    reserve_invoice_number(db, "INV-202610-010")
+    reserve_invoice_number(db, "INV-202612-007")
+    reserve_invoice_number(db, "CUSTOM-1")
+    db.commit()
+    assert _allocate(db) == "INV-202610-051"
+    assert _allocate(db, datetime(2026, 12, 1)) == "INV-202612-008"
+    assert db.query(InvoiceCounter).count() == 2
+
+
+def test_concurrent_allocations_never_collide():
+    numbers, errors = [], []
+
+    def worker():
+        for _ in range(5):
+            db = SessionLocal()
+            try:
+                numbers.append(_allocate(db))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert sorted(numbers) == [f"INV-202610-{n:03d}" for n in range(1, 41)]
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+import ai_scorer
+import message_pregen
+from campaign_runner import materialize_audience
+from message_pregen import pregenerate, queue_drafts
+from models import Campaign, CampaignSend, Lead
+
+
+def test_drafts_are_generated_and_stored_off_the_event_loop(db, monkeypatch):
+    db.add_all([Lead(title=f"Owner {i}", company=f"Shop {i}", phone=f"08123456780{i}") for i in range(3)])
+    campaign = Campaign(name="AI", target_type="leads", smart_ai=True)
+    db.add(campaign)
+    db.commit()
+    materialize_audience(db, campaign)
+    queue_drafts(db, campaign.id)
+
+    async def fake_generate(recipient):
+        if recipient["company"] == "Shop 1":
+            raise RuntimeError("model timeout")
+        return f"Hi {recipient['company']}"
+    monkeypatch.setattr(ai_scorer, "generate_personalized_message", fake_generate)
+
+    threads = []
+    store = message_pregen._store
+    monkeypatch.setattr(message_pregen, "_store",
+                        lambda *args: (threads.append(threading.current_thread()), store(*args)))
+
+    assert asyncio.run(pregenerate(campaign.id)) == 2
+    assert len(threads) == 3 and threading.main_thread() not in threads
+    db.expire_all()
+    drafts = [(s.message_state, s.message) for s in db.query(CampaignSend).order_by(CampaignSend.position)]
+    assert drafts == [("ready", "Hi Shop 0"), ("failed", None), ("ready", "Hi Shop 2")]
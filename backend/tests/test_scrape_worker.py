@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from datetime import timedelta
+
+import scrape_worker
+from models import ScrapeJob, get_wib_now
+from scrape_worker import (
+    JobReporter, claim_next_job, enqueue_job, fetch_events, request_cancel, requeue_stale_jobs,
+)
+
+
+def _enqueue(db):
+    return enqueue_job(db, "python", "Indonesia", ["linkedin"], 5, False)
+
+
+def test_events_are_numbered_per_job_across_writers(db):
+    first, second = _enqueue(db), _enqueue(db)
+    claimed = claim_next_job(db)
+    assert claimed.id == first.id
+
+    reporter = JobReporter(first.id, asyncio.Event())
+    reporter.log("one")
+    reporter.progress(stage="scraped", found=3)
+    reporter.flush()
+    request_cancel(db, first)
+    reporter.status("cancelled")
+    reporter.flush(final_state="cancelled")
+    request_cancel(db, second)
+
+    events = fetch_events(db, first.id, 0)
+    assert [e["seq"] for e in events] == [1, 2, 3, 4, 5]
+    assert [e["type"] for e in events] == ["status", "log", "progress", "log", "status"]
+    assert [e["seq"] for e in fetch_events(db, second.id, 0)] == [1, 2]
+
+    db.expire_all()
+    assert db.get(ScrapeJob, first.id).event_seq == 5
+    assert db.get(ScrapeJob, first.id).state == "cancelled"
+
+
+def test_resume_returns_only_later_events_of_the_job(db):
+    job = _enqueue(db)
+    reporter = JobReporter(job.id, asyncio.Event())
+    for i in range(5):
+        reporter.log(f"line {i}")
+    reporter.flush()
+
+    resumed = fetch_events(db, job.id, 3)
+    assert [e["seq"] for e in resumed] == [4, 5, 6]
+    assert all(e["data"]["job_id"] == job.id for e in resumed)
+
+
+def test_failed_flush_keeps_events_for_the_next_one(db, monkeypatch):
+    job = _enqueue(db)
+    reporter = JobReporter(job.id, asyncio.Event())
+    reporter.log("kept")
+
+    def broken_session():
+        raise RuntimeError("database down")
+    monkeypatch.setattr(scrape_worker, "SessionLocal", broken_session)
+    try:
+        reporter.flush()
+    except RuntimeError:
+        pass
+    monkeypatch.undo()
+
+    reporter.log("later")
+    reporter.flush()
+    lines = [e["data"]["line"] for e in fetch_events(db, job.id, 1)]
+    assert lines[0].endswith("kept") and lines[1].endswith("later")
+
+
+def test_periodic_flush_runs_off_the_event_loop(db, monkeypatch):
+    monkeypatch.setattr(scrape_worker, "FLUSH_INTERVAL", 0.01)
+    job = _enqueue(db)
+    threads = []
+
+    async def main():
+        reporter = JobReporter(job.id, asyncio.Event())
+        original = reporter.flush
+        reporter.flush = lambda *a: (threads.append(threading.current_thread()), original(*a))
+        reporter.start()
+        reporter.log("tick")
+        await asyncio.sleep(0.05)
+        await reporter.stop()
+        assert reporter._task.done()
+
+    asyncio.run(main())
+    assert threads and threading.main_thread() not in threads
+    assert len(fetch_events(db, job.id, 0)) == 2
+
+
+def test_claims_each_queued_job_once(db):
+    first, second = _enqueue(db), _enqueue(db)
+    assert claim_next_job(db).id == first.id
+    assert claim_next_job(db).id == second.id
+    assert claim_next_job(db) is None
+
+
+def test_stale_jobs_are_requeued_then_failed(db, monkeypatch):
+    monkeypatch.setattr(scrape_worker, "MAX_ATTEMPTS", 2)
+    job = _enqueue(db)
+    stale = get_wib_now() - scrape_worker.STALE_AFTER - timedelta(seconds=1)
+
+    for expected in ("queued", "failed"):
+        claim_next_job(db)
+        db.query(ScrapeJob).filter(ScrapeJob.id == job.id).update({"heartbeat_at": stale})
+        db.commit()
+        assert requeue_stale_jobs(db) == 1
+        db.refresh(job)
+        assert job.state == expected
+
+    statuses = [e["data"]["state"] for e in fetch_events(db, job.id, 0) if e["type"] == "status"]
+    assert statuses == ["queued", "queued", "failed"]
+
+
+def test_cancel_flag_trips_the_interrupt_event(db, monkeypatch):
+    monkeypatch.setattr(scrape_worker, "FLUSH_INTERVAL", 0.01)
+    job = _enqueue(db)
+    claim_next_job(db)
+    request_cancel(db, job)
+
+    async def main():
+        interrupt = asyncio.Event()
+        reporter = JobReporter(job.id, interrupt)
+        reporter.start()
+        await asyncio.wait_for(interrupt.wait(), 1)
+        await reporter.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import timedelta
+
+import telegram_notifier
+from models import NotificationOutbox, get_wib_now
+from telegram_notifier import TelegramNotifier, _backoff, _claim_due, _persist, _settle
+
+
+def _rows(db):
+    db.expire_all()
+    return db.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+
+
+def test_due_rows_are_claimed_once_and_backed_off_on_failure(db, monkeypatch):
+    monkeypatch.setattr(telegram_notifier, "TELEGRAM_OUTBOX_MAX_ATTEMPTS", 3)
+    _persist([("message", "due now", None)])
+    _persist([("message", "retry later", "timeout")], attempts=1)
+
+    claimed = _claim_due()
+    assert [text for _, text in claimed] == ["due now"]
+    assert _claim_due() == []  # leased meanwhile
+
+    row_id = claimed[0][0]
+    for attempts in (1, 2):
+        before = get_wib_now()
+        _settle(row_id, {"success": False, "error": "502"})
+        row = _rows(db)[0]
+        assert (row.state, row.attempts, row.last_error) == ("pending", attempts, "502")
+        assert row.next_attempt_at >= before + _backoff(attempts) - timedelta(seconds=1)
+
+    _settle(row_id, {"success": False, "error": "502"})
+    assert _rows(db)[0].state == "failed"
+
+    later = _rows(db)[1]
+    later.next_attempt_at = get_wib_now() - timedelta(seconds=1)
+    db.commit()
+    assert [text for _, text in _claim_due()] == ["retry later"]  # failed rows stay out
+    _settle(later.id, {"success": True})
+    assert [r.text for r in _rows(db)] == ["due now"]
+
+
+def test_backoff_doubles_up_to_an_hour():
+    assert [_backoff(n).total_seconds() for n in (1, 2, 3, 8, 20)] == [30, 60, 120, 3600, 3600]
+
+
+def test_failed_sends_go_to_the_outbox_and_are_retried(db, monkeypatch):
+    monkeypatch.setattr(telegram_notifier, "TELEGRAM_MIN_INTERVAL", 0)
+    monkeypatch.setattr(telegram_notifier, "TELEGRAM_OUTBOX_POLL", 0.01)
+    monkeypatch.setattr(telegram_notifier, "is_configured", lambda: True)
+    notifier = TelegramNotifier()
+    outcomes = [{"success": False, "error": "Bad Gateway"}, {"success": True}]
+    delivered = []
+
+    async def deliver(text, parse_mode="HTML"):
+        delivered.append(text)
+        return outcomes.pop(0)
+    notifier.deliver = deliver
+
+    async def main():
+        future = asyncio.get_running_loop().create_future()
+        notifier.enqueue("message", {"text": "Server down"}, future=future)
+        assert (await future)["success"] is False
+        row = _rows(db)[0]
+        assert (row.attempts, row.last_error) == (1, "Bad Gateway")
+        row.next_attempt_at = get_wib_now() - timedelta(seconds=1)
+        db.commit()
+
+        stop = asyncio.Event()
+        outbox = asyncio.create_task(notifier.run_outbox(stop))
+        while _rows(db):
+            await asyncio.sleep(0.01)
+        stop.set()
+        await outbox
+        await notifier.aclose()
+
+    asyncio.run(asyncio.wait_for(main(), 5))
+    assert delivered == ["Server down", "Server down"]
+    assert notifier.stats["sent"] == 1
@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+
+import wa_gateway
+from wa_gateway import WhatsAppGateway, normalize_phone
+
+
+def _gateway(monkeypatch, requests):
+    monkeypatch.setattr(wa_gateway, "WA_RATE_PER_SECOND", 0.5)
+    monkeypatch.setattr(wa_gateway, "WA_RATE_BURST", 1)
+
+    def fonnte(request):
+        requests.append(request.headers["Authorization"])
+        return httpx.Response(200, json={"status": True, "detail": "sent"})
+
+    gateway = WhatsAppGateway()
+    gateway._client = httpx.AsyncClient(transport=httpx.MockTransport(fonnte))
+    return gateway
+
+
+def test_each_device_token_has_its_own_rate_limit(monkeypatch):
+    requests = []
+    gateway = _gateway(monkeypatch, requests)
+
+    async def main():
+        results = await asyncio.gather(*(gateway.send("0812345678", "hi", token=t) for t in ("dev-a", "dev-b", "dev-c")))
+        await gateway.aclose()
+        return results
+
+    assert all(r["success"] for r in asyncio.run(main()))
+    assert sorted(requests) == ["dev-a", "dev-b", "dev-c"]
+    assert gateway.stats.limiter_wait_total == 0
+    assert gateway.metrics()["limited_tokens"] == 3
+
+
+def test_sends_on_one_token_are_still_spaced(monkeypatch):
+    gateway = _gateway(monkeypatch, [])
+    monkeypatch.setattr(wa_gateway, "WA_RATE_PER_SECOND", 20)
+
+    async def main():
+        for _ in range(3):
+            await gateway.send("0812345678", "hi", token="dev-a")
+        await gateway.aclose()
+
+    asyncio.run(main())
+    assert gateway.stats.limiter_wait_total >= 0.09  # burst of 1, then 1/20 s per send
+
+
+def test_normalize_phone():
+    assert [normalize_phone(p) for p in ("0812-3456 789", "+62 812 3456", "8123", "", "abc")] == \
+        ["628123456789", "628123456", "628123", None, None]
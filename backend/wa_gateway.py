@@ -0,0 +1,207 @@
+"""
+WhatsApp gateway — the single way this app talks to Fonnte.
+
+Owns one pooled httpx client, a cached token lookup (FONNTE_TOKEN env, then
+the `fonnte_token` setting), phone normalization and a token-bucket limiter
+per Fonnte token shared by every caller (campaign runner, /api/wa/send,
+/api/wa/send-document, /api/send-wa). Limiting per token (= per device)
+keeps one number from being flooded without capping the combined rate of a
+multi-device pool. Send latency and error counts are exposed via metrics().
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import Counter, deque
+from typing import Dict, Optional
+
+import httpx
+
+from database import SessionLocal
+from models import Setting
+
+logger = logging.getLogger(__name__)
+
+FONNTE_SEND_URL = os.getenv("FONNTE_SEND_URL", "https://api.fonnte.com/send")
+WA_HTTP_TIMEOUT = float(os.getenv("WA_HTTP_TIMEOUT", "30"))
+WA_HTTP_MAX_CONNECTIONS = int(os.getenv("WA_HTTP_MAX_CONNECTIONS", "10"))
+WA_TOKEN_CACHE_SECONDS = float(os.getenv("WA_TOKEN_CACHE_SECONDS", "300"))
+# Limiter per token (device): sustained sends per second and burst size, across all callers
+WA_RATE_PER_SECOND = float(os.getenv("WA_RATE_PER_SECOND", "1"))
+WA_RATE_BURST = int(os.getenv("WA_RATE_BURST", "5"))
+
+
+def normalize_phone(raw: Optional[str]) -> Optional[str]:
+    """'0812-3456 789' / '+62 812...' / '62812...' -> '62812...'; None if no digits."""
+    if not raw:
+        return None
+    phone = re.sub(r"[^\d+]", "", raw)
+    if phone.startswith("+"):
+        phone = phone[1:]
+    phone = phone.replace("+", "")
+    if phone.startswith("0"):
+        phone = "62" + phone[1:]
+    elif phone.startswith("8"):
+        phone = "62" + phone
+    return phone or None
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take one token, waiting if needed. Returns the seconds waited."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class GatewayMetrics:
+    def __init__(self):
+        self.sent = 0
+        self.errors = Counter()  # not_configured, invalid_target, api, http, exception
+        self.latencies = deque(maxlen=500)
+        self.limiter_wait_total = 0.0
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.latencies)
+        pct = lambda p: round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 1) if ordered else 0.0
+        total = self.sent + sum(self.errors.values())
+        return {
+            "requests": total,
+            "sent": self.sent,
+            "errors": dict(self.errors),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "latency_p50_ms": pct(50),
+            "latency_p99_ms": pct(99),
+            "limiter_wait_total_s": round(self.limiter_wait_total, 2),
+            "rate_per_second": WA_RATE_PER_SECOND,
+            "burst": WA_RATE_BURST,
+        }
+
+
+class WhatsAppGateway:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._token: Optional[str] = None
+        self._token_at = 0.0
+        self.limiters: Dict[str, TokenBucket] = {}
+        self.stats = GatewayMetrics()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=WA_HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=WA_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=WA_HTTP_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def resolve_token(self) -> str:
+        """FONNTE_TOKEN env var first, then the `fonnte_token` setting (cached)."""
+        env_token = os.getenv("FONNTE_TOKEN", "")
+        if env_token:
+            return env_token
+        if self._token is not None and time.monotonic() - self._token_at < WA_TOKEN_CACHE_SECONDS:
+            return self._token
+        db = SessionLocal()
+        try:
+            setting = db.query(Setting).filter(Setting.key == "fonnte_token").first()
+            self._token = setting.value if setting and setting.value else ""
+            self._token_at = time.monotonic()
+        finally:
+            db.close()
+        return self._token
+
+    def invalidate_token(self):
+        self._token = None
+
+    async def send(
+        self,
+        target: str,
+        message: str = "",
+        token: Optional[str] = None,
+        file: Optional[str] = None,
+        filename: Optional[str] = None,
+        delay: Optional[str] = None,
+    ) -> dict:
+        """
+        Send a text (or a document, with `file`) to one number.
+        Returns {"success", "detail", "target"} plus "error" on failure.
+        """
+        phone = normalize_phone(target)
+        if not phone:
+            self.stats.errors["invalid_target"] += 1
+            return {"success": False, "error": "Invalid phone number", "target": target}
+
+        token = token or await asyncio.get_running_loop().run_in_executor(None, self.resolve_token)
+        if not token:
+            self.stats.errors["not_configured"] += 1
+            return {
+                "success": False,
+                "error": "Fonnte token not configured. Set FONNTE_TOKEN in .env or go to Settings.",
+                "target": phone,
+            }
+
+        data = {"target": phone, "message": message, "countryCode": "62"}
+        if file:
+            data.update({"file": file, "filename": filename or "document.pdf"})
+        if delay:
+            data["delay"] = delay
+
+        limiter = self.limiters.get(token)
+        if limiter is None:
+            limiter = self.limiters[token] = TokenBucket(WA_RATE_PER_SECOND, WA_RATE_BURST)
+        self.stats.limiter_wait_total += await limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(FONNTE_SEND_URL, headers={"Authorization": token}, data=data)
+            self.stats.latencies.append(time.perf_counter() - start)
+            try:
+                result = response.json()
+            except ValueError:
+                result = {"status": False, "reason": f"HTTP {response.status_code}"}
+        except Exception as e:
+            self.stats.latencies.append(time.perf_counter() - start)
+            self.stats.errors["exception"] += 1
+            logger.warning(f"⚠️ Fonnte request failed: {e}")
+            return {"success": False, "error": str(e), "target": phone}
+
+        if response.status_code == 200 and result.get("status"):
+            self.stats.sent += 1
+            return {"success": True, "detail": result.get("detail", "Unknown"), "target": phone}
+
+        self.stats.errors["api" if response.status_code == 200 else "http"] += 1
+        reason = result.get("reason") or result.get("detail") or "Unknown error"
+        return {"success": False, "detail": result.get("detail", "Unknown"), "error": reason, "target": phone}
+
+    def metrics(self) -> dict:
+        return {**self.stats.snapshot(), "limited_tokens": len(self.limiters)}
+
+
+wa_gateway = WhatsAppGateway()
@@ -5,7 +5,7 @@ import useSWR from 'swr';
 import {
     Send, Users, Zap, Plus, X, Edit, Trash2, Calendar, Play, Pause,
     Search, FileText, Copy, Tag, Rocket, BarChart2, Eye, TrendingUp,
-    CheckCircle2, AlertCircle, Sparkles
+    CheckCircle2, AlertCircle, Sparkles, Clock
 } from 'lucide-react';
 import { api, fetcher, Campaign, PromotionTemplate } from '@/lib/api';
 import { ConfirmModal } from '@/components/ui/ConfirmModal';
@@ -13,6 +13,70 @@ import { StatusBadge } from '@/components/shared/Badges';
 import { WhatsAppIcon } from '@/components/ui/WhatsAppIcon';
 import AITemplateGenerator from '@/components/analytics/AITemplateGenerator';
 
+// ─── AI Draft Review ────────────────────────
+function DraftReview({ campaignId }: { campaignId: number }) {
+    const { data, mutate } = useSWR(`drafts-${campaignId}`, () => api.getCampaignDrafts(campaignId), {
+        refreshInterval: (latest: any) => (latest?.generating ? 3000 : 0),
+    });
+    const [editing, setEditing] = useState<number | null>(null);
+    const [text, setText] = useState('');
+    const drafts = data?.drafts || {};
+
+    const handlePrepare = async () => {
+        try { await api.prepareCampaign(campaignId); mutate(); } catch (e: any) { alert(e.message || "Failed to prepare drafts"); }
+    };
+    const handleSave = async (sendId: number, update: { message?: string; skip?: boolean }) => {
+        try { await api.updateCampaignDraft(campaignId, sendId, update); setEditing(null); mutate(); } catch (e: any) { alert(e.message || "Failed to update draft"); }
+    };
+
+    return (
+        <div className="mt-4">
+            <div className="flex items-center justify-between mb-3">
+                <h3 className="text-sm font-bold text-muted-foreground uppercase tracking-widest flex items-center gap-2">
+                    <Sparkles className="w-4 h-4" /> AI Drafts
+                    <span className="text-[10px] font-mono normal-case tracking-normal">
+                        {Object.entries(drafts).map(([k, v]) => `${k}: ${v}`).join(' · ')}
+                    </span>
+                </h3>
+                <button onClick={handlePrepare} disabled={data?.generating} className="px-3 py-1.5 bg-violet-500/10 text-violet-400 border border-violet-500/20 rounded-lg text-xs font-bold hover:bg-violet-500/20 transition-all disabled:opacity-50">
+                    {data?.generating ? 'Generating...' : 'Generate Drafts'}
+                </button>
+            </div>
+            <div className="space-y-2">
+                {(data?.items || []).map((d: any) => (
+                    <div key={d.id} className={`bg-background p-3 rounded-xl border border-border ${d.state === 'skipped' ? 'opacity-50' : ''}`}>
+                        <div className="flex justify-between items-center mb-1 text-xs">
+                            <span className="font-bold text-foreground">{d.lead_name} <span className="text-muted-foreground font-mono">{d.lead_phone}</span></span>
+                            <span className="flex items-center gap-2">
+                                <span className="font-mono text-muted-foreground">{d.state === 'pending' ? d.message_state : d.state}</span>
+                                {['pending', 'skipped'].includes(d.state) && (
+                                    <>
+                                        <button onClick={() => { setEditing(d.id); setText(d.message || ''); }} className="text-blue-500 hover:underline">Edit</button>
+                                        <button onClick={() => handleSave(d.id, { skip: d.state !== 'skipped' })} className="text-destructive hover:underline">{d.state === 'skipped' ? 'Include' : 'Skip'}</button>
+                                    </>
+                                )}
+                            </span>
+                        </div>
+                        {editing === d.id ? (
+                            <div>
+                                <textarea className="w-full bg-input border border-border rounded-lg p-2 text-foreground text-sm font-mono" rows={5} value={text} onChange={e => setText(e.target.value)} />
+                                <div className="flex justify-end gap-2 mt-1 text-xs">
+                                    <button onClick={() => setEditing(null)} className="text-muted-foreground">Cancel</button>
+                                    <button onClick={() => handleSave(d.id, { message: text })} className="text-primary font-bold">Save</button>
+                                </div>
+                            </div>
+                        ) : (
+                            <p className="text-foreground whitespace-pre-line font-mono text-xs leading-relaxed">
+                                {d.message || <span className="text-muted-foreground italic">Not generated yet</span>}
+                            </p>
+                        )}
+                    </div>
+                ))}
+            </div>
+        </div>
+    );
+}
+
 // ─── Variable Picker ────────────────────────
 const AVAILABLE_VARS = [
     { key: '{name}', label: 'Name', desc: 'Contact/business name' },
@@ -22,6 +86,9 @@ const AVAILABLE_VARS = [
     { key: '{category}', label: 'Category', desc: 'Business category' },
 ];
 
+// Pacing fields a campaign may override; '' keeps the server default
+const EMPTY_PACING: Record<string, string> = { quiet_start: '', quiet_end: '', daily_cap: '', jitter: '', jitter_min: '', jitter_max: '', burst_size: '' };
+
 function VariablePicker({ onInsert }: { onInsert: (v: string) => void }) {
     return (
         <div className="flex flex-wrap gap-1.5 mt-2">
@@ -146,7 +213,7 @@ function CampaignCard({ c, isSelected, onClick, onLaunch, onEdit, onDelete }: {
                 </span>
                 {c.scheduled_at && (
                     <span className="flex items-center gap-1 ml-auto">
-                        <Calendar className="w-3 h-3" /> {new Date(c.scheduled_at).toLocaleDateString('id-ID')}
+                        <Calendar className="w-3 h-3" /> {new Date(c.scheduled_at).toLocaleString('id-ID', { dateStyle: 'short', timeStyle: 'short' })}
                     </span>
                 )}
             </div>
@@ -191,9 +258,55 @@ export default function CampaignsPage() {
     const [filterStatus, setFilterStatus] = useState('all');
     const [searchQuery, setSearchQuery] = useState('');
 
-    // Runner State
-    const [runnerStatus, setRunnerStatus] = useState<any>(null);
+    // Runner State: one live console per running campaign, keyed by campaign id
+    const [runners, setRunners] = useState<Record<number, any>>({});
     const [isPolling, setIsPolling] = useState(false);
+    const streamSince = useRef(0);
+
+    // Pick up campaigns that are already running (e.g. after page reload)
+    React.useEffect(() => {
+        api.getCampaignStatus().then(status => {
+            if (status?.campaigns?.length) {
+                streamSince.current = status.last_seq || 0;
+                setRunners(Object.fromEntries(status.campaigns.map((c: any) => [c.campaign_id, c])));
+                setIsPolling(true);
+            }
+        }).catch(() => { });
+    }, []);
+
+    // Follow the runner over SSE while any campaign is active
+    React.useEffect(() => {
+        if (!isPolling) return;
+        const source = api.streamCampaignEvents((event) => {
+            const id = event.data.campaign_id;
+            if (id == null) return;
+            setRunners((all) => {
+                const prev = all[id] || { campaign_id: id, state: 'running', logs: [] };
+                const next = { ...prev };
+                if (event.type === 'log') {
+                    next.logs = [...(prev.logs || []).slice(-49), event.data.line];
+                } else {
+                    const { total, sent, failed } = event.data;
+                    Object.assign(next, { total, sent, failed });
+                    if (event.type === 'state') next.state = event.data.state;
+                    if (event.data.eta !== undefined) next.eta = event.data.eta;
+                    if (event.type === 'sleeping' && event.data.kind !== 'jitter') next.next_batch_at = event.data.until;
+                }
+                if (next.state === 'idle') {
+                    const { [id]: _done, ...rest } = all;
+                    return rest;
+                }
+                return { ...all, [id]: next };
+            });
+            if (event.type === 'state' && event.data.state === 'idle') mutateCampaigns();
+        }, streamSince.current);
+        return () => source.close();
+    }, [isPolling]);
+
+    // Stop streaming once the last running campaign has finished
+    React.useEffect(() => {
+        if (isPolling && Object.keys(runners).length === 0) setIsPolling(false);
+    }, [runners, isPolling]);
 
     // ─── Campaign Form ────────────────────────
     const [editId, setEditId] = useState<number | null>(null);
@@ -202,6 +315,15 @@ export default function CampaignsPage() {
         target_criteria: 'all', scheduled_at: '', template_id: 0,
         smart_ai: false
     });
+    // Pacing overrides (empty = campaign uses the server default shown as placeholder)
+    const [pacing, setPacing] = useState<Record<string, string>>(EMPTY_PACING);
+    const [pacingDefaults, setPacingDefaults] = useState<Record<string, any>>({});
+    React.useEffect(() => { api.getPacingDefaults().then(setPacingDefaults).catch(() => { }); }, []);
+    const pacingPayload = () => {
+        const entries = Object.entries(pacing).filter(([, v]) => v !== '')
+            .map(([k, v]) => [k, ['quiet_start', 'quiet_end', 'jitter'].includes(k) ? v : Number(v)]);
+        return entries.length ? JSON.stringify(Object.fromEntries(entries)) : null;
+    };
     // Template preview state
     const [previewTemplateId, setPreviewTemplateId] = useState<number>(0);
     const previewTemplate = templates.find(t => t.id === previewTemplateId);
@@ -215,8 +337,9 @@ export default function CampaignsPage() {
                 target_type: form.target_type,
                 target_criteria: JSON.stringify({ type: form.target_criteria }),
                 template_id: form.template_id || undefined,
-                scheduled_at: form.scheduled_at || undefined,
-                smart_ai: form.smart_ai
+                scheduled_at: form.scheduled_at || (editId ? null : undefined),
+                smart_ai: form.smart_ai,
+                pacing: pacingPayload() ?? (editId ? null : undefined)
             };
             if (editId) {
                 await api.updateCampaign(editId, payload);
@@ -225,7 +348,7 @@ export default function CampaignsPage() {
             }
             closeCampaignModal();
             mutateCampaigns();
-        } catch { alert("Failed to save campaign"); }
+        } catch (e: any) { alert(e.message || "Failed to save campaign"); }
     };
 
     const openEditCampaign = (c: Campaign) => {
@@ -237,10 +360,13 @@ export default function CampaignsPage() {
             message_template: c.message_template || '',
             target_type: c.target_type || 'leads',
             target_criteria: criteria,
-            scheduled_at: c.scheduled_at ? c.scheduled_at.split('T')[0] : '',
+            scheduled_at: c.scheduled_at ? c.scheduled_at.slice(0, 16) : '',
             template_id: c.template_id || 0,
             smart_ai: c.smart_ai || false
         });
+        let saved: Record<string, any> = {};
+        try { saved = JSON.parse(c.pacing || '{}'); } catch { }
+        setPacing(Object.fromEntries(Object.keys(EMPTY_PACING).map(k => [k, saved[k] != null ? String(saved[k]) : ''])));
         setPreviewTemplateId(c.template_id || 0);
         setShowCampaignModal(true);
     };
@@ -248,6 +374,7 @@ export default function CampaignsPage() {
     const openCreateCampaign = () => {
         setEditId(null);
         setForm({ name: '', message_template: '', target_type: 'leads', target_criteria: 'all', scheduled_at: '', template_id: 0, smart_ai: false });
+        setPacing(EMPTY_PACING);
         setPreviewTemplateId(0);
         setShowCampaignModal(true);
     };
@@ -261,14 +388,27 @@ export default function CampaignsPage() {
 
     const handleLaunch = async (id: number) => {
         try {
+            if (!isPolling) {
+                const current = await api.getCampaignStatus();
+                streamSince.current = current?.last_seq || 0;
+            }
             await api.launchCampaign(id);
+            setRunners((all) => ({ ...all, [id]: { campaign_id: id, state: 'running', logs: ['Initializing...'] } }));
             setIsPolling(true);
-            setRunnerStatus({ state: 'running', logs: ['Initializing...'] });
         } catch (e: any) { alert(e.message || "Failed to launch"); }
     };
 
-    const handleStopRunner = async () => {
-        try { await api.stopCampaign(); } catch { alert("Failed to stop"); }
+    // Dry-run projection (virtual clock, nothing is sent)
+    const [simulation, setSimulation] = useState<any>(null);
+    const [simulating, setSimulating] = useState(false);
+    const handleSimulate = async (id: number) => {
+        setSimulating(true);
+        try { setSimulation(await api.simulateCampaign(id)); } catch (e: any) { alert(e.message || "Simulation failed"); }
+        finally { setSimulating(false); }
+    };
+
+    const handleStopRunner = async (id: number) => {
+        try { await api.stopCampaign(id); } catch { alert("Failed to stop"); }
     };
 
     const handleStatus = async (id: number, status: string) => {
@@ -451,7 +591,7 @@ export default function CampaignsPage() {
                     {activeTab === 'campaigns' && (
                         <>
                             <div className="bg-accent/20 p-1 rounded-xl border border-border flex items-center">
-                                {['all', 'draft', 'active', 'paused', 'completed'].map(s => (
+                                {['all', 'draft', 'scheduled', 'active', 'paused', 'completed'].map(s => (
                                     <button key={s} onClick={() => setFilterStatus(s)} className={`px-3 py-2 rounded-lg text-xs font-bold transition-all capitalize ${filterStatus === s ? 'bg-blue-600 text-white shadow-lg' : 'text-muted-foreground hover:text-foreground'}`}>{s === 'all' ? 'All' : s}</button>
                                 ))}
                             </div>
@@ -465,19 +605,25 @@ export default function CampaignsPage() {
             </div>
 
             {/* ─── LIVE CONSOLE ─── */}
-            {(runnerStatus && runnerStatus.state !== 'idle') && (
-                <div className="mb-2 p-6 bg-card border border-primary/30 rounded-2xl relative overflow-hidden backdrop-blur-md flex-shrink-0">
+            {Object.values(runners).map((runnerStatus: any) => (
+                <div key={runnerStatus.campaign_id} className="mb-2 p-6 bg-card border border-primary/30 rounded-2xl relative overflow-hidden backdrop-blur-md flex-shrink-0">
                     <div className="absolute top-0 left-0 w-full h-1 bg-gradient-to-r from-transparent via-primary to-transparent opacity-50 animate-pulse"></div>
                     <div className="flex justify-between items-start mb-4">
                         <div>
                             <h3 className="text-[#25D366] font-bold flex items-center gap-2">
                                 <WhatsAppIcon className="w-5 h-5 animate-pulse" /> Live Campaign Runner
+                                {campaigns.find((c: any) => c.id === runnerStatus.campaign_id)?.name && (
+                                    <span className="text-foreground text-sm">· {campaigns.find((c: any) => c.id === runnerStatus.campaign_id)?.name}</span>
+                                )}
                             </h3>
                             <p className="text-muted-foreground text-xs mt-1">
-                                Status: <span className="text-foreground font-mono bg-accent px-2 py-0.5 rounded ml-2">{runnerStatus?.state.toUpperCase()}</span>
+                                Status: <span className="text-foreground font-mono bg-accent px-2 py-0.5 rounded ml-2">{runnerStatus?.state?.toUpperCase()}</span>
+                                {runnerStatus?.eta && (
+                                    <span className="ml-3">ETA: <span className="text-foreground font-mono">{new Date(runnerStatus.eta).toLocaleString('id-ID', { dateStyle: 'short', timeStyle: 'short' })}</span></span>
+                                )}
                             </p>
                         </div>
-                        <button onClick={handleStopRunner} className="px-4 py-2 bg-destructive/10 text-destructive border border-destructive/30 rounded-lg text-xs font-bold hover:bg-destructive/20 transition-all">
+                        <button onClick={() => handleStopRunner(runnerStatus.campaign_id)} className="px-4 py-2 bg-destructive/10 text-destructive border border-destructive/30 rounded-lg text-xs font-bold hover:bg-destructive/20 transition-all">
                             STOP CAMPAIGN
                         </button>
                     </div>
@@ -505,7 +651,7 @@ export default function CampaignsPage() {
                         ))}
                     </div>
                 </div>
-            )}
+            ))}
 
             {/* ─── TEMPLATES TAB ─── */}
             {activeTab === 'templates' && (
@@ -597,6 +743,9 @@ export default function CampaignsPage() {
                                                 <Play className="w-4 h-4" />
                                             </button>
                                         )}
+                                        <button onClick={() => handleSimulate(selectedCampaign.id)} disabled={simulating} className="p-2.5 bg-violet-500/10 text-violet-400 rounded-xl hover:bg-violet-500/20 transition-all border border-violet-500/20 disabled:opacity-50" title="Estimate duration (dry run)">
+                                            <Clock className="w-4 h-4" />
+                                        </button>
                                         <button onClick={() => openEditCampaign(selectedCampaign)} className="p-2.5 bg-blue-500/10 text-blue-500 rounded-xl hover:bg-blue-500/20 transition-all border border-blue-500/20" title="Edit">
                                             <Edit className="w-4 h-4" />
                                         </button>
@@ -626,6 +775,25 @@ export default function CampaignsPage() {
                                     </div>
                                 </div>
 
+                                {/* Dry-run estimate */}
+                                {simulation && simulation.campaign_id === selectedCampaign.id && (
+                                    <div className="mb-6 p-4 rounded-xl bg-violet-500/5 border border-violet-500/20 text-sm flex-shrink-0">
+                                        <div className="flex justify-between items-center mb-2">
+                                            <p className="text-xs text-muted-foreground uppercase tracking-widest flex items-center gap-2"><Clock className="w-3.5 h-3.5" /> Estimate if launched now</p>
+                                            <button onClick={() => setSimulation(null)} className="text-muted-foreground hover:text-foreground"><X className="w-3.5 h-3.5" /></button>
+                                        </div>
+                                        <p className="text-foreground">
+                                            <span className="font-bold">{simulation.attempts}</span> messages in <span className="font-bold">{simulation.projected_duration}</span>
+                                            {' '}(~{simulation.messages_per_hour} msg/hour), done around <span className="font-mono">{new Date(simulation.projected_end).toLocaleString()}</span>
+                                        </p>
+                                        <div className="flex flex-wrap gap-1.5 mt-2">
+                                            {Object.entries(simulation.by_hour || {}).map(([hour, n]) => (
+                                                <span key={hour} className="px-2 py-0.5 bg-muted rounded text-[10px] font-mono text-muted-foreground">{hour} · {n as number}</span>
+                                            ))}
+                                        </div>
+                                    </div>
+                                )}
+
                                 {/* Message Preview */}
                                 <div className="flex-1 bg-muted/50 rounded-xl p-5 border border-border overflow-y-auto">
                                     <h3 className="text-sm font-bold text-muted-foreground mb-3 uppercase tracking-widest flex items-center gap-2">
@@ -636,6 +804,7 @@ export default function CampaignsPage() {
                                             {selectedCampaign.message_template || <span className="text-muted-foreground italic">No template attached</span>}
                                         </p>
                                     </div>
+                                    {selectedCampaign.smart_ai && <DraftReview campaignId={selectedCampaign.id} />}
                                 </div>
                             </div>
                         ) : (
@@ -685,7 +854,7 @@ export default function CampaignsPage() {
                                 </div>
                                 <div>
                                     <label className="block text-xs text-muted-foreground uppercase tracking-widest mb-2">Schedule</label>
-                                    <input type="date" className="w-full bg-input border border-border rounded-xl p-3 text-foreground focus:border-primary/50 outline-none"
+                                    <input type="datetime-local" className="w-full bg-input border border-border rounded-xl p-3 text-foreground focus:border-primary/50 outline-none"
                                         value={form.scheduled_at} onChange={e => setForm({ ...form, scheduled_at: e.target.value })} />
                                 </div>
                             </div>
@@ -744,6 +913,38 @@ export default function CampaignsPage() {
                                 </div>
                             </div>
 
+                            <details className="p-4 rounded-2xl bg-muted/30 border border-border">
+                                <summary className="text-xs text-muted-foreground uppercase tracking-widest cursor-pointer">Pacing (optional)</summary>
+                                <div className="grid grid-cols-2 gap-3 mt-4">
+                                    {([
+                                        ['quiet_start', 'Quiet From (WIB)', 'time'],
+                                        ['quiet_end', 'Quiet Until (WIB)', 'time'],
+                                        ['daily_cap', 'Daily Cap (0 = none)', 'number'],
+                                        ['burst_size', 'Messages per Burst', 'number'],
+                                        ['jitter_min', 'Gap Min (s)', 'number'],
+                                        ['jitter_max', 'Gap Max (s)', 'number'],
+                                    ] as const).map(([key, label, type]) => (
+                                        <div key={key}>
+                                            <label className="block text-[10px] text-muted-foreground uppercase tracking-widest mb-1">{label}</label>
+                                            <input type={type} min={type === 'number' ? 0 : undefined}
+                                                className="w-full bg-input border border-border rounded-xl p-2.5 text-sm text-foreground focus:border-primary/50 outline-none"
+                                                placeholder={pacingDefaults[key] != null ? String(pacingDefaults[key]) : ''}
+                                                value={pacing[key]} onChange={e => setPacing({ ...pacing, [key]: e.target.value })} />
+                                        </div>
+                                    ))}
+                                    <div className="col-span-2">
+                                        <label className="block text-[10px] text-muted-foreground uppercase tracking-widest mb-1">Gap Distribution</label>
+                                        <select className="w-full bg-input border border-border rounded-xl p-2.5 text-sm text-foreground focus:border-primary/50 outline-none"
+                                            value={pacing.jitter} onChange={e => setPacing({ ...pacing, jitter: e.target.value })}>
+                                            <option value="" className="bg-popover text-popover-foreground">Default ({pacingDefaults.jitter || 'uniform'})</option>
+                                            <option value="uniform" className="bg-popover text-popover-foreground">Uniform</option>
+                                            <option value="normal" className="bg-popover text-popover-foreground">Normal (around the middle)</option>
+                                            <option value="exponential" className="bg-popover text-popover-foreground">Exponential (mostly short gaps)</option>
+                                        </select>
+                                    </div>
+                                </div>
+                            </details>
+
                             <div className="flex justify-end gap-3 pt-2">
                                 <button type="button" onClick={closeCampaignModal} className="px-5 py-3 rounded-xl border border-border text-muted-foreground hover:text-foreground transition-all text-sm font-bold">Cancel</button>
                                 <button type="submit" className="px-6 py-3 bg-primary hover:bg-primary/90 text-primary-foreground font-bold rounded-xl transition-all text-sm">Save Campaign</button>
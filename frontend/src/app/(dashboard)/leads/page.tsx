@@ -1,10 +1,10 @@
 'use client';
 
-import React, { useEffect, useState, useMemo } from 'react';
+import React, { useEffect, useState, useMemo, useRef } from 'react';
 import useSWR from 'swr';
 import { api, fetcher, Lead } from '@/lib/api';
 import {
-    Loader2, ExternalLink, Database, Search, Download,
+    Loader2, ExternalLink, Database, Search, Download, Upload,
     Plus, Edit, Trash2, X, CheckCircle2
 } from 'lucide-react';
 import { ConfirmModal } from '@/components/ui/ConfirmModal';
@@ -94,6 +94,10 @@ export default function LeadsPage() {
     const [showCreateModal, setShowCreateModal] = useState(false);
     const [showConfirm, setShowConfirm] = useState(false);
     const [deleteId, setDeleteId] = useState<number | null>(null);
+    const [selected, setSelected] = useState<Set<number>>(new Set());
+    const [showBulkConfirm, setShowBulkConfirm] = useState(false);
+    const [importing, setImporting] = useState(false);
+    const importInput = useRef<HTMLInputElement>(null);
 
     // Filters
     const [filterSource, setFilterSource] = useState('all');
@@ -164,6 +168,40 @@ export default function LeadsPage() {
         try { await api.deleteLead(deleteId); setShowConfirm(false); setDeleteId(null); mutateLeads(); } catch { alert('Failed to delete lead'); }
     };
 
+    const toggleSelected = (id: number) => {
+        setSelected(prev => {
+            const next = new Set(prev);
+            if (next.has(id)) next.delete(id); else next.add(id);
+            return next;
+        });
+    };
+
+    const handleBulkStatus = async (status: string) => {
+        if (!status || selected.size === 0) return;
+        try { await api.bulkUpdateLeads({ ids: Array.from(selected) }, status); setSelected(new Set()); mutateLeads(); } catch { alert('Failed to update leads'); }
+    };
+
+    const executeBulkDelete = async () => {
+        try { await api.bulkDeleteLeads({ ids: Array.from(selected) }); setShowBulkConfirm(false); setSelected(new Set()); mutateLeads(); } catch { alert('Failed to delete leads'); }
+    };
+
+    const handleImport = async (e: React.ChangeEvent<HTMLInputElement>) => {
+        const file = e.target.files?.[0];
+        e.target.value = '';
+        if (!file) return;
+        setImporting(true);
+        try {
+            const r = await api.importFile('leads', file);
+            const errors = r.errors.slice(0, 5).map(err => `Row ${err.row}: ${err.error}`).join('\n');
+            alert(`Imported ${r.inserted} of ${r.rows} rows (${r.duplicates} duplicates, ${r.rejected} rejected)${errors ? `\n\n${errors}` : ''}`);
+            mutateLeads();
+        } catch (err) {
+            alert(err instanceof Error ? err.message : 'Import failed');
+        } finally {
+            setImporting(false);
+        }
+    };
+
     const handleExport = () => {
         const exportData = leads.map(l => ({
             Title: l.title, Company: l.company, Location: l.location,
@@ -177,13 +215,22 @@ export default function LeadsPage() {
     };
 
     // Reset page when filters change
-    useEffect(() => { setCurrentPage(1); }, [filterSource, filterStatus, filterWaStatus, filterScore, debouncedSearch, dateRange]);
+    useEffect(() => { setCurrentPage(1); setSelected(new Set()); }, [filterSource, filterStatus, filterWaStatus, filterScore, debouncedSearch, dateRange]);
 
     const paginatedLeads = useMemo(() => {
         const start = (currentPage - 1) * pageSize;
         return leads.slice(start, start + pageSize);
     }, [leads, currentPage, pageSize]);
 
+    const pageSelected = paginatedLeads.length > 0 && paginatedLeads.every(l => selected.has(l.id));
+    const togglePage = () => {
+        setSelected(prev => {
+            const next = new Set(prev);
+            paginatedLeads.forEach(l => pageSelected ? next.delete(l.id) : next.add(l.id));
+            return next;
+        });
+    };
+
     return (
         <div className="w-full">
             <div className="mb-8 flex flex-col xl:flex-row xl:items-end justify-between gap-6">
@@ -231,6 +278,8 @@ export default function LeadsPage() {
                         <option value="low" className="bg-popover text-popover-foreground">Low (&lt;50)</option>
                     </select>
                     <button onClick={() => setShowSearch(!showSearch)} className={`p-3 rounded-xl border transition-colors ${showSearch ? 'text-blue-500 border-blue-500/30 bg-blue-500/5' : 'text-muted-foreground hover:text-foreground border-border bg-accent/20'}`}><Search className="w-5 h-5" /></button>
+                    <input ref={importInput} type="file" accept=".csv,.xlsx" onChange={handleImport} className="hidden" />
+                    <button onClick={() => importInput.current?.click()} disabled={importing} className="p-3 rounded-xl text-muted-foreground hover:text-foreground border border-border bg-accent/20 transition-colors disabled:opacity-50" title="Import CSV / Excel">{importing ? <Loader2 className="w-5 h-5 animate-spin" /> : <Upload className="w-5 h-5" />}</button>
                     <button onClick={handleExport} className="p-3 rounded-xl text-muted-foreground hover:text-foreground border border-border bg-accent/20 transition-colors" title="Export Excel"><Download className="w-5 h-5" /></button>
                     <button onClick={() => setShowCreateModal(true)} className="flex items-center gap-2 bg-emerald-600 hover:bg-emerald-500 text-white px-5 py-3 rounded-xl transition-all font-bold shadow-lg shadow-emerald-500/20"><Plus className="w-5 h-5" /> Add Lead</button>
                 </div>
@@ -243,6 +292,26 @@ export default function LeadsPage() {
                 </div>
             )}
 
+            {selected.size > 0 && (
+                <div className="mb-4 flex flex-wrap items-center gap-3 px-5 py-3 rounded-2xl border border-blue-500/20 bg-blue-500/5">
+                    <span className="text-sm font-bold text-foreground">{selected.size} selected</span>
+                    {selected.size < leads.length && (
+                        <button onClick={() => setSelected(new Set(leads.map(l => l.id)))} className="text-xs text-blue-500 hover:underline">Select all {leads.length}</button>
+                    )}
+                    <button onClick={() => setSelected(new Set())} className="text-xs text-muted-foreground hover:text-foreground">Clear</button>
+                    <div className="flex-1" />
+                    <select value="" onChange={(e) => handleBulkStatus(e.target.value)} className="appearance-none px-4 py-2 rounded-xl text-muted-foreground text-sm bg-accent/20 border border-border focus:outline-none focus:border-blue-500/30 cursor-pointer">
+                        <option value="" className="bg-popover text-popover-foreground">Set status…</option>
+                        <option value="new" className="bg-popover text-popover-foreground">New</option>
+                        <option value="contacted" className="bg-popover text-popover-foreground">Contacted</option>
+                        <option value="interested" className="bg-popover text-popover-foreground">Interested</option>
+                        <option value="won" className="bg-popover text-popover-foreground">Won</option>
+                        <option value="rejected" className="bg-popover text-popover-foreground">Rejected</option>
+                    </select>
+                    <button onClick={() => setShowBulkConfirm(true)} className="flex items-center gap-2 px-4 py-2 rounded-xl bg-red-500/10 text-red-500 hover:bg-red-500/20 text-sm font-bold"><Trash2 className="w-4 h-4" /> Delete</button>
+                </div>
+            )}
+
             <div className="glass-panel rounded-3xl overflow-hidden min-h-[500px] relative flex flex-col">
                 {loading ? (
                     <div className="flex-1 flex flex-col items-center justify-center text-muted-foreground py-20"><Loader2 className="w-10 h-10 animate-spin mb-4 text-emerald-500" /><p className="font-mono text-sm tracking-widest uppercase">Loading...</p></div>
@@ -254,6 +323,7 @@ export default function LeadsPage() {
                             <table className="w-full text-left border-collapse">
                                 <thead>
                                     <tr className="bg-accent/20 border-b border-border text-xs font-mono text-muted-foreground uppercase tracking-widest">
+                                        <th className="pl-6 py-5 w-4"><input type="checkbox" checked={pageSelected} onChange={togglePage} className="accent-blue-600 cursor-pointer" /></th>
                                         <th className="px-6 py-5">Job / Title</th>
                                         <th className="px-6 py-5">Score</th>
                                         <th className="px-6 py-5">Location</th>
@@ -265,6 +335,7 @@ export default function LeadsPage() {
                                 <tbody className="divide-y divide-border">
                                     {paginatedLeads.map((lead) => (
                                         <tr key={lead.id} className="hover:bg-accent/10 transition-colors group">
+                                            <td className="pl-6 py-5"><input type="checkbox" checked={selected.has(lead.id)} onChange={() => toggleSelected(lead.id)} className="accent-blue-600 cursor-pointer" /></td>
                                             <td className="px-6 py-5">
                                                 <div className="font-medium text-foreground group-hover:text-emerald-500 transition-colors max-w-[250px] truncate">{lead.title}</div>
                                                 <div className="text-xs text-muted-foreground">{lead.company}</div>
@@ -313,6 +384,14 @@ export default function LeadsPage() {
                 onConfirm={executeDelete}
                 onCancel={() => { setShowConfirm(false); setDeleteId(null); }}
             />
+
+            <ConfirmModal
+                isOpen={showBulkConfirm}
+                title="Delete Leads"
+                message={`Delete ${selected.size} selected lead(s)? This will also remove their projects, tasks, and history. This action cannot be undone.`}
+                onConfirm={executeBulkDelete}
+                onCancel={() => setShowBulkConfirm(false)}
+            />
         </div>
     );
 }
@@ -1,11 +1,11 @@
 'use client';
 
-import React, { useEffect, useState, useMemo } from 'react';
+import React, { useEffect, useState, useMemo, useRef } from 'react';
 import useSWR from 'swr';
 import { api, fetcher, Prospect } from '@/lib/api';
 import {
     Loader2, Search, X, Phone, Building2, MapPin, Globe, Mail,
-    Plus, Edit, Trash2, ExternalLink, Star, Download, Wand2, CheckCircle2
+    Plus, Edit, Trash2, ExternalLink, Star, Download, Upload, Wand2, CheckCircle2
 } from 'lucide-react';
 import { ConfirmModal } from '@/components/ui/ConfirmModal';
 import { Pagination } from '@/components/ui/Pagination';
@@ -195,6 +195,10 @@ export default function ProspectsPage() {
     const [showCreateModal, setShowCreateModal] = useState(false);
     const [showConfirm, setShowConfirm] = useState(false);
     const [deleteId, setDeleteId] = useState<number | null>(null);
+    const [selected, setSelected] = useState<Set<number>>(new Set());
+    const [showBulkConfirm, setShowBulkConfirm] = useState(false);
+    const [importing, setImporting] = useState(false);
+    const importInput = useRef<HTMLInputElement>(null);
     const [myName, setMyName] = useState('Mahin');
 
     // Filters
@@ -274,6 +278,40 @@ export default function ProspectsPage() {
         try { await api.deleteProspect(deleteId); setShowConfirm(false); setDeleteId(null); mutate(); } catch { alert('Failed to delete prospect'); }
     };
 
+    const toggleSelected = (id: number) => {
+        setSelected(prev => {
+            const next = new Set(prev);
+            if (next.has(id)) next.delete(id); else next.add(id);
+            return next;
+        });
+    };
+
+    const handleBulkStatus = async (status: string) => {
+        if (!status || selected.size === 0) return;
+        try { await api.bulkUpdateProspects({ ids: Array.from(selected) }, status); setSelected(new Set()); mutate(); } catch { alert('Failed to update prospects'); }
+    };
+
+    const executeBulkDelete = async () => {
+        try { await api.bulkDeleteProspects({ ids: Array.from(selected) }); setShowBulkConfirm(false); setSelected(new Set()); mutate(); } catch { alert('Failed to delete prospects'); }
+    };
+
+    const handleImport = async (e: React.ChangeEvent<HTMLInputElement>) => {
+        const file = e.target.files?.[0];
+        e.target.value = '';
+        if (!file) return;
+        setImporting(true);
+        try {
+            const r = await api.importFile('prospects', file);
+            const errors = r.errors.slice(0, 5).map(err => `Row ${err.row}: ${err.error}`).join('\n');
+            alert(`Imported ${r.inserted} of ${r.rows} rows (${r.duplicates} duplicates, ${r.rejected} rejected)${errors ? `\n\n${errors}` : ''}`);
+            mutate();
+        } catch (err) {
+            alert(err instanceof Error ? err.message : 'Import failed');
+        } finally {
+            setImporting(false);
+        }
+    };
+
     const handleExport = () => {
         const exportData = prospects.map(p => ({
             Name: p.name, Category: p.category, Address: p.address || '',
@@ -288,13 +326,22 @@ export default function ProspectsPage() {
     };
 
     // Reset page when filters change
-    useEffect(() => { setCurrentPage(1); }, [filterCategory, filterStatus, filterWaStatus, filterScore, debouncedSearch, dateRange]);
+    useEffect(() => { setCurrentPage(1); setSelected(new Set()); }, [filterCategory, filterStatus, filterWaStatus, filterWebsite, filterScore, debouncedSearch, dateRange]);
 
     const paginatedProspects = useMemo(() => {
         const start = (currentPage - 1) * pageSize;
         return prospects.slice(start, start + pageSize);
     }, [prospects, currentPage, pageSize]);
 
+    const pageSelected = paginatedProspects.length > 0 && paginatedProspects.every(p => selected.has(p.id));
+    const togglePage = () => {
+        setSelected(prev => {
+            const next = new Set(prev);
+            paginatedProspects.forEach(p => pageSelected ? next.delete(p.id) : next.add(p.id));
+            return next;
+        });
+    };
+
     const categories = [...new Set(prospects.map(p => p.category))];
     const noWebCount = prospects.filter(p => !p.has_website).length;
 
@@ -351,6 +398,8 @@ export default function ProspectsPage() {
                         <option value="low" className="bg-popover text-popover-foreground">Low (&lt;50)</option>
                     </select>
                     <button onClick={() => setShowSearch(!showSearch)} className={`p-3 rounded-xl border transition-colors ${showSearch ? 'text-blue-500 border-blue-500/30 bg-blue-500/5' : 'text-muted-foreground hover:text-foreground border-border bg-accent/20'}`}><Search className="w-5 h-5" /></button>
+                    <input ref={importInput} type="file" accept=".csv,.xlsx" onChange={handleImport} className="hidden" />
+                    <button onClick={() => importInput.current?.click()} disabled={importing} className="p-3 rounded-xl text-muted-foreground hover:text-foreground border border-border bg-accent/20 transition-colors disabled:opacity-50" title="Import CSV / Excel">{importing ? <Loader2 className="w-5 h-5 animate-spin" /> : <Upload className="w-5 h-5" />}</button>
                     <button onClick={handleExport} className="p-3 rounded-xl text-muted-foreground hover:text-foreground border border-border bg-accent/20 transition-colors" title="Export Excel"><Download className="w-5 h-5" /></button>
                     <button onClick={() => setShowCreateModal(true)} className="flex items-center gap-2 bg-emerald-600 hover:bg-emerald-500 text-white px-5 py-3 rounded-xl transition-all font-bold shadow-lg shadow-emerald-500/20"><Plus className="w-5 h-5" /> Add</button>
                 </div>
@@ -363,6 +412,26 @@ export default function ProspectsPage() {
                 </div>
             )}
 
+            {selected.size > 0 && (
+                <div className="mb-4 flex flex-wrap items-center gap-3 px-5 py-3 rounded-2xl border border-blue-500/20 bg-blue-500/5">
+                    <span className="text-sm font-bold text-foreground">{selected.size} selected</span>
+                    {selected.size < prospects.length && (
+                        <button onClick={() => setSelected(new Set(prospects.map(p => p.id)))} className="text-xs text-blue-500 hover:underline">Select all {prospects.length}</button>
+                    )}
+                    <button onClick={() => setSelected(new Set())} className="text-xs text-muted-foreground hover:text-foreground">Clear</button>
+                    <div className="flex-1" />
+                    <select value="" onChange={(e) => handleBulkStatus(e.target.value)} className="appearance-none px-4 py-2 rounded-xl text-muted-foreground text-sm bg-accent/20 border border-border focus:outline-none focus:border-blue-500/30 cursor-pointer">
+                        <option value="" className="bg-popover text-popover-foreground">Set status…</option>
+                        <option value="new" className="bg-popover text-popover-foreground">New</option>
+                        <option value="contacted" className="bg-popover text-popover-foreground">Contacted</option>
+                        <option value="negotiation" className="bg-popover text-popover-foreground">Negotiation</option>
+                        <option value="won" className="bg-popover text-popover-foreground">Won</option>
+                        <option value="lost" className="bg-popover text-popover-foreground">Lost</option>
+                    </select>
+                    <button onClick={() => setShowBulkConfirm(true)} className="flex items-center gap-2 px-4 py-2 rounded-xl bg-red-500/10 text-red-500 hover:bg-red-500/20 text-sm font-bold"><Trash2 className="w-4 h-4" /> Delete</button>
+                </div>
+            )}
+
             <div className="glass-panel rounded-3xl overflow-hidden min-h-[500px] relative flex flex-col">
                 {loading ? (
                     <div className="flex-1 flex flex-col items-center justify-center text-muted-foreground py-20"><Loader2 className="w-10 h-10 animate-spin mb-4 text-blue-500" /><p className="font-mono text-sm tracking-widest uppercase">Loading...</p></div>
@@ -374,6 +443,7 @@ export default function ProspectsPage() {
                             <table className="w-full text-left border-collapse">
                                 <thead>
                                     <tr className="bg-accent/20 border-b border-border text-xs font-mono text-muted-foreground uppercase tracking-widest">
+                                        <th className="pl-6 py-5 w-4"><input type="checkbox" checked={pageSelected} onChange={togglePage} className="accent-blue-600 cursor-pointer" /></th>
                                         <th className="px-6 py-5">Business</th>
                                         <th className="px-6 py-5">Score</th>
                                         <th className="px-6 py-5">WA / Phone</th>
@@ -386,6 +456,7 @@ export default function ProspectsPage() {
                                 <tbody className="divide-y divide-border">
                                     {paginatedProspects.map(prospect => (
                                         <tr key={prospect.id} className="hover:bg-accent/10 transition-colors group">
+                                            <td className="pl-6 py-5"><input type="checkbox" checked={selected.has(prospect.id)} onChange={() => toggleSelected(prospect.id)} className="accent-blue-600 cursor-pointer" /></td>
                                             <td className="px-6 py-5">
                                                 <div className="font-medium text-foreground group-hover:text-blue-500 transition-colors max-w-[200px] truncate">{prospect.name}</div>
                                                 <div className="text-xs text-muted-foreground flex items-center gap-1">
@@ -448,6 +519,14 @@ export default function ProspectsPage() {
                 onConfirm={executeDelete}
                 onCancel={() => { setShowConfirm(false); setDeleteId(null); }}
             />
+
+            <ConfirmModal
+                isOpen={showBulkConfirm}
+                title="Delete Prospects"
+                message={`Delete ${selected.size} selected prospect(s)? This action cannot be undone.`}
+                onConfirm={executeBulkDelete}
+                onCancel={() => setShowBulkConfirm(false)}
+            />
         </div>
     );
 }
@@ -129,6 +129,7 @@ export default function ScraperPage() {
     const [showPresets, setShowPresets] = useState(true);
     const [activePreset, setActivePreset] = useState<string | null>(null);
     const [logs, setLogs] = useState<string[]>([]);
+    const [jobId, setJobId] = useState<number | undefined>(undefined);
     const logsEndRef = React.useRef<HTMLDivElement>(null);
 
     // AI Suggest state
@@ -151,6 +152,7 @@ export default function ScraperPage() {
             try {
                 const status = await api.getScrapeStatus();
                 if (status.running) {
+                    setJobId(status.job?.id);
                     setLoading(true);
                     if (status.logs) setLogs(status.logs);
                 }
@@ -161,36 +163,21 @@ export default function ScraperPage() {
         checkInitialStatus();
     }, []);
 
-    // Poll logs when loading
+    // Stream logs when loading (SSE — no polling)
     React.useEffect(() => {
-        let interval: NodeJS.Timeout;
-        if (loading) {
-            // Immediate check
-            const fetchStatus = async () => {
-                try {
-                    const status = await api.getScrapeStatus();
-                    if (status.logs) setLogs(status.logs);
-
-                    if (!status.running) {
-                        setLoading(false);
-                        // Check last log for success/error
-                        if (status.logs && status.logs.length > 0) {
-                            const lastLog = status.logs[status.logs.length - 1];
-                            if (lastLog.includes("DONE") || lastLog.includes("finished") || lastLog.includes("ended")) {
-                                setResult({ message: "Scraping Process Completed." });
-                            }
-                        }
-                    }
-                } catch (e) {
-                    console.error("Log polling error", e);
-                }
-            };
-
-            fetchStatus();
-            interval = setInterval(fetchStatus, 2000); // 2s is enough for background polling
-        }
-        return () => clearInterval(interval);
-    }, [loading]);
+        if (!loading || !jobId) return;
+        setLogs([]);
+        const source = api.streamScrapeEvents((event) => {
+            if (event.type === 'log') {
+                setLogs(prev => [...prev.slice(-199), event.data.line]);
+            } else if (event.type === 'status' && ['completed', 'failed', 'cancelled'].includes(event.data.state)) {
+                source.close();
+                setLoading(false);
+                setResult({ message: event.data.state === 'completed' ? "Scraping Process Completed." : `Scraping ${event.data.state}.` });
+            }
+        }, jobId);
+        return () => source.close();
+    }, [loading, jobId]);
 
     const toggleSource = (id: string) => {
         setSelectedSources((prev) =>
@@ -221,12 +208,13 @@ export default function ScraperPage() {
     const handleScrape = async (e: React.FormEvent) => {
         e.preventDefault();
         if (selectedSources.length === 0) return;
-        setLoading(true);
         setLogs([]);
         setResult(null);
         try {
-            // Start the background task
-            await api.startScrape(keywords, location, selectedSources, limit, safeMode);
+            // Start the background task, then open the stream so it replays this run only
+            const job = await api.startScrape(keywords, location, selectedSources, limit, safeMode);
+            setJobId(job.job_id);
+            setLoading(true);
         } catch (err) {
             alert('Connection Error');
             setLoading(false);
@@ -97,9 +97,30 @@ const CustomEvent = ({ event }: EventProps<CalendarEvent>) => {
 };
 
 export default function TasksPage() {
+    const [view, setView] = useState<'calendar' | 'list'>('calendar');
+    // Visible calendar range; the calendar only reads follow-ups dated inside it
+    const [range, setRange] = useState(() => ({
+        start: moment().startOf('month').startOf('week').format('YYYY-MM-DD'),
+        end: moment().endOf('month').endOf('week').format('YYYY-MM-DD'),
+    }));
+    const handleRangeChange = (r: Date[] | { start: Date; end: Date }) => {
+        const dates = Array.isArray(r) ? r : [r.start, r.end];
+        setRange({
+            start: moment(dates[0]).format('YYYY-MM-DD'),
+            end: moment(dates[dates.length - 1]).format('YYYY-MM-DD'),
+        });
+    };
+
     // SWR
-    const { data: tasksData, mutate: mutateTasks } = useSWR<FollowUp[]>(`${api.API_URL}/api/followups`, fetcher);
+    const { data: agendaData, mutate: mutateAgenda } = useSWR<FollowUp[]>(
+        view === 'calendar' ? ['followup-agenda', range.start, range.end] : null,
+        () => api.getFollowUpAgenda(range.start, range.end),
+        { keepPreviousData: true }
+    );
+    const { data: listData, mutate: mutateList } = useSWR<FollowUp[]>(view === 'list' ? `${api.API_URL}/api/followups` : null, fetcher);
     const { data: leadsData } = useSWR<Lead[]>(`${api.API_URL}/api/leads`, fetcher);
+    const tasksData = view === 'calendar' ? agendaData : listData;
+    const mutateTasks = () => { mutateAgenda(); mutateList(); };
 
     const leads = leadsData || [];
     const loading = !tasksData;
@@ -121,7 +142,6 @@ export default function TasksPage() {
         };
     });
 
-    const [view, setView] = useState<'calendar' | 'list'>('calendar');
     const [showModal, setShowModal] = useState(false);
     const [showConfirm, setShowConfirm] = useState(false);
 
@@ -274,6 +294,7 @@ export default function TasksPage() {
                                     event: CustomEvent
                                 }}
                                 onSelectEvent={openEditModal}
+                                onRangeChange={handleRangeChange}
                             />
                         </motion.div>
                     ) : (
@@ -42,6 +42,7 @@ const STATUS_COLORS: Record<string, string> = {
     'overdue': 'bg-red-500/10 text-red-500 border-red-500/20',
     'cancelled': 'bg-red-500/10 text-red-500 border-red-500/20',
     'running': 'bg-cyan-500/10 text-cyan-500 border-cyan-500/20',
+    'scheduled': 'bg-violet-500/10 text-violet-400 border-violet-500/20',
 };
 
 export function StatusBadge({ status }: { status: string }) {
@@ -110,6 +110,21 @@ export interface Stats {
     weekly: { date: string; leads: number; prospects: number }[];
 }
 
+export interface BulkSelection {
+    ids?: number[];
+    filters?: Record<string, string | number>;
+}
+
+export interface ImportReport {
+    kind: 'leads' | 'prospects';
+    rows: number;
+    inserted: number;
+    duplicates: number;
+    rejected: number;
+    errors: { row: number; error: string }[];
+    seconds: number;
+}
+
 export interface ActivityLog {
     id: number;
     category: string;
@@ -119,6 +134,18 @@ export interface ActivityLog {
     created_at: string;
 }
 
+export interface ActivityLogEntry extends Omit<ActivityLog, 'details'> {
+    details?: unknown;
+}
+
+export interface ActivityLogFilters {
+    category?: string;
+    level?: string;
+    start?: string;
+    end?: string;
+    details?: Record<string, unknown>;
+}
+
 export interface AIBriefing {
     briefing: string;
     stats: Record<string, number>;
@@ -151,6 +178,7 @@ export interface Campaign {
     failed_count?: number;
     scheduled_at?: string;
     smart_ai?: boolean;
+    pacing?: string;
     created_at?: string;
 }
 
@@ -206,6 +234,58 @@ async function authFetch(url: string, opts: RequestInit = {}) {
 
 export const fetcher = (url: string) => authFetch(url);
 
+export interface StreamEvent<T = any> {
+    seq: number;
+    type: string;
+    ts: string;
+    data: T;
+}
+
+export interface EventStreamHandle {
+    close: () => void;
+}
+
+// EventSource can't send headers, so a short-lived stream token (never the
+// access token) goes in the query string. The browser reconnects on its own
+// and resumes via Last-Event-ID; once the stream token has expired that
+// reconnect is refused, so a fresh token is fetched and the stream reopened
+// from the last event seen.
+function openEventStream(path: string, onEvent: (event: StreamEvent) => void, since?: number, extra: Record<string, string> = {}): EventStreamHandle {
+    let source: EventSource | null = null;
+    let closed = false;
+    let lastSeq = since;
+
+    const connect = async () => {
+        let token: string;
+        try {
+            ({ token } = await authFetch(`${API_URL}/api/stream-token`, { method: 'POST' }));
+        } catch {
+            if (!closed) setTimeout(connect, 3000);
+            return;
+        }
+        if (closed) return;
+        const params = new URLSearchParams(extra);
+        params.append('token', token);
+        if (lastSeq !== undefined) params.append('since', String(lastSeq));
+        source = new EventSource(`${API_URL}${path}?${params.toString()}`);
+        const handler = (e: MessageEvent) => {
+            const event: StreamEvent = JSON.parse(e.data);
+            lastSeq = event.seq;
+            onEvent(event);
+        };
+        ['log', 'progress', 'status', 'gap', 'sent', 'failed', 'sleeping', 'state'].forEach(type => source!.addEventListener(type, handler as EventListener));
+        source.onerror = () => {
+            if (source?.readyState === EventSource.CLOSED && !closed) {
+                source = null;
+                setTimeout(connect, 3000);
+            }
+        };
+    };
+
+    connect();
+    return { close: () => { closed = true; source?.close(); } };
+}
+
 export const api = {
     API_URL,
 
@@ -250,6 +330,15 @@ export const api = {
         return authFetch(`${API_URL}/api/leads/${id}`, { method: 'DELETE' });
     },
 
+    // Bulk: pass { ids } or { filters } (same keys as the /api/leads query)
+    async bulkUpdateLeads(selection: BulkSelection, status: string): Promise<{ updated: number }> {
+        return authFetch(`${API_URL}/api/leads/bulk-update`, { method: 'POST', body: JSON.stringify({ ...selection, status }) });
+    },
+
+    async bulkDeleteLeads(selection: BulkSelection): Promise<{ deleted: number }> {
+        return authFetch(`${API_URL}/api/leads/bulk-delete`, { method: 'POST', body: JSON.stringify(selection) });
+    },
+
     async startScrape(keywords: string, location: string = 'Indonesia', sources: string[] = ['linkedin', 'upwork', 'indeed', 'glints', 'gmaps'], limit: number = 10, safeMode: boolean = false) {
         const srcParam = sources.join(',');
         return authFetch(`${API_URL}/api/scrape?keywords=${encodeURIComponent(keywords)}&location=${encodeURIComponent(location)}&sources=${srcParam}&limit=${limit}&safe_mode=${safeMode}`);
@@ -259,6 +348,10 @@ export const api = {
         return authFetch(`${API_URL}/api/scrape/status`);
     },
 
+    streamScrapeEvents(onEvent: (event: StreamEvent) => void, jobId: number, since?: number): EventStreamHandle {
+        return openEventStream('/api/scrape/stream', onEvent, since, { job_id: String(jobId) });
+    },
+
     async stopScrape() {
         return authFetch(`${API_URL}/api/scrape/stop`, {
             method: 'POST'
@@ -295,6 +388,21 @@ export const api = {
         return authFetch(`${API_URL}/api/followups?${params.toString()}`);
     },
 
+    /** Dated follow-ups in [start, end] (YYYY-MM-DD), following keyset pages until done. */
+    async getFollowUpAgenda(start: string, end: string, status?: string): Promise<FollowUp[]> {
+        const items: FollowUp[] = [];
+        let cursor: string | null = null;
+        do {
+            const params = new URLSearchParams({ start, end, limit: '500' });
+            if (status) params.append('status', status);
+            if (cursor) params.append('cursor', cursor);
+            const page: { items: FollowUp[]; next_cursor: string | null } = await authFetch(`${API_URL}/api/followups/agenda?${params.toString()}`);
+            items.push(...page.items);
+            cursor = page.next_cursor;
+        } while (cursor);
+        return items;
+    },
+
     async createFollowUp(data: { lead_id?: number; prospect_id?: number; type?: string; note?: string; next_follow_date?: string }) {
         return authFetch(`${API_URL}/api/followups`, { method: 'POST', body: JSON.stringify(data) });
     },
@@ -391,6 +499,33 @@ export const api = {
         return authFetch(`${API_URL}/api/prospects/${id}`, { method: 'DELETE' });
     },
 
+    async bulkUpdateProspects(selection: BulkSelection, status: string): Promise<{ updated: number }> {
+        return authFetch(`${API_URL}/api/prospects/bulk-update`, { method: 'POST', body: JSON.stringify({ ...selection, status }) });
+    },
+
+    async bulkDeleteProspects(selection: BulkSelection): Promise<{ deleted: number }> {
+        return authFetch(`${API_URL}/api/prospects/bulk-delete`, { method: 'POST', body: JSON.stringify(selection) });
+    },
+
+    // ─── Import (CSV / XLSX) ───
+    async importFile(kind: 'leads' | 'prospects', file: File): Promise<ImportReport> {
+        const formData = new FormData();
+        formData.append('file', file);
+        const token = localStorage.getItem('token');
+        // No JSON Content-Type here: the browser sets the multipart boundary
+        const res = await fetch(`${API_URL}/api/import/${kind}`, {
+            method: 'POST',
+            headers: token ? { 'Authorization': `Bearer ${token}` } : {},
+            body: formData,
+        });
+        if (res.status === 401) { window.location.href = '/login'; throw new Error('Unauthorized'); }
+        if (!res.ok) {
+            const err = await res.json().catch(() => null);
+            throw new Error(err?.detail || `API Error: ${res.status}`);
+        }
+        return res.json();
+    },
+
     // ─── AI Specialist Quartet ───
     async getActivityLogs(limit: number = 50, category?: string): Promise<ActivityLog[]> {
         const params = new URLSearchParams();
@@ -399,6 +534,22 @@ export const api = {
         return authFetch(`${API_URL}/api/logs?${params.toString()}`);
     },
 
+    async searchActivityLogs(filters: ActivityLogFilters = {}, cursor?: string | null, limit: number = 100): Promise<{ items: ActivityLogEntry[]; next_cursor: string | null }> {
+        const params = new URLSearchParams({ limit: String(limit) });
+        if (filters.category) params.append('category', filters.category);
+        if (filters.level) params.append('level', filters.level);
+        if (filters.start) params.append('start', filters.start);
+        if (filters.end) params.append('end', filters.end);
+        if (filters.details) params.append('details', JSON.stringify(filters.details));
+        if (cursor) params.append('cursor', cursor);
+        return authFetch(`${API_URL}/api/logs/search?${params.toString()}`);
+    },
+
+    async getRevenue(groupBy: 'month' | 'client' | 'project' = 'month', status: string = 'paid'): Promise<{ key: string | number; label: string; invoices: number; revenue: number }[]> {
+        const params = new URLSearchParams({ group_by: groupBy, status });
+        return authFetch(`${API_URL}/api/stats/revenue?${params.toString()}`);
+    },
+
     async getAIBriefing(): Promise<AIBriefing> {
         return authFetch(`${API_URL}/api/stats/ai-briefing`);
     },
@@ -416,6 +567,10 @@ export const api = {
         return authFetch(`${API_URL}/api/campaigns/status`);
     },
 
+    streamCampaignEvents(onEvent: (event: StreamEvent) => void, since?: number): EventStreamHandle {
+        return openEventStream('/api/campaigns/stream', onEvent, since);
+    },
+
     // ─── Campaigns ───
     async createCampaign(data: any) {
         return authFetch(`${API_URL}/api/campaigns`, { method: 'POST', body: JSON.stringify(data) });
@@ -429,8 +584,24 @@ export const api = {
     async launchCampaign(id: number) {
         return authFetch(`${API_URL}/api/campaigns/${id}/launch`, { method: 'POST' });
     },
-    async stopCampaign() {
-        return authFetch(`${API_URL}/api/campaigns/stop`, { method: 'POST' });
+    async stopCampaign(campaignId?: number) {
+        const qs = campaignId != null ? `?campaign_id=${campaignId}` : '';
+        return authFetch(`${API_URL}/api/campaigns/stop${qs}`, { method: 'POST' });
+    },
+    async getPacingDefaults(): Promise<Record<string, any>> {
+        return authFetch(`${API_URL}/api/campaigns/pacing-defaults`);
+    },
+    async simulateCampaign(id: number): Promise<any> {
+        return authFetch(`${API_URL}/api/campaigns/${id}/simulate`, { method: 'POST' });
+    },
+    async prepareCampaign(id: number) {
+        return authFetch(`${API_URL}/api/campaigns/${id}/prepare`, { method: 'POST' });
+    },
+    async getCampaignDrafts(id: number, skip: number = 0, limit: number = 50): Promise<any> {
+        return authFetch(`${API_URL}/api/campaigns/${id}/drafts?skip=${skip}&limit=${limit}`);
+    },
+    async updateCampaignDraft(id: number, sendId: number, data: { message?: string; skip?: boolean }) {
+        return authFetch(`${API_URL}/api/campaigns/${id}/drafts/${sendId}`, { method: 'PATCH', body: JSON.stringify(data) });
     },
 
     // ─── Templates ───